@@ -0,0 +1,38 @@
+"""
+Precompile the LaTeX formats of the known preambles.
+
+Run at image build time so the server starts with the formats in place
+(it builds missing ones at startup otherwise). Formats are built for the
+allowed class lines (see LATEX_FORMAT_CLASS_LINES) and written to
+LATEX_FORMAT_DIR.
+
+Usage:
+    uv run python scripts/build_latex_formats.py
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.config import app_config  # noqa: E402
+from src.services.question_paper.response_mapper.image.latex_formats import precompile_latex_formats  # noqa: E402
+from src.services.question_paper.response_mapper.image.latex_toolchain import discover_latex_toolchain  # noqa: E402
+
+
+def main() -> int:
+    argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter).parse_args()
+
+    if discover_latex_toolchain().pdflatex is None:
+        print("pdflatex not found; no formats built", file=sys.stderr)
+        return 1
+
+    names = asyncio.run(precompile_latex_formats())
+    print(f"Built {len(names)} LaTeX formats in {app_config.latex_format_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
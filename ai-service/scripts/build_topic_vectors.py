@@ -0,0 +1,59 @@
+"""
+Embed the course/topic vocabulary into the topic-vector table.
+
+Vocabulary comes from a text file (one term per line, either `field: value`
+or a bare topic) and/or the metadata of the local vector index snapshot.
+Terms already in the table are not re-embedded.
+
+Usage:
+    uv run python scripts/build_topic_vectors.py --vocabulary vocab.txt --from-index
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.config import app_config  # noqa: E402
+from src.services.question_paper.library.query_composer import (  # noqa: E402
+    build_topic_vector_table,
+    vocabulary_from_metadata,
+)
+
+
+def _read_vocabulary(path: Path) -> list[str]:
+    terms = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        terms.append(line if ":" in line else f"key_topics: {line}")
+    return terms
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vocabulary", type=Path, help="Text file with one term per line")
+    parser.add_argument("--from-index", action="store_true", help="Add terms from the local vector index snapshot")
+    parser.add_argument("--output", type=Path, default=Path(app_config.topic_vector_table_dir or ".topic_vectors"))
+    args = parser.parse_args()
+
+    terms: list[str] = []
+    if args.vocabulary:
+        terms.extend(_read_vocabulary(args.vocabulary))
+    if args.from_index:
+        records = json.loads((Path(app_config.local_index_dir) / "records.json").read_text(encoding="utf-8"))
+        terms.extend(vocabulary_from_metadata(r.get("metadata") or {} for r in records))
+    if not terms:
+        parser.error("no vocabulary: pass --vocabulary and/or --from-index")
+
+    total, added = asyncio.run(build_topic_vector_table(terms, args.output))
+    print(f"Topic-vector table at {args.output}: {total} terms ({added} newly embedded)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
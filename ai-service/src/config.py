@@ -1,6 +1,6 @@
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -30,12 +30,118 @@ class AppConfig(BaseSettings):
     aws_secret_access_key: str = Field(description="AWS secret access key")
     aws_region: str = Field(default="us-east-1", description="AWS region")
     aws_s3_bucket_name: str = Field(description="AWS S3 bucket name for documents")
+    s3_fetch_concurrency: int = Field(default=8, ge=1, description="Maximum concurrent S3 document downloads")
+    s3_fetch_timeout_seconds: float = Field(default=30.0, ge=0, description="Per-object S3 download timeout, counted from when a pool worker starts the download (0 disables it)")
+    s3_fetch_skip_failed: bool = Field(default=True, description="Skip documents that fail to download instead of failing the request")
+    s3_max_pool_connections: int = Field(default=64, ge=1, description="HTTP connection pool size of the S3 client")
+    s3_tcp_keepalive: bool = Field(default=True, description="Enable TCP keep-alive on S3 connections")
+    s3_connect_timeout_seconds: float = Field(default=5.0, gt=0, description="S3 connect timeout")
+    s3_read_timeout_seconds: float = Field(default=20.0, gt=0, description="S3 socket read timeout")
+    s3_retry_mode: Literal["legacy", "standard", "adaptive"] = Field(default="adaptive", description="botocore retry mode for S3 calls")
+    s3_max_attempts: int = Field(default=5, ge=1, description="Maximum attempts per S3 call (including the first)")
+    s3_part_size_bytes: int = Field(default=8 * 1024 ** 2, ge=1024 ** 2, description="Byte-range size for S3 downloads")
+    s3_multipart_threshold_bytes: int = Field(default=16 * 1024 ** 2, ge=0, description="Objects larger than this are downloaded as parallel byte ranges")
+    s3_range_concurrency: int = Field(default=4, ge=1, description="Byte-range download workers per concurrent S3 fetch")
+    document_cache_dir: str = Field(default="", description="Node-local disk cache for S3 documents shared by worker processes (empty disables it)")
+    document_cache_max_bytes: int = Field(default=2 * 1024 ** 3, ge=0, description="Size cap of the disk document cache in bytes")
+    document_cache_policy: Literal["lru", "lfu"] = Field(default="lru", description="Eviction policy of the disk document cache")
+    document_memory_cache_max_bytes: int = Field(default=256 * 1024 ** 2, ge=0, description="Byte budget of the in-memory hot document cache (0 disables it)")
+    
+    # Shared HTTP Client Settings
+    http2_enabled: bool = Field(default=True, description="Use HTTP/2 for outbound downloads when the h2 package is installed")
+    http_max_connections: int = Field(default=100, ge=1, description="Maximum open connections of the shared HTTP client")
+    http_max_keepalive_connections: int = Field(default=20, ge=0, description="Idle keep-alive connections kept by the shared HTTP client")
+    http_keepalive_expiry_seconds: float = Field(default=60.0, ge=0, description="Seconds an idle keep-alive connection is kept open")
+    http_connect_timeout_seconds: float = Field(default=5.0, gt=0, description="Connect timeout of the shared HTTP client")
+    http_read_timeout_seconds: float = Field(default=30.0, gt=0, description="Read/write/pool timeout of the shared HTTP client")
+    http_per_host_concurrency: int = Field(default=8, ge=1, description="Maximum concurrent requests per host")
+    reference_max_bytes: int = Field(default=50 * 1024 ** 2, ge=1, description="Largest user reference accepted (downloads abort past it); also bounds the memory a download takes")
+    reference_spool_threshold_bytes: int = Field(default=4 * 1024 ** 2, ge=0, description="Reference downloads larger than this are spooled to a temp file while streaming (the result is still read into memory)")
+    reference_cache_dir: str = Field(default="", description="Disk cache for reference downloads with HTTP revalidation (empty disables it)")
+    reference_cache_max_bytes: int = Field(default=1024 ** 3, ge=0, description="Size cap of the reference download cache in bytes")
+    reference_allowed_media_types: str = Field(
+        default="application/pdf,image/png,image/jpeg,image/webp,image/gif,text/plain,text/markdown,text/csv,text/html",
+        description="Comma-separated media types accepted as user references",
+    )
+    reference_compaction_enabled: bool = Field(default=False, description="Downsample, dedupe and re-encode large user references before generation")
+    reference_compaction_min_bytes: int = Field(default=1024 ** 2, ge=0, description="References smaller than this are sent unchanged")
+    reference_compaction_target_dpi: int = Field(default=150, ge=36, le=600, description="Resolution page images are downsampled to")
+    reference_compaction_jpeg_quality: int = Field(default=75, ge=1, le=95, description="JPEG/WebP quality of re-encoded images")
+    reference_compaction_workers: int = Field(default=2, ge=1, description="Processes in the compaction pool")
+    reference_compaction_timeout_seconds: float = Field(default=60.0, gt=0, description="Compaction taking longer keeps the original document")
+    reference_compaction_cache_entries: int = Field(default=64, ge=0, description="In-memory LRU size for compacted references (also cached on disk when DOCUMENT_CACHE_DIR is set)")
+    reference_compaction_cache_max_bytes: int = Field(default=256 * 1024 ** 2, ge=0, description="Maximum bytes of compacted references held in memory")
+    reference_upload_prefix: str = Field(default="reference-uploads", description="S3 key prefix of references pushed through UploadReference")
     
     # Pinecone Settings
     pinecone_api_key: str = Field(default="", description="Pinecone API key")
     pinecone_index_name: str = Field(default="", description="Pinecone index name")
     
-
+    # Library Retrieval Settings
+    embedding_cache_max_entries: int = Field(default=1024, ge=0, description="In-memory LRU size for query embeddings")
+    embedding_cache_dir: str = Field(default="", description="Directory for the on-disk query embedding cache (empty disables it)")
+    embedding_cache_disk_max_entries: int = Field(default=100_000, ge=1, description="Query embeddings kept on disk (least recently used are evicted)")
+    topic_vector_table_dir: str = Field(default="", description="Precomputed topic-vector table for composed query embeddings (empty disables it)")
+    vector_index_backend: Literal["pinecone", "local"] = Field(default="pinecone", description="Vector index used for library search")
+    local_index_dir: str = Field(default=".local_index", description="Directory holding the local vector index snapshot")
+    local_index_quantize: bool = Field(default=False, description="Query an int8-quantized, memory-mapped copy of the local index")
+    local_index_sync_source: Literal["pinecone", "s3"] = Field(default="pinecone", description="Where the local index snapshot is synced from")
+    local_index_s3_prefix: str = Field(default="vector-index", description="S3 prefix of the snapshot published by ingestion")
+    library_metadata_filter_enabled: bool = Field(default=False, description="Pre-filter library search by extracted document metadata (needs documents ingested with <field>_terms)")
+    library_hybrid_enabled: bool = Field(default=False, description="Fuse BM25 term scores with dense similarity (needs the local index snapshot)")
+    library_hybrid_alpha: float = Field(default=0.7, ge=0, le=1, description="Weight of the dense score in hybrid fusion (1 - alpha for BM25)")
+    library_hybrid_min_score: float = Field(default=0.55, ge=0, le=1, description="Minimum fused score for a document to be fetched")
+    library_hybrid_candidates: int = Field(default=20, ge=1, description="Dense and lexical candidates considered before fusion")
+    library_multi_query_enabled: bool = Field(default=True, description="Query the library once per topic and fuse the rankings")
+    library_max_sub_queries: int = Field(default=8, ge=1, description="Maximum library sub-queries per request (including the all-topics query)")
+    library_mmr_lambda: float = Field(default=0.7, ge=0, le=1, description="MMR trade-off between relevance (1) and diversity (0)")
+    library_page_excerpts_enabled: bool = Field(default=True, description="Send only the matching pages of documents retrieved via page chunks")
+    library_single_flight_ttl_seconds: float = Field(default=60.0, ge=0, description="Seconds a finished library retrieval is reused by identical requests (0 only coalesces in-flight ones)")
+    library_single_flight_max_entries: int = Field(default=32, ge=1, description="Finished library retrievals kept for reuse")
+    library_single_flight_max_bytes: int = Field(default=64 * 1024 ** 2, ge=0, description="Document bytes of the finished library retrievals kept for reuse")
+    local_index_sync_interval_seconds: int = Field(default=900, ge=0, description="Seconds between local index syncs (0 disables periodic sync)")
+    
+    # Question Paper Generation Settings
+    speculative_rendering_enabled: bool = Field(
+        default=False,
+        description="Render candidate paper images while verification runs and reuse them by content hash",
+    )
+    render_cache_max_entries: int = Field(default=256, ge=0, description="In-memory LRU size for rendered images")
+    render_cache_dir: str = Field(default="", description="Directory for the on-disk rendered image cache (empty disables it)")
+    render_cpu_concurrency: int = Field(default=0, ge=0, description="Concurrent renders per CPU-bound strategy (LaTeX, matplotlib, Graphviz, RDKit; 0 = number of cores)")
+    render_io_concurrency: int = Field(default=8, ge=1, description="Concurrent AI image generations")
+    latex_max_jobs: int = Field(default=0, ge=0, description="Concurrent pdflatex/ImageMagick processes (0 = number of cores)")
+    latex_compile_timeout_seconds: float = Field(default=90.0, gt=0, description="pdflatex runs longer than this are killed")
+    latex_convert_timeout_seconds: float = Field(default=60.0, gt=0, description="ImageMagick conversions longer than this are killed")
+    latex_formats_enabled: bool = Field(default=True, description="Compile known preambles against precompiled .fmt files")
+    latex_format_dir: str = Field(default=".cache/latex-formats", description="Directory of the precompiled LaTeX format files")
+    latex_format_class_lines: str = Field(default="", description="Additional \\documentclass lines (separated by ';') to build formats for")
+    latex_batch_max_figures: int = Field(default=16, ge=1, description="Standalone figures of a paper compiled as one document (1 = no batching)")
+    render_concurrency_overrides: str = Field(default="", description="Comma-separated strategy=limit pairs overriding the caps, e.g. latex_rendered=2")
+    
+    # Access Statistics and Startup Prewarm Settings
+    access_stats_enabled: bool = Field(default=False, description="Track document, query and render popularity and prewarm caches at startup")
+    access_stats_path: str = Field(default=".cache/access_stats.json", description="Local file the access statistics are persisted to")
+    access_stats_s3_prefix: str = Field(default="", description="Persist access statistics under this prefix in the documents bucket instead (one object per replica, merged on load)")
+    access_stats_replica_id: str = Field(default="", description="Name of this replica's statistics object (defaults to the hostname)")
+    access_stats_half_life_hours: float = Field(default=24.0, gt=0, description="Hours after which persisted access counts weigh half")
+    access_stats_flush_interval_seconds: int = Field(default=300, ge=0, description="Seconds between access statistics flushes (0 flushes only on shutdown)")
+    prewarm_top_documents: int = Field(default=20, ge=0, description="Most retrieved library documents loaded at startup")
+    prewarm_top_queries: int = Field(default=100, ge=0, description="Most frequent query embeddings loaded at startup")
+    prewarm_top_renders: int = Field(default=100, ge=0, description="Most frequent rendered images loaded from the disk cache at startup")
+    prewarm_timeout_seconds: float = Field(default=60.0, gt=0, description="Upper bound on the startup prewarm before reporting SERVING")
+    
+    # Usage Accounting Settings (0 disables a ceiling)
+    usage_max_request_tokens: int = Field(default=0, ge=0, description="Maximum input+output tokens per request across all models")
+    usage_max_request_cost_usd: float = Field(default=0.0, ge=0, description="Maximum estimated cost per request in USD")
+    usage_max_verification_rounds: int = Field(default=5, ge=0, description="Maximum verification agent rounds per request")
+    usage_tenant_cost_ceiling_usd: float = Field(default=0.0, ge=0, description="Maximum estimated spend per tenant within the window in USD (per process, best-effort: not shared by workers or replicas, reset on restart)")
+    usage_tenant_reservation_usd: float = Field(default=0.0, ge=0, description="Estimated cost held against the tenant ceiling while a request runs (0 uses the per-request cost ceiling)")
+    usage_tenant_window_seconds: int = Field(default=86400, ge=60, description="Rolling window for per-tenant spend ceilings")
+    usage_price_overrides: str = Field(
+        default="",
+        description='JSON model price overrides, e.g. {"model": {"input_per_million": 0.1, "output_per_million": 0.4, "per_image": 0.0}}',
+    )
     
     # Pydantic Settings Configuration
     model_config = SettingsConfigDict(
@@ -5,7 +5,7 @@ import sys
 from typing import Optional, Any, cast
 
 import grpc
-from grpc_health.v1 import health, health_pb2, health_pb2_grpc
+from grpc_health.v1 import health, health_pb2_grpc
 from grpc_reflection.v1alpha import reflection
 import logfire
 
@@ -16,7 +16,14 @@ from src.services.question_paper.service import generate_question_paper
 from src.services.question_paper.grpc_mapper import (
     pb_to_generate_request,
     core_to_pb_question_paper,
+    usage_to_pb,
 )
+from src.services.question_paper.access_stats import access_stats
+from src.services.question_paper.library.local_index import local_index_store
+from src.services.question_paper.prewarm import set_serving, warm_up
+from src.utils.aws import shutdown_s3_executor
+from src.utils.converter import ReferenceUpload, shutdown_compaction_executor
+from src.utils.http_client import close_http_client, start_http_client
 from src.utils.errors import ServiceError
 
 
@@ -30,6 +37,23 @@ logfire.instrument_httpx(capture_all=True)
 # Help static type checkers with dynamically generated protobuf symbols
 pb = cast(Any, pb)
 
+SERVICE_NAME = "claexa.ai.QuestionPaperService"
+
+
+def _status_code(he: ServiceError) -> grpc.StatusCode:
+    code = grpc.StatusCode.INTERNAL
+    if he.status_code == 400:
+        code = grpc.StatusCode.INVALID_ARGUMENT
+    elif he.status_code == 403:
+        code = grpc.StatusCode.PERMISSION_DENIED
+    elif he.status_code == 404:
+        code = grpc.StatusCode.NOT_FOUND
+    elif he.status_code == 429:
+        code = grpc.StatusCode.RESOURCE_EXHAUSTED
+    elif he.status_code == 504:
+        code = grpc.StatusCode.DEADLINE_EXCEEDED
+    return code
+
 
 class QuestionPaperServiceServicer(pb_grpc.QuestionPaperServiceServicer):
     async def Generate(self, request, context):
@@ -37,23 +61,34 @@ class QuestionPaperServiceServicer(pb_grpc.QuestionPaperServiceServicer):
             dto_req = pb_to_generate_request(request)
             dto_resp = await generate_question_paper(dto_req)
             return getattr(pb, "QuestionPaperGenerateResponse")(
-                question_paper=core_to_pb_question_paper(dto_resp.question_paper)
+                question_paper=core_to_pb_question_paper(dto_resp.question_paper),
+                usage=usage_to_pb(dto_resp.usage) if dto_resp.usage else None,
             )
         except ServiceError as he:
-            code = grpc.StatusCode.INTERNAL
-            if he.status_code == 400:
-                code = grpc.StatusCode.INVALID_ARGUMENT
-            elif he.status_code == 403:
-                code = grpc.StatusCode.PERMISSION_DENIED
-            elif he.status_code == 404:
-                code = grpc.StatusCode.NOT_FOUND
-            elif he.status_code == 429:
-                code = grpc.StatusCode.RESOURCE_EXHAUSTED
-            await context.abort(code, he.detail or "Request failed")
+            await context.abort(_status_code(he), he.detail or "Request failed")
         except Exception as e:
             logger.exception("Question paper generation failed")
             await context.abort(grpc.StatusCode.INTERNAL, str(e))
 
+    async def UploadReference(self, request_iterator, context):
+        try:
+            with ReferenceUpload() as upload:
+                async for chunk in request_iterator:
+                    upload.write(chunk.data, media_type=chunk.media_type, file_name=chunk.file_name)
+                uploaded = await upload.commit()
+            return getattr(pb, "ReferenceUploadResponse")(
+                handle=uploaded.handle,
+                size_bytes=uploaded.size_bytes,
+                media_type=uploaded.media_type,
+            )
+        except ValueError as ve:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(ve))
+        except ServiceError as he:
+            await context.abort(_status_code(he), he.detail or "Upload failed")
+        except Exception as e:
+            logger.exception("Reference upload failed")
+            await context.abort(grpc.StatusCode.INTERNAL, str(e))
+
 
 async def serve(bind_addr: Optional[str] = None) -> None:
     server = grpc.aio.server(
@@ -65,12 +100,13 @@ async def serve(bind_addr: Optional[str] = None) -> None:
 
     pb_grpc.add_QuestionPaperServiceServicer_to_server(QuestionPaperServiceServicer(), server)
 
-    # Health and reflection
+    # Health and reflection; not serving until the warm-up below has finished
     health_servicer = health.HealthServicer()
+    set_serving(health_servicer, [SERVICE_NAME], False)
     health_pb2_grpc.add_HealthServicer_to_server(health_servicer, server)
 
     service_names = (
-        "claexa.ai.QuestionPaperService",
+        SERVICE_NAME,
         health.SERVICE_NAME,
         reflection.SERVICE_NAME,
     )
@@ -84,8 +120,12 @@ async def serve(bind_addr: Optional[str] = None) -> None:
     logger.info(f"🔍 Server reflection enabled")
 
     await server.start()
-    # Set SERVING status for health
-    health_servicer.set("", health_pb2.HealthCheckResponse.SERVING)
+
+    # Open the pooled HTTP client used for reference downloads
+    await start_http_client()
+
+    # Toolchains, index and caches; reports SERVING once done
+    await warm_up(health_servicer, [SERVICE_NAME])
     
     # Setup graceful shutdown
     stop_event = asyncio.Event()
@@ -104,8 +144,13 @@ async def serve(bind_addr: Optional[str] = None) -> None:
         logger.info("Server cancelled, shutting down...")
     finally:
         logger.info("Stopping server...")
-        health_servicer.set("", health_pb2.HealthCheckResponse.NOT_SERVING)
+        set_serving(health_servicer, [SERVICE_NAME], False)
         await server.stop(5)
+        await local_index_store.stop()
+        await access_stats.stop()
+        shutdown_s3_executor()
+        shutdown_compaction_executor()
+        await close_http_client()
         logger.info("✅ Server stopped gracefully")
 
 
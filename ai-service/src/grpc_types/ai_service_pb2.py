@@ -24,7 +24,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10\x61i_service.proto\x12\tclaexa.ai\"]\n\x15SubQuestionSchemaItem\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x12\n\nmarks_each\x18\x03 \x01(\x05\x12\x13\n\x0b\x62loom_level\x18\x04 \x01(\x05\"\xd8\x01\n\x12QuestionSchemaItem\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x12\n\nmarks_each\x18\x03 \x01(\x05\x12\x16\n\x0eimage_required\x18\x04 \x01(\x08\x12\x12\n\ndifficulty\x18\x05 \x01(\t\x12\x13\n\x0b\x62loom_level\x18\x06 \x01(\x05\x12\x17\n\x0f\x66iltered_topics\x18\x07 \x03(\t\x12\x37\n\rsub_questions\x18\x08 \x03(\x0b\x32 .claexa.ai.SubQuestionSchemaItem\"\xa7\x01\n\x1cQuestionPaperGenerateRequest\x12\x0e\n\x06\x63ourse\x18\x01 \x01(\t\x12\x10\n\x08\x61udience\x18\x02 \x01(\t\x12\x0e\n\x06topics\x18\x03 \x03(\t\x12!\n\x19user_reference_media_urls\x18\x04 \x03(\t\x12\x32\n\x0bitem_schema\x18\x05 \x03(\x0b\x32\x1d.claexa.ai.QuestionSchemaItem\"\x1e\n\x0eQuestionOption\x12\x0c\n\x04text\x18\x01 \x01(\t\"%\n\rQuestionImage\x12\x14\n\x0c\x62\x61se64_image\x18\x01 \x01(\t\"V\n\x0bSubQuestion\x12\x0c\n\x04text\x18\x01 \x01(\t\x12\r\n\x05marks\x18\x02 \x01(\x05\x12*\n\x07options\x18\x03 \x03(\x0b\x32\x19.claexa.ai.QuestionOption\"\xc1\x01\n\x08Question\x12\x0c\n\x04text\x18\x01 \x01(\t\x12\r\n\x05marks\x18\x02 \x01(\x05\x12\x13\n\x0b\x62loom_level\x18\x03 \x01(\x05\x12*\n\x07options\x18\x04 \x03(\x0b\x32\x19.claexa.ai.QuestionOption\x12(\n\x06images\x18\x05 \x03(\x0b\x32\x18.claexa.ai.QuestionImage\x12-\n\rsub_questions\x18\x06 \x03(\x0b\x32\x16.claexa.ai.SubQuestion\"E\n\rQuestionPaper\x12\x0c\n\x04name\x18\x01 \x01(\t\x12&\n\tquestions\x18\x02 \x03(\x0b\x32\x13.claexa.ai.Question\"Q\n\x1dQuestionPaperGenerateResponse\x12\x30\n\x0equestion_paper\x18\x01 \x01(\x0b\x32\x18.claexa.ai.QuestionPaper\"%\n\x12HealthCheckRequest\x12\x0f\n\x07service\x18\x01 \x01(\t\"\xa4\x01\n\x13HealthCheckResponse\x12<\n\x06status\x18\x01 \x01(\x0e\x32,.claexa.ai.HealthCheckResponse.ServingStatus\"O\n\rServingStatus\x12\x0b\n\x07UNKNOWN\x10\x00\x12\x0b\n\x07SERVING\x10\x01\x12\x0f\n\x0bNOT_SERVING\x10\x02\x12\x13\n\x0fSERVICE_UNKNOWN\x10\x03\x32w\n\x14QuestionPaperService\x12_\n\x08Generate\x12\'.claexa.ai.QuestionPaperGenerateRequest\x1a(.claexa.ai.QuestionPaperGenerateResponse\"\x00\x32Y\n\rHealthService\x12H\n\x05\x43heck\x12\x1d.claexa.ai.HealthCheckRequest\x1a\x1e.claexa.ai.HealthCheckResponse\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x10\x61i_service.proto\x12\tclaexa.ai\"]\n\x15SubQuestionSchemaItem\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x12\n\nmarks_each\x18\x03 \x01(\x05\x12\x13\n\x0b\x62loom_level\x18\x04 \x01(\x05\"\xd8\x01\n\x12QuestionSchemaItem\x12\x0c\n\x04type\x18\x01 \x01(\t\x12\r\n\x05\x63ount\x18\x02 \x01(\x05\x12\x12\n\nmarks_each\x18\x03 \x01(\x05\x12\x16\n\x0eimage_required\x18\x04 \x01(\x08\x12\x12\n\ndifficulty\x18\x05 \x01(\t\x12\x13\n\x0b\x62loom_level\x18\x06 \x01(\x05\x12\x17\n\x0f\x66iltered_topics\x18\x07 \x03(\t\x12\x37\n\rsub_questions\x18\x08 \x03(\x0b\x32 .claexa.ai.SubQuestionSchemaItem\"\x86\x01\n\rLibraryFilter\x12\x0f\n\x07subject\x18\x01 \x01(\t\x12\x13\n\x0binstitution\x18\x02 \x01(\t\x12\x14\n\x0ctarget_level\x18\x03 \x01(\t\x12\x15\n\racademic_year\x18\x04 \x01(\t\x12\x10\n\x08\x64oc_type\x18\x05 \x01(\t\x12\x10\n\x08language\x18\x06 \x01(\t\"\xb0\x02\n\x1cQuestionPaperGenerateRequest\x12\x0e\n\x06\x63ourse\x18\x01 \x01(\t\x12\x10\n\x08\x61udience\x18\x02 \x01(\t\x12\x0e\n\x06topics\x18\x03 \x03(\t\x12!\n\x19user_reference_media_urls\x18\x04 \x03(\t\x12\x32\n\x0bitem_schema\x18\x05 \x03(\x0b\x32\x1d.claexa.ai.QuestionSchemaItem\x12\x11\n\ttenant_id\x18\x06 \x01(\t\x12\x30\n\x0elibrary_filter\x18\x07 \x01(\x0b\x32\x18.claexa.ai.LibraryFilter\x12\"\n\x1auser_reference_object_keys\x18\x08 \x03(\t\x12\x1e\n\x16user_reference_handles\x18\t \x03(\t\"K\n\x14ReferenceUploadChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\x12\n\nmedia_type\x18\x02 \x01(\t\x12\x11\n\tfile_name\x18\x03 \x01(\t\"Q\n\x17ReferenceUploadResponse\x12\x0e\n\x06handle\x18\x01 \x01(\t\x12\x12\n\nsize_bytes\x18\x02 \x01(\x03\x12\x12\n\nmedia_type\x18\x03 \x01(\t\"\x1e\n\x0eQuestionOption\x12\x0c\n\x04text\x18\x01 \x01(\t\"%\n\rQuestionImage\x12\x14\n\x0c\x62\x61se64_image\x18\x01 \x01(\t\"V\n\x0bSubQuestion\x12\x0c\n\x04text\x18\x01 \x01(\t\x12\r\n\x05marks\x18\x02 \x01(\x05\x12*\n\x07options\x18\x03 \x03(\x0b\x32\x19.claexa.ai.QuestionOption\"\xc1\x01\n\x08Question\x12\x0c\n\x04text\x18\x01 \x01(\t\x12\r\n\x05marks\x18\x02 \x01(\x05\x12\x13\n\x0b\x62loom_level\x18\x03 \x01(\x05\x12*\n\x07options\x18\x04 \x03(\x0b\x32\x19.claexa.ai.QuestionOption\x12(\n\x06images\x18\x05 \x03(\x0b\x32\x18.claexa.ai.QuestionImage\x12-\n\rsub_questions\x18\x06 \x03(\x0b\x32\x16.claexa.ai.SubQuestion\"E\n\rQuestionPaper\x12\x0c\n\x04name\x18\x01 \x01(\t\x12&\n\tquestions\x18\x02 \x03(\x0b\x32\x13.claexa.ai.Question\"\x86\x01\n\nModelUsage\x12\r\n\x05model\x18\x01 \x01(\t\x12\x10\n\x08requests\x18\x02 \x01(\x05\x12\x14\n\x0cinput_tokens\x18\x03 \x01(\x05\x12\x15\n\routput_tokens\x18\x04 \x01(\x05\x12\x0e\n\x06images\x18\x05 \x01(\x05\x12\x1a\n\x12\x65stimated_cost_usd\x18\x06 \x01(\x01\"\x84\x01\n\x12QuestionPaperUsage\x12%\n\x06models\x18\x01 \x03(\x0b\x32\x15.claexa.ai.ModelUsage\x12\x14\n\x0cinput_tokens\x18\x02 \x01(\x05\x12\x15\n\routput_tokens\x18\x03 \x01(\x05\x12\x1a\n\x12\x65stimated_cost_usd\x18\x04 \x01(\x01\"\x7f\n\x1dQuestionPaperGenerateResponse\x12\x30\n\x0equestion_paper\x18\x01 \x01(\x0b\x32\x18.claexa.ai.QuestionPaper\x12,\n\x05usage\x18\x02 \x01(\x0b\x32\x1d.claexa.ai.QuestionPaperUsage\"%\n\x12HealthCheckRequest\x12\x0f\n\x07service\x18\x01 \x01(\t\"\xa4\x01\n\x13HealthCheckResponse\x12<\n\x06status\x18\x01 \x01(\x0e\x32,.claexa.ai.HealthCheckResponse.ServingStatus\"O\n\rServingStatus\x12\x0b\n\x07UNKNOWN\x10\x00\x12\x0b\n\x07SERVING\x10\x01\x12\x0f\n\x0bNOT_SERVING\x10\x02\x12\x13\n\x0fSERVICE_UNKNOWN\x10\x03\x32\xd3\x01\n\x14QuestionPaperService\x12_\n\x08Generate\x12\'.claexa.ai.QuestionPaperGenerateRequest\x1a(.claexa.ai.QuestionPaperGenerateResponse\"\x00\x12Z\n\x0fUploadReference\x12\x1f.claexa.ai.ReferenceUploadChunk\x1a\".claexa.ai.ReferenceUploadResponse\"\x00(\x01\x32Y\n\rHealthService\x12H\n\x05\x43heck\x12\x1d.claexa.ai.HealthCheckRequest\x1a\x1e.claexa.ai.HealthCheckResponse\"\x00\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -35,28 +35,38 @@ if not _descriptor._USE_C_DESCRIPTORS:
   _globals['_SUBQUESTIONSCHEMAITEM']._serialized_end=124
   _globals['_QUESTIONSCHEMAITEM']._serialized_start=127
   _globals['_QUESTIONSCHEMAITEM']._serialized_end=343
-  _globals['_QUESTIONPAPERGENERATEREQUEST']._serialized_start=346
-  _globals['_QUESTIONPAPERGENERATEREQUEST']._serialized_end=513
-  _globals['_QUESTIONOPTION']._serialized_start=515
-  _globals['_QUESTIONOPTION']._serialized_end=545
-  _globals['_QUESTIONIMAGE']._serialized_start=547
-  _globals['_QUESTIONIMAGE']._serialized_end=584
-  _globals['_SUBQUESTION']._serialized_start=586
-  _globals['_SUBQUESTION']._serialized_end=672
-  _globals['_QUESTION']._serialized_start=675
-  _globals['_QUESTION']._serialized_end=868
-  _globals['_QUESTIONPAPER']._serialized_start=870
-  _globals['_QUESTIONPAPER']._serialized_end=939
-  _globals['_QUESTIONPAPERGENERATERESPONSE']._serialized_start=941
-  _globals['_QUESTIONPAPERGENERATERESPONSE']._serialized_end=1022
-  _globals['_HEALTHCHECKREQUEST']._serialized_start=1024
-  _globals['_HEALTHCHECKREQUEST']._serialized_end=1061
-  _globals['_HEALTHCHECKRESPONSE']._serialized_start=1064
-  _globals['_HEALTHCHECKRESPONSE']._serialized_end=1228
-  _globals['_HEALTHCHECKRESPONSE_SERVINGSTATUS']._serialized_start=1149
-  _globals['_HEALTHCHECKRESPONSE_SERVINGSTATUS']._serialized_end=1228
-  _globals['_QUESTIONPAPERSERVICE']._serialized_start=1230
-  _globals['_QUESTIONPAPERSERVICE']._serialized_end=1349
-  _globals['_HEALTHSERVICE']._serialized_start=1351
-  _globals['_HEALTHSERVICE']._serialized_end=1440
+  _globals['_LIBRARYFILTER']._serialized_start=346
+  _globals['_LIBRARYFILTER']._serialized_end=480
+  _globals['_QUESTIONPAPERGENERATEREQUEST']._serialized_start=483
+  _globals['_QUESTIONPAPERGENERATEREQUEST']._serialized_end=787
+  _globals['_REFERENCEUPLOADCHUNK']._serialized_start=789
+  _globals['_REFERENCEUPLOADCHUNK']._serialized_end=864
+  _globals['_REFERENCEUPLOADRESPONSE']._serialized_start=866
+  _globals['_REFERENCEUPLOADRESPONSE']._serialized_end=947
+  _globals['_QUESTIONOPTION']._serialized_start=949
+  _globals['_QUESTIONOPTION']._serialized_end=979
+  _globals['_QUESTIONIMAGE']._serialized_start=981
+  _globals['_QUESTIONIMAGE']._serialized_end=1018
+  _globals['_SUBQUESTION']._serialized_start=1020
+  _globals['_SUBQUESTION']._serialized_end=1106
+  _globals['_QUESTION']._serialized_start=1109
+  _globals['_QUESTION']._serialized_end=1302
+  _globals['_QUESTIONPAPER']._serialized_start=1304
+  _globals['_QUESTIONPAPER']._serialized_end=1373
+  _globals['_MODELUSAGE']._serialized_start=1376
+  _globals['_MODELUSAGE']._serialized_end=1510
+  _globals['_QUESTIONPAPERUSAGE']._serialized_start=1513
+  _globals['_QUESTIONPAPERUSAGE']._serialized_end=1645
+  _globals['_QUESTIONPAPERGENERATERESPONSE']._serialized_start=1647
+  _globals['_QUESTIONPAPERGENERATERESPONSE']._serialized_end=1774
+  _globals['_HEALTHCHECKREQUEST']._serialized_start=1776
+  _globals['_HEALTHCHECKREQUEST']._serialized_end=1813
+  _globals['_HEALTHCHECKRESPONSE']._serialized_start=1816
+  _globals['_HEALTHCHECKRESPONSE']._serialized_end=1980
+  _globals['_HEALTHCHECKRESPONSE_SERVINGSTATUS']._serialized_start=1901
+  _globals['_HEALTHCHECKRESPONSE_SERVINGSTATUS']._serialized_end=1980
+  _globals['_QUESTIONPAPERSERVICE']._serialized_start=1983
+  _globals['_QUESTIONPAPERSERVICE']._serialized_end=2194
+  _globals['_HEALTHSERVICE']._serialized_start=2196
+  _globals['_HEALTHSERVICE']._serialized_end=2285
 # @@protoc_insertion_point(module_scope)
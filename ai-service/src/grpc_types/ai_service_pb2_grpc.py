@@ -40,6 +40,11 @@ class QuestionPaperServiceStub(object):
                 request_serializer=ai__service__pb2.QuestionPaperGenerateRequest.SerializeToString,
                 response_deserializer=ai__service__pb2.QuestionPaperGenerateResponse.FromString,
                 _registered_method=True)
+        self.UploadReference = channel.stream_unary(
+                '/claexa.ai.QuestionPaperService/UploadReference',
+                request_serializer=ai__service__pb2.ReferenceUploadChunk.SerializeToString,
+                response_deserializer=ai__service__pb2.ReferenceUploadResponse.FromString,
+                _registered_method=True)
 
 
 class QuestionPaperServiceServicer(object):
@@ -52,6 +57,13 @@ class QuestionPaperServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def UploadReference(self, request_iterator, context):
+        """Stream a reference document in chunks; the returned handle can be cited in Generate
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_QuestionPaperServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -60,6 +72,11 @@ def add_QuestionPaperServiceServicer_to_server(servicer, server):
                     request_deserializer=ai__service__pb2.QuestionPaperGenerateRequest.FromString,
                     response_serializer=ai__service__pb2.QuestionPaperGenerateResponse.SerializeToString,
             ),
+            'UploadReference': grpc.stream_unary_rpc_method_handler(
+                    servicer.UploadReference,
+                    request_deserializer=ai__service__pb2.ReferenceUploadChunk.FromString,
+                    response_serializer=ai__service__pb2.ReferenceUploadResponse.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'claexa.ai.QuestionPaperService', rpc_method_handlers)
@@ -99,6 +116,33 @@ class QuestionPaperService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def UploadReference(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(
+            request_iterator,
+            target,
+            '/claexa.ai.QuestionPaperService/UploadReference',
+            ai__service__pb2.ReferenceUploadChunk.SerializeToString,
+            ai__service__pb2.ReferenceUploadResponse.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
 
 class HealthServiceStub(object):
     """Health Check Service
@@ -0,0 +1,237 @@
+"""
+Lightweight access statistics for cache prewarming.
+
+Counts how often library documents are retrieved, query texts are embedded
+and image plans are rendered. At startup the top entries drive
+`prewarm.prewarm_caches`.
+
+Each process persists only its own counts, periodically: those it loaded
+from its own file or object plus the accesses it recorded since. Locally
+that is a single file (one writer). In the documents bucket every replica
+writes `{prefix}/{replica_id}.json` and loads the objects of all replicas, so
+replicas never overwrite each other's counts. Persisted counts are halved
+per `half_life_hours` of age rather than on every load, so popularity
+follows recent traffic however often replicas restart; objects older than
+STALE_HALF_LIVES half-lives are ignored and deleted.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
+
+from src.config import app_config
+
+logger = logging.getLogger(__name__)
+
+DOCUMENTS = "documents"
+QUERIES = "queries"
+RENDERS = "renders"
+KINDS = (DOCUMENTS, QUERIES, RENDERS)
+
+# Entries kept per kind when persisting
+MAX_KEYS_PER_KIND = 1000
+# Persisted statistics older than this many half-lives count for less than 1/256 and are dropped
+STALE_HALF_LIVES = 8
+
+
+class AccessStats:
+    """Per-kind access counters with periodic persistence."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        s3_prefix: Optional[str] = None,
+        replica_id: Optional[str] = None,
+        half_life_hours: float = 24.0,
+        enabled: bool = True,
+    ):
+        self.path = Path(path) if path else None
+        self.s3_prefix = s3_prefix.strip("/") if s3_prefix else None
+        self.replica_id = replica_id or socket.gethostname()
+        self.half_life_hours = half_life_hours
+        self.enabled = enabled
+        # Counts of all persisted statistics plus this process's accesses (what top() ranks)
+        self._counts: Dict[str, Counter] = {kind: Counter() for kind in KINDS}
+        # What this process persists: its own loaded statistics and the accesses since
+        self._own_loaded: Dict[str, Dict[str, int]] = {}
+        self._own_loaded_at = 0.0
+        self._recorded: Dict[str, Counter] = {kind: Counter() for kind in KINDS}
+        self._lock = Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def s3_key(self) -> Optional[str]:
+        """Object this replica persists to."""
+        return f"{self.s3_prefix}/{self.replica_id}.json" if self.s3_prefix else None
+
+    def record(self, kind: str, key: str, count: int = 1) -> None:
+        """Count one (or `count`) accesses of `key`."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counts[kind][key] += count
+            self._recorded[kind][key] += count
+
+    def top(self, kind: str, n: int) -> List[str]:
+        """Return the `n` most accessed keys of a kind."""
+        with self._lock:
+            return [key for key, _ in self._counts[kind].most_common(n)]
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Return the top keys of each kind with their counts (all writers plus this process)."""
+        with self._lock:
+            return {kind: dict(counts.most_common(MAX_KEYS_PER_KIND)) for kind, counts in self._counts.items()}
+
+    def merge(self, snapshot: Dict[str, Dict[str, int]], decay: float = 0.5) -> None:
+        """Add persisted counts, scaled by `decay`, to the current ones."""
+        with self._lock:
+            for kind in KINDS:
+                for key, count in (snapshot.get(kind) or {}).items():
+                    scaled = round(count * decay)
+                    if scaled > 0:
+                        self._counts[kind][key] += scaled
+
+    def _decay(self, age_seconds: float) -> float:
+        return 0.5 ** (max(0.0, age_seconds) / (self.half_life_hours * 3600))
+
+    def persisted(self) -> Dict[str, Dict[str, int]]:
+        """Return what this process persists: its own loaded counts, decayed to now, plus its recorded accesses."""
+        with self._lock:
+            counts = {kind: Counter(self._recorded[kind]) for kind in KINDS}
+            own_loaded, own_loaded_at = self._own_loaded, self._own_loaded_at
+        decay = self._decay(time.time() - own_loaded_at)
+        for kind in KINDS:
+            for key, count in (own_loaded.get(kind) or {}).items():
+                scaled = round(count * decay)
+                if scaled > 0:
+                    counts[kind][key] += scaled
+        return {kind: dict(counts[kind].most_common(MAX_KEYS_PER_KIND)) for kind in KINDS}
+
+    async def load(self) -> None:
+        """Merge the persisted statistics (of every replica), if any."""
+        if not self.enabled:
+            return
+        try:
+            entries = await asyncio.to_thread(self._read)
+        except Exception as e:
+            logger.warning(f"Failed to load access statistics: {e}")
+            return
+        for own, modified_at, payload in entries:
+            snapshot = json.loads(payload)
+            self.merge(snapshot, self._decay(time.time() - modified_at))
+            if own:
+                with self._lock:
+                    self._own_loaded, self._own_loaded_at = snapshot, modified_at
+        if entries:
+            logger.info(
+                f"Loaded access statistics of {len(entries)} writer(s) ("
+                + ", ".join(f"{kind}={len(self._counts[kind])}" for kind in KINDS)
+                + ")"
+            )
+
+    async def flush(self) -> None:
+        """Persist this process's statistics."""
+        if not self.enabled:
+            return
+        payload = json.dumps(self.persisted()).encode("utf-8")
+        try:
+            await asyncio.to_thread(self._write, payload)
+        except Exception as e:
+            logger.warning(f"Failed to persist access statistics: {e}")
+
+    async def start(self) -> None:
+        """Load persisted statistics and start periodic flushing."""
+        await self.load()
+        interval = app_config.access_stats_flush_interval_seconds
+        if self.enabled and interval > 0 and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._periodic_flush(interval))
+
+    async def stop(self) -> None:
+        """Stop periodic flushing and persist one last time."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+    async def _periodic_flush(self, interval: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+    def _read(self) -> List[Tuple[bool, float, bytes]]:
+        """Return (written by this process, modification time, payload) of each persisted snapshot."""
+        stale_seconds = STALE_HALF_LIVES * self.half_life_hours * 3600
+        if self.s3_prefix:
+            from src.utils.aws.s3_document_fetcher import BotoClientError, _get_s3_client
+
+            client = _get_s3_client()
+            bucket = app_config.aws_s3_bucket_name
+            entries = []
+            for page in client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=f"{self.s3_prefix}/"):
+                for obj in page.get("Contents", []):
+                    modified_at = obj["LastModified"].timestamp()
+                    if time.time() - modified_at > stale_seconds:
+                        # Left behind by a replica that is gone
+                        try:
+                            client.delete_object(Bucket=bucket, Key=obj["Key"])
+                        except BotoClientError as e:  # type: ignore[misc]
+                            logger.debug(f"Failed to delete stale access statistics {obj['Key']}: {e}")
+                        continue
+                    try:
+                        response = client.get_object(Bucket=bucket, Key=obj["Key"])
+                    except BotoClientError as e:  # type: ignore[misc]
+                        if e.response['Error']['Code'] == 'NoSuchKey':  # type: ignore[attr-defined]
+                            continue
+                        raise
+                    entries.append((obj["Key"] == self.s3_key, modified_at, response["Body"].read()))
+            return entries
+        if self.path is None or not self.path.exists():
+            return []
+        modified_at = self.path.stat().st_mtime
+        if time.time() - modified_at > stale_seconds:
+            return []
+        return [(True, modified_at, self.path.read_bytes())]
+
+    def _write(self, payload: bytes) -> None:
+        if self.s3_key:
+            from src.utils.aws.s3_document_fetcher import _get_s3_client
+
+            _get_s3_client().put_object(
+                Bucket=app_config.aws_s3_bucket_name,
+                Key=self.s3_key,
+                Body=payload,
+                ContentType="application/json",
+            )
+            return
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file first so a crash never leaves a truncated file
+        fd, tmp_path = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+# Process-wide access statistics
+access_stats = AccessStats(
+    path=app_config.access_stats_path or None,
+    s3_prefix=app_config.access_stats_s3_prefix or None,
+    replica_id=app_config.access_stats_replica_id or None,
+    half_life_hours=app_config.access_stats_half_life_hours,
+    enabled=app_config.access_stats_enabled,
+)
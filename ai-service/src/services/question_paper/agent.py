@@ -1,12 +1,17 @@
 import logging
 from pathlib import Path
+from typing import Optional
+from pydantic import BaseModel
 from pydantic_ai import Agent, RunContext
 from pydantic_ai.models.google import GoogleModel, GoogleModelSettings
 from pydantic_ai.messages import ToolReturn
+from pydantic_ai.tools import ToolDefinition
+from pydantic_ai.usage import RunUsage
 
 from src.services.question_paper.model_provider import google_model_provider
+from .deps import QuestionPaperAgentDeps
 from .models.ai_question_paper import AIQuestionPaper
-from .tools.verification_agent.agent import question_paper_verification_agent
+from .tools.verification_agent.agent import question_paper_verification_agent, verification_model_name
 from .tools.verification_agent.models import AIQuestionPaperVerificationFeedback, AIQuestionPaperWithoutImages
 
 logger = logging.getLogger(__name__)
@@ -28,6 +33,7 @@ def get_system_prompt() -> str:
       
 model = GoogleModel("learnlm-2.0-flash-experimental", provider=google_model_provider)
 model_settings = GoogleModelSettings(temperature=0.4)
+generation_model_name = model.model_name
     
 system_prompt = get_system_prompt()
 
@@ -35,18 +41,70 @@ system_prompt = get_system_prompt()
 question_paper_agent = Agent(
         model=model,
         output_type=AIQuestionPaper,
+        deps_type=QuestionPaperAgentDeps,
         system_prompt=system_prompt,
         model_settings=model_settings,
         retries=3,
     ) 
 
 
-@question_paper_agent.tool
-async def verification_tool(ctx: RunContext[None], question_paper: AIQuestionPaperWithoutImages) -> AIQuestionPaperVerificationFeedback:
-    """Verify the question paper. and get the feedback."""
-        
+def _is_speculative(ctx: RunContext[QuestionPaperAgentDeps]) -> bool:
+    return ctx.deps is not None and ctx.deps.speculative_rendering
+
+
+async def _only_without_speculation(
+    ctx: RunContext[QuestionPaperAgentDeps], tool_def: ToolDefinition
+) -> Optional[ToolDefinition]:
+    return None if _is_speculative(ctx) else tool_def
+
+
+async def _only_with_speculation(
+    ctx: RunContext[QuestionPaperAgentDeps], tool_def: ToolDefinition
+) -> Optional[ToolDefinition]:
+    return tool_def if _is_speculative(ctx) else None
+
+
+async def _run_verification(
+    ctx: RunContext[QuestionPaperAgentDeps], question_paper: BaseModel
+) -> AIQuestionPaperVerificationFeedback:
+    if ctx.deps is not None:
+        ctx.deps.candidate = question_paper  # type: ignore[assignment]
+    tracker = ctx.deps.usage if ctx.deps is not None else None
+    if tracker is None:
+        result = await question_paper_verification_agent.run(user_prompt=question_paper.model_dump_json(),
+                                                             deps=ctx.deps,
+                                                             usage=ctx.usage)
+        return result.output
+
+    # Stop verifying gracefully once the request budget is spent; the agent then finalizes the paper
+    skip_reason = tracker.start_verification_round()
+    if skip_reason:
+        logger.warning(f"Skipping verification: {skip_reason}")
+        return AIQuestionPaperVerificationFeedback(
+            modification_requirement=[f"Verification skipped ({skip_reason}). Finalize the current paper."],
+            status="pass",
+        )
+
+    verification_usage = tracker.track_run(verification_model_name, RunUsage())
     result = await question_paper_verification_agent.run(user_prompt=question_paper.model_dump_json(),
                                                          deps=ctx.deps,
-                                                         usage=ctx.usage)
-            
-    return result.output
\ No newline at end of file
+                                                         usage=verification_usage,
+                                                         usage_limits=tracker.usage_limits())
+    return result.output
+
+
+@question_paper_agent.tool(prepare=_only_without_speculation)
+async def verification_tool(ctx: RunContext[QuestionPaperAgentDeps], question_paper: AIQuestionPaperWithoutImages) -> AIQuestionPaperVerificationFeedback:
+    """Verify the question paper. and get the feedback."""
+    
+    return await _run_verification(ctx, question_paper)
+
+
+@question_paper_agent.tool(prepare=_only_with_speculation)
+async def speculative_verification_tool(ctx: RunContext[QuestionPaperAgentDeps], question_paper: AIQuestionPaper) -> AIQuestionPaperVerificationFeedback:
+    """Verify the complete question paper, including image plans, and get the feedback."""
+    
+    # Start rendering the candidate's images while verification runs
+    ctx.deps.speculative_renderer.prefetch(question_paper)  # type: ignore[union-attr]
+    
+    return await _run_verification(ctx, question_paper)
@@ -0,0 +1,27 @@
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from .models.ai_question_paper import AIQuestionPaper
+from .response_mapper.speculative import SpeculativeImageRenderer
+from .tools.verification_agent.models import AIQuestionPaperWithoutImages
+from .usage import UsageTracker
+
+
+@dataclass
+class QuestionPaperAgentDeps:
+    """Per-request state shared with the question paper agent tools."""
+    speculative_renderer: Optional[SpeculativeImageRenderer] = None
+    usage: Optional[UsageTracker] = None
+    # Last paper submitted for verification (returned if the usage ceiling stops the run)
+    candidate: Optional[Union[AIQuestionPaper, AIQuestionPaperWithoutImages]] = None
+
+    @property
+    def speculative_rendering(self) -> bool:
+        """Whether candidate papers are rendered while verification runs."""
+        return self.speculative_renderer is not None
+
+    def candidate_paper(self, name: str) -> Optional[AIQuestionPaper]:
+        """The last candidate as a question paper, or None if no paper was verified yet."""
+        if isinstance(self.candidate, AIQuestionPaperWithoutImages):
+            return self.candidate.to_question_paper(name)
+        return self.candidate
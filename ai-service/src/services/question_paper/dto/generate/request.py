@@ -25,12 +25,26 @@ class QuestionSchemaItemDTO(BaseModel):
     sub_questions: Optional[List[SubQuestionSchemaItemDTO]] = Field(None, description="Sub questions for the question")
 
 
+class LibraryFilterDTO(BaseModel):
+    """Optional metadata constraints for library retrieval."""
+    subject: Optional[str] = Field(None, description="Subject the library documents must cover")
+    institution: Optional[str] = Field(None, description="Board, university or publisher")
+    target_level: Optional[str] = Field(None, description="Intended class or level, e.g. Class 10")
+    academic_year: Optional[str] = Field(None, description="Academic session, e.g. 2024-25")
+    doc_type: Optional[str] = Field(None, description="Document type, e.g. Sample Paper")
+    language: Optional[str] = Field(None, description="Document language")
+
+
 class QuestionPaperGenerateRequestDTO(BaseModel):
     """Request DTO for generating question papers with the new flattened structure."""
     course: str = Field(..., description="Course name and details")
     audience: str = Field(..., description="Target audience")
     topics: List[str] = Field(..., min_length=1, description="List of topics to cover")
     user_reference_media_urls: List[str] = Field(default_factory=list, description="Optional reference media URLs")
+    user_reference_object_keys: List[str] = Field(default_factory=list, description="Optional S3 object keys of references in the bucket")
+    user_reference_handles: List[str] = Field(default_factory=list, description="Optional handles returned by UploadReference")
+    tenant_id: Optional[str] = Field(None, description="Tenant the request is billed to, used for usage ceilings")
+    library_filter: Optional[LibraryFilterDTO] = Field(None, description="Metadata constraints for library retrieval")
     
     item_schema: List[QuestionSchemaItemDTO] = Field(..., min_length=1, description="Question schema configuration is required")
 
@@ -1,9 +1,13 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
 from src.services.question_paper.models.core_question_paper import QuestionPaper
+from src.services.question_paper.usage import RequestUsage
 
 
 class QuestionPaperGenerateResponseDTO(BaseModel):
     question_paper: QuestionPaper
+    usage: Optional[RequestUsage] = None
 
 
@@ -1,13 +1,15 @@
 import logging
-from typing import Any, cast
+from typing import Any, Optional, cast
 
 from src.grpc_types import ai_service_pb2 as pb
 from .dto.generate.request import (
+    LibraryFilterDTO,
     QuestionPaperGenerateRequestDTO,
     QuestionSchemaItemDTO,
     SubQuestionSchemaItemDTO,
 )
 from .models.core_question_paper import QuestionPaper, Question, QuestionOption, QuestionImage, SubQuestion
+from .usage import RequestUsage
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +17,21 @@ logger = logging.getLogger(__name__)
 pb = cast(Any, pb)
 
 
+def _pb_to_library_filter(req) -> Optional[LibraryFilterDTO]:
+    if not req.HasField("library_filter"):
+        return None
+    f = req.library_filter
+    library_filter = LibraryFilterDTO(
+        subject=f.subject or None,
+        institution=f.institution or None,
+        target_level=f.target_level or None,
+        academic_year=f.academic_year or None,
+        doc_type=f.doc_type or None,
+        language=f.language or None,
+    )
+    return library_filter if library_filter.model_dump(exclude_none=True) else None
+
+
 def pb_to_generate_request(req) -> QuestionPaperGenerateRequestDTO:
     """Map protobuf QuestionPaperGenerateRequest to service DTO."""
     q_items = []
@@ -47,7 +64,11 @@ def pb_to_generate_request(req) -> QuestionPaperGenerateRequestDTO:
         audience=req.audience,
         topics=list(req.topics),
         user_reference_media_urls=list(req.user_reference_media_urls),
+        user_reference_object_keys=list(req.user_reference_object_keys),
+        user_reference_handles=list(req.user_reference_handles),
         item_schema=q_items,
+        tenant_id=getattr(req, "tenant_id", "") or None,
+        library_filter=_pb_to_library_filter(req),
     )
 
 
@@ -85,4 +106,20 @@ def core_to_pb_question_paper(core: QuestionPaper):
     )
 
 
-
+def usage_to_pb(usage: RequestUsage):
+    return pb.QuestionPaperUsage(  # pyright: ignore[reportAttributeAccessIssue]
+        models=[
+            pb.ModelUsage(  # pyright: ignore[reportAttributeAccessIssue]
+                model=m.model,
+                requests=m.requests,
+                input_tokens=m.input_tokens,
+                output_tokens=m.output_tokens,
+                images=m.images,
+                estimated_cost_usd=m.estimated_cost_usd,
+            )
+            for m in usage.models
+        ],
+        input_tokens=usage.input_tokens,
+        output_tokens=usage.output_tokens,
+        estimated_cost_usd=usage.estimated_cost_usd,
+    )
@@ -1,10 +1,13 @@
 import logging
 import asyncio
-from typing import List, Optional
+from typing import Any, List, Optional
 
 import google.genai as genai
 from google.genai import types
 from src.utils.google_ai_client import get_genai_client
+from src.services.question_paper.access_stats import QUERIES, access_stats
+
+from .embedding_cache import query_embedding_cache
 
 logger = logging.getLogger(__name__)
 
@@ -15,57 +18,74 @@ EMBEDDING_MODEL = "gemini-embedding-001"
 _get_genai_client = get_genai_client
 
 
-async def generate_embedding(query: str) -> List[float]:
+def _extract_embedding(emb: Any) -> Optional[List[float]]:
+    """Return the values of a single embedding across possible response shapes."""
+    if hasattr(emb, "values") and emb.values is not None:
+        return list(emb.values)
+    if isinstance(emb, dict) and "values" in emb:
+        return list(emb["values"])  # type: ignore[index]
+    return None
+
+
+def _extract_embeddings(response: Any) -> List[Optional[List[float]]]:
+    """Normalize an embed_content response into a list of vectors."""
+    # Result generally returns a list in `embeddings`
+    if hasattr(response, "embeddings") and response.embeddings:
+        return [_extract_embedding(emb) for emb in response.embeddings]
+
+    # Dict fallback (older/alt return shapes)
+    if isinstance(response, dict) and response.get("embeddings"):
+        return [_extract_embedding(emb) for emb in response["embeddings"]]
+
+    return []
+
+
+async def generate_embeddings(queries: List[str], record_access: bool = True) -> List[List[float]]:
     """
-    Generate embedding for the query using Google GenAI.
+    Generate embeddings for several queries with a single batched request.
+    
+    Cached queries are served from the query embedding cache; only the misses
+    are sent to Google GenAI, in one embed_content call.
     
     Args:
-        query: The text query to generate embedding for
+        queries: The text queries to embed
+        record_access: Count the queries in the access statistics used for prewarming
         
     Returns:
-        List of float values representing the embedding vector
+        Embedding vectors in the same order as `queries`
         
     Raises:
         ValueError: If embedding generation fails
     """
+    if record_access:
+        for query in queries:
+            access_stats.record(QUERIES, query)
+
     try:
-        logger.debug(f"Generating embedding for query length={len(query)}")
-
-        client = _get_genai_client()
-
-        # Generate embeddings following Gemini API docs
-        response = client.models.embed_content(
-            model=EMBEDDING_MODEL,
-            contents=query,
-            config=types.EmbedContentConfig(task_type="RETRIEVAL_QUERY")
-        )
-
-        # Normalize response across possible shapes
-        embedding: Optional[List[float]] = None
-
-        # Result generally returns a list in `embeddings`
-        if embedding is None and hasattr(response, "embeddings") and response.embeddings:
-            emb0 = response.embeddings[0]
-            if hasattr(emb0, "values") and emb0.values is not None:
-                embedding = list(emb0.values)
-            elif isinstance(emb0, dict) and "values" in emb0:
-                embedding = list(emb0["values"])  # type: ignore[index]
-
-        # Dict fallback (older/alt return shapes)
-        if embedding is None and isinstance(response, dict):
-            if "embeddings" in response and response["embeddings"]:
-                emb0 = response["embeddings"][0]
-                if isinstance(emb0, dict) and "values" in emb0:
-                    embedding = list(emb0["values"])  # type: ignore[index]
-
-        if not embedding:
-            raise ValueError("Embedding not found in response")
-
-        logger.debug(
-            f"Generated embedding for query preview='{query[:50]}' dim={len(embedding)}"
-        )
-        return embedding
+        embeddings: List[Optional[List[float]]] = [
+            await query_embedding_cache.get(EMBEDDING_MODEL, query) for query in queries
+        ]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        logger.debug(f"Batch embedding: {len(queries) - len(missing)} cached, {len(missing)} to generate")
+
+        if missing:
+            client = _get_genai_client()
+            response = await client.aio.models.embed_content(
+                model=EMBEDDING_MODEL,
+                contents=[queries[i] for i in missing],
+                config=types.EmbedContentConfig(task_type="RETRIEVAL_QUERY")
+            )
+
+            generated = _extract_embeddings(response)
+            if len(generated) != len(missing) or not all(generated):
+                raise ValueError(f"Expected {len(missing)} embeddings, got {len(generated)}")
+
+            for i, embedding in zip(missing, generated):
+                embeddings[i] = embedding
+                await query_embedding_cache.put(EMBEDDING_MODEL, queries[i], embedding)  # type: ignore[arg-type]
+
+        return embeddings  # type: ignore[return-value]
 
     except Exception as e:
-        logger.error(f"Failed to generate embedding for query '{query}': {e}")
-        raise ValueError(f"Embedding generation failed: {e}")
\ No newline at end of file
+        logger.error(f"Failed to generate embeddings for {len(queries)} queries: {e}")
+        raise ValueError(f"Embedding generation failed: {e}")
@@ -0,0 +1,180 @@
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import List, Optional
+
+from src.config import app_config
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize query text so trivially different strings share a cache entry."""
+    return " ".join(query.lower().split())
+
+
+def embedding_cache_key(model: str, query: str) -> str:
+    """Return the cache key for a model and (normalized) query text."""
+    payload = f"{model}\0{normalize_query(query)}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """
+    Two-tier cache of query embeddings.
+
+    The first tier is an in-memory LRU; the optional second tier stores each
+    vector as a float32 file under `cache_dir`, so embeddings survive restarts
+    and are shared by worker processes on the same node. The disk tier keeps
+    at most `disk_max_entries` files: reads refresh a file's mtime, and once
+    the count is exceeded the least recently used files are removed down to
+    90% of the cap. The file count is taken from a directory scan on the first
+    write and on each eviction, and counted incrementally in between.
+    """
+
+    def __init__(self, max_entries: int = 1024, cache_dir: Optional[str] = None, disk_max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.disk_max_entries = disk_max_entries
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = Lock()
+        self._disk_lock = Lock()
+        self._disk_entries: Optional[int] = None
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    async def get(self, model: str, query: str) -> Optional[List[float]]:
+        """
+        Look up an embedding, promoting disk hits into memory.
+
+        Args:
+            model: Embedding model name
+            query: Query text (normalized before lookup)
+
+        Returns:
+            The cached embedding, or None on a miss
+        """
+        key = embedding_cache_key(model, query)
+
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                return embedding
+
+        if self.cache_dir is None:
+            return None
+
+        embedding = await asyncio.to_thread(self._read_disk, key)
+        if embedding is not None:
+            self._remember(key, embedding)
+        return embedding
+
+    async def put(self, model: str, query: str, embedding: List[float]) -> None:
+        """
+        Store an embedding in memory and, when configured, on disk.
+
+        Args:
+            model: Embedding model name
+            query: Query text (normalized before storing)
+            embedding: Embedding vector
+        """
+        key = embedding_cache_key(model, query)
+        self._remember(key, embedding)
+
+        if self.cache_dir is not None:
+            try:
+                await asyncio.to_thread(self._write_disk, key, embedding)
+            except OSError as e:
+                logger.warning(f"Failed to persist query embedding {key[:12]}: {e}")
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (disk entries are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key: str, embedding: List[float]) -> None:
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        assert self.cache_dir is not None
+        return self.cache_dir / key[:2] / f"{key}.f32"
+
+    def _read_disk(self, key: str) -> Optional[List[float]]:
+        path = self._path(key)
+        try:
+            values = array("f")
+            values.frombytes(path.read_bytes())
+            os.utime(path)
+            return values.tolist()
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable embedding cache file {path}: {e}")
+            return None
+
+    def _write_disk(self, key: str, embedding: List[float]) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not path.exists()
+        # Write to a temp file first so concurrent readers never see partial vectors
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(array("f", embedding).tobytes())
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        if is_new:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        with self._disk_lock:
+            if self._disk_entries is not None:
+                self._disk_entries += 1
+                if self._disk_entries <= self.disk_max_entries:
+                    return
+
+            files = []
+            for path in self.cache_dir.glob("*/*.f32"):  # type: ignore[union-attr]
+                try:
+                    files.append((path.stat().st_mtime, path))
+                except OSError:
+                    continue
+            self._disk_entries = len(files)
+            if len(files) <= self.disk_max_entries:
+                return
+
+            # Evict below the cap so the next writes do not rescan right away
+            files.sort()
+            excess = len(files) - int(self.disk_max_entries * 0.9)
+            for _, path in files[:excess]:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"Failed to remove embedding cache file {path}: {e}")
+            self._disk_entries = len(files) - excess
+            logger.info(f"Evicted {excess} query embeddings from the disk cache")
+
+
+# Process-wide query embedding cache
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=app_config.embedding_cache_max_entries,
+    cache_dir=app_config.embedding_cache_dir or None,
+    disk_max_entries=app_config.embedding_cache_disk_max_entries,
+)
@@ -0,0 +1,107 @@
+"""
+Page-subset excerpts of library documents.
+
+Large library PDFs are indexed both as a whole (summary vector) and as
+page-range chunks. When retrieval hits chunks, only the matching pages are
+sent to the agent: as a reduced PDF, or as a plain-text excerpt built from
+the indexed chunk text when the document is not a PDF or cannot be reduced.
+"""
+
+import io
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic_ai import BinaryContent
+from pypdf import PdfReader, PdfWriter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LibraryDocument:
+    """A library document selected by search, with the page spans that matched (None = whole document)."""
+    key: str
+    page_spans: Optional[List[Tuple[int, int]]] = None
+    texts: List[str] = field(default_factory=list)
+
+
+def group_results_by_document(results: List[Dict[str, Any]]) -> List[LibraryDocument]:
+    """
+    Group search results (summary and page-chunk hits) by S3 key, in rank order.
+
+    Chunk hits take precedence over a summary hit for the same document, so a
+    large book is reduced to the pages that actually matched.
+    """
+    documents: Dict[str, LibraryDocument] = {}
+    for result in results:
+        key = result.get('key') or result.get('object_key')
+        if not key:
+            continue
+        document = documents.setdefault(key, LibraryDocument(key=key))
+
+        page_start, page_end = result.get('page_start'), result.get('page_end')
+        if page_start is None or page_end is None:
+            continue
+        document.page_spans = (document.page_spans or []) + [(int(page_start), int(page_end))]
+        if result.get('text'):
+            document.texts.append(f"[pages {int(page_start)}-{int(page_end)}] {result['text']}")
+
+    for document in documents.values():
+        if document.page_spans:
+            document.page_spans = _merge_spans(document.page_spans)
+    return list(documents.values())
+
+
+def _merge_spans(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def reduce_pdf_pages(data: bytes, page_spans: List[Tuple[int, int]]) -> bytes:
+    """Build a PDF containing only the given 1-based inclusive page spans."""
+    reader = PdfReader(io.BytesIO(data))
+    writer = PdfWriter()
+    for start, end in page_spans:
+        for page_number in range(start, min(end, len(reader.pages)) + 1):
+            writer.add_page(reader.pages[page_number - 1])
+
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def build_excerpt(content: BinaryContent, document: LibraryDocument) -> BinaryContent:
+    """
+    Reduce a fetched library document to its matching pages.
+
+    Returns the content unchanged when the whole document matched.
+    """
+    if not document.page_spans:
+        return content
+
+    if content.media_type == 'application/pdf':
+        try:
+            reduced = reduce_pdf_pages(content.data, document.page_spans)
+            logger.info(
+                f"Reduced library document {document.key} to pages {document.page_spans} "
+                f"({len(content.data)} -> {len(reduced)} bytes)"
+            )
+            return BinaryContent(data=reduced, media_type='application/pdf', identifier=content.identifier)
+        except Exception as e:
+            logger.warning(f"Failed to build PDF excerpt of {document.key}: {e}")
+
+    if document.texts:
+        logger.info(f"Using text excerpt of library document {document.key} (pages {document.page_spans})")
+        return BinaryContent(
+            data="\n\n".join(document.texts).encode("utf-8"),
+            media_type='text/plain',
+            identifier=content.identifier,
+        )
+
+    return content
@@ -0,0 +1,145 @@
+"""
+Library search query and metadata filter construction.
+
+Ingestion stores each document's extracted metadata (subject, institution,
+level, year, doc type, language) together with a normalized `<field>_terms`
+list. Filters are expressed in Pinecone's metadata filter syntax and are
+evaluated the same way by the local vector index.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+from src.config import app_config
+from src.services.question_paper.dto.generate.request import QuestionPaperGenerateRequestDTO
+
+FILTER_FIELDS = ["subject", "institution", "target_level", "academic_year", "doc_type", "language"]
+
+_TERM_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {"a", "an", "and", "as", "for", "from", "in", "of", "on", "the", "to", "with", "inferred", "complexity"}
+
+
+def metadata_terms(value: str) -> List[str]:
+    """
+    Normalize a metadata value into lowercase terms.
+
+    Must stay in sync with `metadata_terms` in the ingestion scripts.
+    """
+    value = re.sub(r"\(.*?\)", " ", value.lower())
+    terms = [t for t in _TERM_PATTERN.findall(value) if t not in _STOPWORDS]
+    return list(dict.fromkeys(terms))
+
+
+def search_query_fields(data: QuestionPaperGenerateRequestDTO, topics: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Return the non-empty `field: value` pairs of a library search query.
+
+    The field names mirror the summary format written at ingestion, so the
+    query lands close to matching document summaries.
+
+    Args:
+        data: Generation request
+        topics: Topics to query for (defaults to all request topics)
+    """
+    library_filter = data.library_filter
+    fields = {
+        "institution": (library_filter and library_filter.institution) or data.audience,
+        "doc_type": library_filter and library_filter.doc_type,
+        "subject": (library_filter and library_filter.subject) or data.course,
+        "academic_year": library_filter and library_filter.academic_year,
+        "target_level": library_filter and library_filter.target_level,
+        "language": library_filter and library_filter.language,
+        "key_topics": ", ".join(data.topics if topics is None else topics),
+    }
+    return {name: value for name, value in fields.items() if value}
+
+
+def build_search_query(data: QuestionPaperGenerateRequestDTO, topics: Optional[List[str]] = None) -> str:
+    """
+    Build the free-text query embedded for library search.
+
+    Args:
+        data: Generation request
+        topics: Topics to query for (defaults to all request topics)
+    """
+    return " ".join(f"{name}: {value}" for name, value in search_query_fields(data, topics).items())
+
+
+def build_sub_query_topics(data: QuestionPaperGenerateRequestDTO) -> List[List[str]]:
+    """
+    Return the topics of each library sub-query for multi-query retrieval.
+
+    The first sub-query covers all topics; each further one pairs a single
+    topic with the course context, so minor topics are not drowned out by
+    the dominant one. Limited to `library_max_sub_queries`.
+    """
+    groups = [list(data.topics)]
+    if app_config.library_multi_query_enabled and len(data.topics) > 1:
+        for topic in list(dict.fromkeys(data.topics))[: max(0, app_config.library_max_sub_queries - 1)]:
+            groups.append([topic])
+    return groups
+
+
+def build_metadata_filter(data: QuestionPaperGenerateRequestDTO) -> Optional[Dict[str, Any]]:
+    """
+    Build the metadata pre-filter for a request.
+
+    Only explicit `library_filter` fields filter, and every term must match.
+    The course name is not turned into a filter (it need not share a term
+    with the extracted subject); it reaches ranking through the query text.
+
+    Returns:
+        A Pinecone-style filter, or None when filtering is disabled or empty
+    """
+    if not app_config.library_metadata_filter_enabled:
+        return None
+
+    clauses: List[Dict[str, Any]] = []
+    library_filter = data.library_filter
+
+    for name in FILTER_FIELDS:
+        value = getattr(library_filter, name, None) if library_filter else None
+        for term in metadata_terms(value or ""):
+            clauses.append({f"{name}_terms": {"$in": [term]}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def matches_metadata_filter(metadata: Dict[str, Any], metadata_filter: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluate a Pinecone-style filter against record metadata.
+
+    Supports `$and`, `$or`, `$eq`, `$ne`, `$in` and `$nin`; list-valued
+    metadata matches when any element satisfies the operator.
+    """
+    if not metadata_filter:
+        return True
+
+    for key, condition in metadata_filter.items():
+        if key == "$and":
+            if not all(matches_metadata_filter(metadata, c) for c in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_metadata_filter(metadata, c) for c in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        values = value if isinstance(value, list) else [value]
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+
+        for operator, operand in condition.items():
+            if operator == "$eq" and operand not in values:
+                return False
+            if operator == "$ne" and operand in values:
+                return False
+            if operator == "$in" and not any(v in operand for v in values):
+                return False
+            if operator == "$nin" and any(v in operand for v in values):
+                return False
+
+    return True
@@ -0,0 +1,441 @@
+"""
+In-process vector index backend for library search.
+
+The library corpus is small (a few thousand summary vectors), so it fits in
+a single NumPy matrix. Vectors are L2-normalized float32 rows (optionally
+int8-quantized with a per-row scale) and queried with one matrix-vector
+product, so a top-k cosine search takes well under a millisecond and needs
+no network.
+
+Snapshots are a directory holding `vectors.npy` (float32, one row per
+record) and `records.json` (ids and metadata in the same order). They are
+synced periodically from Pinecone or from the JSON snapshot the ingestion
+pipeline publishes to S3.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.config import app_config
+
+from .filters import matches_metadata_filter
+from .term_index import BM25Index
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.json"
+QUANTIZED_VECTORS_FILE = "vectors.i8.npy"
+QUANTIZED_SCALES_FILE = "scales.npy"
+# JSON snapshot ({"records": [{"id", "values", "metadata"}]}) published by ingestion
+S3_SNAPSHOT_FILE = "snapshot.json"
+
+PINECONE_FETCH_BATCH = 100
+
+
+def _field(vector: Any, name: str) -> Any:
+    """Read a field of a fetched Pinecone vector (SDK object or plain dict)."""
+    if isinstance(vector, dict):
+        return vector.get(name)
+    return getattr(vector, name, None)
+
+
+def _as_matrix(vectors: Any, rows: int) -> np.ndarray:
+    """Shape vectors as a float32 matrix with `rows` rows (an empty index has zero columns)."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if rows == 0:
+        return matrix.reshape(0, matrix.shape[1] if matrix.ndim == 2 else 0)
+    return matrix.reshape(rows, -1)
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def quantize_rows(matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetrically quantize each row to int8.
+
+    Args:
+        matrix: Float matrix (rows are vectors)
+
+    Returns:
+        Tuple of (int8 matrix, float32 per-row scales) so that row ~= q * scale
+    """
+    max_abs = np.abs(matrix).max(axis=1, initial=0.0)
+    max_abs[max_abs == 0] = 1.0
+    scales = (max_abs / 127.0).astype(np.float32)
+    quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales
+
+
+class LocalVectorIndex:
+    """Immutable in-memory (or memory-mapped) cosine-similarity index."""
+
+    def __init__(
+        self,
+        ids: List[str],
+        metadata: List[Dict[str, Any]],
+        matrix: np.ndarray,
+        scales: Optional[np.ndarray] = None,
+    ):
+        if len(ids) != len(metadata) or len(ids) != matrix.shape[0]:
+            raise ValueError("ids, metadata and vectors must have the same length")
+        self.ids = ids
+        self.metadata = metadata
+        self.matrix = matrix
+        self.scales = scales
+        self._positions = {record_id: i for i, record_id in enumerate(ids)}
+
+    @classmethod
+    def from_vectors(
+        cls,
+        ids: List[str],
+        vectors: Sequence[Sequence[float]],
+        metadata: Optional[List[Dict[str, Any]]] = None,
+        quantize: bool = False,
+    ) -> "LocalVectorIndex":
+        """Build an index from raw vectors (normalized here)."""
+        matrix = _normalize_rows(_as_matrix(vectors, len(ids)))
+        metadata = metadata if metadata is not None else [{} for _ in ids]
+        if quantize:
+            quantized, scales = quantize_rows(matrix)
+            return cls(ids, metadata, quantized, scales)
+        return cls(ids, metadata, matrix)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dimension(self) -> int:
+        return int(self.matrix.shape[1]) if self.matrix.ndim == 2 else 0
+
+    @property
+    def is_quantized(self) -> bool:
+        return self.scales is not None
+
+    def scores(self, query_embedding: Sequence[float]) -> np.ndarray:
+        """Return cosine similarity of the query against every row."""
+        return self._score_rows(query_embedding, None)
+
+    def _score_rows(self, query_embedding: Sequence[float], rows: Optional[np.ndarray]) -> np.ndarray:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        if rows is None or rows.size == len(self):
+            scores = self.matrix @ query
+            return scores * self.scales if self.scales is not None else scores
+        scores = self.matrix[rows] @ query
+        return scores * self.scales[rows] if self.scales is not None else scores
+
+    def query(
+        self,
+        query_embedding: Sequence[float],
+        top_k: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the top-k records by cosine similarity.
+
+        Args:
+            query_embedding: Query vector
+            top_k: Number of matches to return
+            metadata_filter: Optional Pinecone-style metadata filter applied before scoring
+
+        Returns:
+            Matches shaped like Pinecone results: dicts with id, score and metadata
+        """
+        if len(self) == 0 or top_k <= 0:
+            return []
+
+        candidates = np.flatnonzero(self.filter_mask(metadata_filter))
+        if candidates.size == 0:
+            return []
+
+        scores = np.full(len(self), -np.inf, dtype=np.float32)
+        scores[candidates] = self._score_rows(query_embedding, candidates)
+        k = min(top_k, candidates.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            {"id": self.ids[i], "score": float(scores[i]), "metadata": self.metadata[i]}
+            for i in top
+        ]
+
+    def position(self, record_id: str) -> Optional[int]:
+        """Return the row of a record id, or None if it is not in the index."""
+        return self._positions.get(record_id)
+
+    def filter_mask(self, metadata_filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Return a boolean mask of rows whose metadata matches the filter."""
+        if not metadata_filter:
+            return np.ones(len(self), dtype=bool)
+        return np.fromiter(
+            (matches_metadata_filter(m, metadata_filter) for m in self.metadata),
+            dtype=bool,
+            count=len(self),
+        )
+
+    def vectors(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Return normalized float32 vectors for the given ids (missing ids are skipped)."""
+        result: Dict[str, np.ndarray] = {}
+        for record_id in ids:
+            i = self.position(record_id)
+            if i is None:
+                continue
+            row = np.asarray(self.matrix[i], dtype=np.float32)
+            if self.scales is not None:
+                row = row * self.scales[i]
+            result[record_id] = row
+        return result
+
+    def save(self, directory: Path) -> None:
+        """Write a canonical float32 snapshot (plus the int8 copy if quantized) to `directory` atomically."""
+        matrix = np.asarray(self.matrix, dtype=np.float32)
+        if self.scales is not None:
+            matrix = matrix * self.scales[:, None]
+        records = [{"id": i, "metadata": m} for i, m in zip(self.ids, self.metadata)]
+        write_snapshot(directory, records, matrix, quantize=self.is_quantized)
+
+    @classmethod
+    def load(cls, directory: Path, quantize: bool = False, mmap: bool = True) -> "LocalVectorIndex":
+        """
+        Load a snapshot directory.
+
+        With `quantize`, the int8 copy written with the snapshot is used; for
+        snapshots written without one it is derived once next to the snapshot
+        (through temporary files, so concurrent loaders never read a partial
+        copy) and memory-mapped on later loads.
+        """
+        records = json.loads((directory / RECORDS_FILE).read_text(encoding="utf-8"))
+        ids = [r["id"] for r in records]
+        metadata = [r.get("metadata") or {} for r in records]
+        mmap_mode = "r" if mmap else None
+
+        vectors_path = directory / VECTORS_FILE
+        if not quantize:
+            matrix = np.load(vectors_path, mmap_mode=mmap_mode)
+            return cls(ids, metadata, matrix)
+
+        quantized_path = directory / QUANTIZED_VECTORS_FILE
+        scales_path = directory / QUANTIZED_SCALES_FILE
+        stale = (
+            not quantized_path.exists()
+            or not scales_path.exists()
+            or quantized_path.stat().st_mtime < vectors_path.stat().st_mtime
+        )
+        if stale:
+            quantized, scales = quantize_rows(_normalize_rows(np.load(vectors_path)))
+            # Scales first: the copy counts as present once the vectors file exists
+            _save_atomic(scales_path, scales)
+            _save_atomic(quantized_path, quantized)
+
+        return cls(ids, metadata, np.load(quantized_path, mmap_mode=mmap_mode), np.load(scales_path))
+
+
+def _save_atomic(path: Path, array: np.ndarray) -> None:
+    """np.save through a temporary file, so readers (and memory maps) never see a truncated file."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def write_snapshot(
+    directory: Path, records: List[Dict[str, Any]], matrix: np.ndarray, quantize: bool = False
+) -> None:
+    """
+    Write a snapshot (records.json + vectors.npy) and swap it in atomically.
+
+    Args:
+        directory: Target snapshot directory
+        records: List of {"id", "metadata"} dicts in row order
+        matrix: Float matrix with one row per record
+        quantize: Also write the int8 copy, so loaders never derive it in the live directory
+    """
+    directory.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(dir=directory.parent, prefix=f".{directory.name}-"))
+    try:
+        normalized = _normalize_rows(_as_matrix(matrix, len(records)))
+        np.save(staging / VECTORS_FILE, normalized)
+        if quantize:
+            quantized, scales = quantize_rows(normalized)
+            np.save(staging / QUANTIZED_SCALES_FILE, scales)
+            np.save(staging / QUANTIZED_VECTORS_FILE, quantized)
+        (staging / RECORDS_FILE).write_text(json.dumps(records), encoding="utf-8")
+
+        # A fresh sibling per swap, so concurrent writers never share a backup path
+        backup_parent = Path(tempfile.mkdtemp(dir=directory.parent, prefix=f".{directory.name}-old-"))
+        try:
+            if directory.exists():
+                os.replace(directory, backup_parent / directory.name)
+            os.replace(staging, directory)
+        finally:
+            shutil.rmtree(backup_parent, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+
+def _pinecone_snapshot(pinecone_index: Any) -> tuple[List[Dict[str, Any]], List[List[float]]]:
+    """Read every vector (values and metadata) from a Pinecone index."""
+    records: List[Dict[str, Any]] = []
+    vectors: List[List[float]] = []
+
+    for id_page in pinecone_index.list():
+        ids = list(id_page)
+        for start in range(0, len(ids), PINECONE_FETCH_BATCH):
+            batch = ids[start:start + PINECONE_FETCH_BATCH]
+            response = pinecone_index.fetch(ids=batch)
+            fetched = _field(response, "vectors") or {}
+            for vector_id, vector in fetched.items():
+                values = _field(vector, "values")
+                if not values:
+                    logger.warning(f"Skipping Pinecone vector {vector_id} without values")
+                    continue
+                if vectors and len(values) != len(vectors[0]):
+                    logger.warning(f"Skipping Pinecone vector {vector_id} with dimension {len(values)}")
+                    continue
+                records.append({"id": vector_id, "metadata": dict(_field(vector, "metadata") or {})})
+                vectors.append(list(values))
+
+    return records, vectors
+
+
+class LocalIndexStore:
+    """
+    Holds the current `LocalVectorIndex` and keeps it in sync.
+
+    Queries always see a complete index: syncs build a new snapshot and
+    swap the reference in one assignment.
+    """
+
+    def __init__(self, directory: str, quantize: bool = False):
+        self.directory = Path(directory)
+        self.quantize = quantize
+        # (vector index, term index) swapped as one reference so rows always line up
+        self._loaded: Optional[tuple[LocalVectorIndex, BM25Index]] = None
+        self._sync_lock = asyncio.Lock()
+        self._sync_task: Optional[asyncio.Task] = None
+        self.last_synced_at: Optional[float] = None
+
+    @property
+    def index(self) -> Optional[LocalVectorIndex]:
+        return self._loaded[0] if self._loaded else None
+
+    def indexes(self) -> Optional[tuple[LocalVectorIndex, BM25Index]]:
+        """Return the loaded vector index and the BM25 index over its `text` metadata (same row order)."""
+        return self._loaded
+
+    def load(self) -> bool:
+        """Load the snapshot on disk, if any. Returns True when an index was loaded."""
+        if not (self.directory / RECORDS_FILE).exists():
+            return False
+        index = LocalVectorIndex.load(self.directory, quantize=self.quantize)
+        self._loaded = (index, BM25Index([m.get("text", "") for m in index.metadata]))
+        logger.info(
+            f"Loaded local vector index from {self.directory} "
+            f"(records={len(index)}, dim={index.dimension}, quantized={index.is_quantized})"
+        )
+        return True
+
+    async def sync(self) -> None:
+        """Refresh the snapshot from the configured source and reload it."""
+        async with self._sync_lock:
+            started = time.perf_counter()
+            source = app_config.local_index_sync_source
+            if source == "s3":
+                await asyncio.to_thread(self._download_s3_snapshot)
+            else:
+                await asyncio.to_thread(self._download_pinecone_snapshot)
+            await asyncio.to_thread(self.load)
+            self.last_synced_at = time.time()
+            logger.info(f"Local vector index synced from {source} in {time.perf_counter() - started:.2f}s")
+
+    async def start(self) -> None:
+        """Load the local snapshot (syncing first if none exists) and start periodic sync."""
+        loaded = await asyncio.to_thread(self.load)
+        if not loaded:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Initial local vector index sync failed: {e}")
+
+        interval = app_config.local_index_sync_interval_seconds
+        if interval > 0 and self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._periodic_sync(interval))
+
+    async def stop(self) -> None:
+        """Stop periodic sync."""
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+
+    def query(
+        self,
+        query_embedding: Sequence[float],
+        top_k: int,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Query the current index.
+
+        Raises:
+            ValueError: If no snapshot has been loaded yet
+        """
+        index = self.index
+        if index is None:
+            raise ValueError("Local vector index is not loaded")
+        return index.query(query_embedding, top_k, metadata_filter)
+
+    async def _periodic_sync(self, interval: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.warning(f"Periodic local vector index sync failed: {e}")
+
+    def _download_pinecone_snapshot(self) -> None:
+        from .search import _get_pinecone_index
+
+        records, vectors = _pinecone_snapshot(_get_pinecone_index())
+        write_snapshot(self.directory, records, np.asarray(vectors, dtype=np.float32), quantize=self.quantize)
+
+    def _download_s3_snapshot(self) -> None:
+        from src.utils.aws.s3_document_fetcher import _get_s3_client
+
+        key = f"{app_config.local_index_s3_prefix.rstrip('/')}/{S3_SNAPSHOT_FILE}"
+        response = _get_s3_client().get_object(Bucket=app_config.aws_s3_bucket_name, Key=key)
+        snapshot = json.loads(response["Body"].read())
+
+        entries = [e for e in snapshot.get("records", []) if e.get("values")]
+        records = [{"id": e["id"], "metadata": e.get("metadata") or {}} for e in entries]
+        matrix = np.asarray([e["values"] for e in entries], dtype=np.float32)
+        write_snapshot(self.directory, records, matrix, quantize=self.quantize)
+
+
+# Process-wide local index store (used when VECTOR_INDEX_BACKEND=local)
+local_index_store = LocalIndexStore(
+    directory=app_config.local_index_dir,
+    quantize=app_config.local_index_quantize,
+)
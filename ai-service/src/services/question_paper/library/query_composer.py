@@ -0,0 +1,174 @@
+"""
+Compositional query embeddings from a precomputed topic-vector table.
+
+Most requests draw their course, audience and topics from a stable syllabus
+vocabulary. An offline job (`scripts/build_topic_vectors.py`) embeds that
+vocabulary into a local table of `field: value` vectors; at request time a
+sub-query vector is the normalized weighted sum of its component vectors.
+Only components missing from the table are embedded remotely, in one
+batched call.
+"""
+
+import logging
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import app_config
+from src.services.question_paper.dto.generate.request import QuestionPaperGenerateRequestDTO
+
+from .embedding import generate_embeddings
+from .embedding_cache import normalize_query
+from .filters import search_query_fields
+from .local_index import LocalVectorIndex, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Share of the query vector given to topics (split evenly between them)
+TOPIC_WEIGHT = 0.6
+# Weights of the context fields; fields not listed get DEFAULT_FIELD_WEIGHT
+FIELD_WEIGHTS = {"subject": 0.25, "institution": 0.1}
+DEFAULT_FIELD_WEIGHT = 0.05
+
+EMBEDDING_BATCH_SIZE = 100
+
+_KEY_TOPICS_PATTERN = re.compile(r"key_topics:\s*(.+)$", re.IGNORECASE | re.DOTALL)
+_VOCABULARY_FIELDS = ["subject", "institution", "target_level", "doc_type", "language"]
+
+# Global topic-vector table (loaded on first use)
+_topic_vector_table: Optional[LocalVectorIndex] = None
+_topic_vector_table_loaded = False
+
+
+def _get_topic_vector_table() -> Optional[LocalVectorIndex]:
+    """Load the topic-vector table once; None when not configured or missing."""
+    global _topic_vector_table, _topic_vector_table_loaded
+
+    if _topic_vector_table_loaded:
+        return _topic_vector_table
+    _topic_vector_table_loaded = True
+
+    if not app_config.topic_vector_table_dir:
+        return None
+    try:
+        _topic_vector_table = LocalVectorIndex.load(Path(app_config.topic_vector_table_dir))
+        logger.info(f"Loaded topic-vector table with {len(_topic_vector_table)} terms")
+    except FileNotFoundError:
+        logger.warning(f"Topic-vector table not found in {app_config.topic_vector_table_dir}")
+    except Exception as e:
+        logger.error(f"Failed to load topic-vector table: {e}")
+    return _topic_vector_table
+
+
+def reset_topic_vector_table() -> None:
+    """Forget the loaded table so the next request reloads it."""
+    global _topic_vector_table, _topic_vector_table_loaded
+    _topic_vector_table = None
+    _topic_vector_table_loaded = False
+
+
+def query_components(data: QuestionPaperGenerateRequestDTO, topics: List[str]) -> List[Tuple[str, float]]:
+    """
+    Split a sub-query into weighted `field: value` components.
+
+    Topics share TOPIC_WEIGHT; context fields use FIELD_WEIGHTS.
+    """
+    components: List[Tuple[str, float]] = []
+    for name, value in search_query_fields(data, topics).items():
+        if name != "key_topics":
+            components.append((f"{name}: {value}", FIELD_WEIGHTS.get(name, DEFAULT_FIELD_WEIGHT)))
+    unique_topics = list(dict.fromkeys(topics))
+    for topic in unique_topics:
+        components.append((f"key_topics: {topic}", TOPIC_WEIGHT / len(unique_topics)))
+    return components
+
+
+def _compose(components: List[Tuple[str, float]], vectors: Dict[str, np.ndarray]) -> List[float]:
+    combined = np.zeros_like(next(iter(vectors.values())))
+    for text, weight in components:
+        vector = vectors[normalize_query(text)]
+        norm = np.linalg.norm(vector)
+        combined += weight * (vector / norm if norm > 0 else vector)
+    norm = np.linalg.norm(combined)
+    return (combined / norm if norm > 0 else combined).tolist()
+
+
+async def embed_library_queries(
+    data: QuestionPaperGenerateRequestDTO,
+    topic_groups: List[List[str]],
+    sub_queries: List[str],
+) -> List[List[float]]:
+    """
+    Return one embedding per sub-query.
+
+    With a topic-vector table, vectors are composed from table components
+    and only unseen components are embedded remotely; otherwise the full
+    sub-query texts are embedded in one batched call.
+
+    Args:
+        data: Generation request
+        topic_groups: Topics of each sub-query
+        sub_queries: Sub-query texts (same order as topic_groups)
+    """
+    table = _get_topic_vector_table()
+    if table is None:
+        return await generate_embeddings(sub_queries)
+
+    per_query = [query_components(data, topics) for topics in topic_groups]
+    keys = list(dict.fromkeys(normalize_query(text) for components in per_query for text, _ in components))
+    vectors: Dict[str, np.ndarray] = table.vectors(keys)
+
+    unseen = [key for key in keys if key not in vectors]
+    if unseen:
+        for key, embedding in zip(unseen, await generate_embeddings(unseen)):
+            vectors[key] = np.asarray(embedding, dtype=np.float32)
+    logger.info(f"Composed {len(sub_queries)} query vectors from {len(keys)} components ({len(unseen)} embedded remotely)")
+
+    return [_compose(components, vectors) for components in per_query]
+
+
+def vocabulary_from_metadata(metadata: Iterable[Dict]) -> List[str]:
+    """
+    Collect `field: value` vocabulary terms from library vector metadata.
+
+    Uses the extracted metadata fields and the `key_topics` of the summary text.
+    """
+    terms: List[str] = []
+    for record in metadata:
+        for name in _VOCABULARY_FIELDS:
+            if record.get(name):
+                terms.append(f"{name}: {record[name]}")
+        match = _KEY_TOPICS_PATTERN.search(record.get("text") or "") if "page_start" not in record else None
+        if match:
+            terms.extend(f"key_topics: {t.strip()}" for t in match.group(1).split(",") if t.strip())
+    return terms
+
+
+async def build_topic_vector_table(terms: Iterable[str], directory: Path) -> Tuple[int, int]:
+    """
+    Embed vocabulary terms into the topic-vector table at `directory`.
+
+    Terms already in an existing table are kept and not re-embedded.
+
+    Returns:
+        Tuple of (total terms in the table, newly embedded terms)
+    """
+    existing: Dict[str, np.ndarray] = {}
+    if (directory / "records.json").exists():
+        table = LocalVectorIndex.load(directory, mmap=False)
+        existing = table.vectors(table.ids)
+
+    texts = {normalize_query(term): term for term in terms if term.strip()}
+    new_keys = [key for key in texts if key not in existing]
+    for start in range(0, len(new_keys), EMBEDDING_BATCH_SIZE):
+        batch = new_keys[start:start + EMBEDDING_BATCH_SIZE]
+        for key, embedding in zip(batch, await generate_embeddings(batch)):
+            existing[key] = np.asarray(embedding, dtype=np.float32)
+
+    ids = list(existing)
+    records = [{"id": key, "metadata": {"term": texts.get(key, key)}} for key in ids]
+    if ids:
+        write_snapshot(directory, records, np.stack([existing[key] for key in ids]))
+    return len(ids), len(new_keys)
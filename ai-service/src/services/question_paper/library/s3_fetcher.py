@@ -1,9 +1,11 @@
 import logging
-from typing import List
+from typing import Dict, List
 
 from pydantic_ai import BinaryContent
 
-from src.utils.aws import fetch_documents_from_s3
+from src.services.question_paper.access_stats import DOCUMENTS, access_stats
+from src.utils.aws import fetch_documents_by_key, hot_document_cache
+from src.utils.content_hash import is_content_hash, with_content_hash
 
 logger = logging.getLogger(__name__)
 
@@ -21,17 +23,60 @@ async def fetch_documents_from_s3_paths(s3_paths: List[str]) -> List[BinaryConte
     Raises:
         Exception: If fetching documents fails
     """
+    return list((await fetch_documents_by_path(s3_paths)).values())
+
+
+async def fetch_documents_by_path(s3_paths: List[str], record_access: bool = True) -> Dict[str, BinaryContent]:
+    """
+    Fetch documents from AWS S3, keyed by S3 path.
+    
+    Popular documents are served from the in-memory hot cache as the cached
+    BinaryContent objects themselves (their bytes are shared, not copied).
+    Documents are stamped with their content hash, which is the object key
+    for library uploads.
+    Documents skipped after a failed download are missing from the result,
+    so callers can keep per-document data aligned.
+    
+    Args:
+        s3_paths: List of S3 object keys/paths to fetch
+        record_access: Count the paths in the access statistics used for prewarming
+        
+    Returns:
+        Mapping of S3 path to BinaryContent, in the order of `s3_paths`
+    """
     if not s3_paths:
-        return []
+        return {}
+        
+    if record_access:
+        for s3_path in dict.fromkeys(s3_paths):
+            access_stats.record(DOCUMENTS, s3_path)
         
     try:
-        logger.info(f"Fetching {len(s3_paths)} documents from S3")
+        cached: Dict[str, BinaryContent] = {}
+        if hot_document_cache is not None:
+            for s3_path in dict.fromkeys(s3_paths):
+                content = hot_document_cache.get(s3_path)
+                if content is not None:
+                    cached[s3_path] = content
+        
+        missing = [s3_path for s3_path in dict.fromkeys(s3_paths) if s3_path not in cached]
+        logger.info(f"Fetching {len(missing)} documents from S3 ({len(cached)} served from memory)")
+        fetched = await fetch_documents_by_key(missing) if missing else {}
+        fetched = {
+            s3_path: with_content_hash(content, s3_path if is_content_hash(s3_path) else None)
+            for s3_path, content in fetched.items()
+        }
         
-        binary_contents = await fetch_documents_from_s3(s3_paths)
+        if hot_document_cache is not None:
+            for s3_path, content in fetched.items():
+                hot_document_cache.put(s3_path, content)
         
-        logger.info(f"Successfully fetched {len(binary_contents)} documents from S3")
-        return binary_contents
+        return {
+            s3_path: cached.get(s3_path) or fetched[s3_path]
+            for s3_path in dict.fromkeys(s3_paths)
+            if s3_path in cached or s3_path in fetched
+        }
         
     except Exception as e:
         logger.error(f"Failed to fetch documents from S3: {e}")
-        raise 
\ No newline at end of file
+        raise
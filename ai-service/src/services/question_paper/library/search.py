@@ -1,6 +1,8 @@
 import logging
 import asyncio
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
 from pinecone import Pinecone
 import logfire
 
@@ -11,6 +13,8 @@ logger = logging.getLogger(__name__)
 # Configuration constants
 SEARCH_LIMIT = 5
 SIMILARITY_THRESHOLD = 0.65
+MAX_RESULTS = 4
+RRF_K = 60
 
 # Global Pinecone objects
 _pinecone_client = None
@@ -37,12 +41,210 @@ def _get_pinecone_index():
     return _pinecone_index
 
 
-async def search_vector_index(query_embedding: List[float]) -> List[Dict[str, Any]]:
+async def _query_pinecone(
+    query_embedding: List[float],
+    metadata_filter: Optional[Dict[str, Any]] = None,
+    top_k: int = SEARCH_LIMIT,
+    include_values: bool = False,
+) -> List[Dict[str, Any]]:
+    """Query Pinecone and return its raw matches."""
+    index = _get_pinecone_index()
+
+    loop = asyncio.get_event_loop()
+    logger.debug(
+        f"Querying Pinecone index='{app_config.pinecone_index_name}' top_k={top_k}"
+    )
+    response = await loop.run_in_executor(
+        None,
+        lambda: index.query(
+            vector=query_embedding,
+            top_k=top_k,
+            include_values=include_values,
+            include_metadata=True,
+            filter=metadata_filter,
+        )
+    )
+    return list(getattr(response, 'matches', []) or response.get('matches', []))  # type: ignore
+
+
+async def _query_local(
+    query_embedding: List[float],
+    metadata_filter: Optional[Dict[str, Any]] = None,
+    top_k: int = SEARCH_LIMIT,
+    include_values: bool = False,
+) -> List[Dict[str, Any]]:
+    """Query the in-process vector index and return its raw matches."""
+    from .local_index import local_index_store
+
+    logger.debug(f"Querying local vector index top_k={top_k}")
+    # A single matrix-vector product; cheap enough to run on the event loop
+    matches = local_index_store.query(query_embedding, top_k, metadata_filter)
+    if include_values and local_index_store.index is not None:
+        vectors = local_index_store.index.vectors([m['id'] for m in matches])
+        for match in matches:
+            if match['id'] in vectors:
+                match['values'] = vectors[match['id']]
+    return matches
+
+
+def _fuse_hybrid(
+    dense_matches: List[Dict[str, Any]],
+    query_text: str,
+    query_embedding: List[float],
+    metadata_filter: Optional[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """
+    Fuse dense matches with BM25 matches from the local term index.
+
+    Each candidate's score becomes alpha * dense + (1 - alpha) * BM25, with
+    BM25 normalized by the best lexical score. Lexical-only candidates get
+    their dense score from the local snapshot.
+    """
+    from .local_index import local_index_store
+
+    loaded = local_index_store.indexes()
+    if loaded is None:
+        logger.warning("Hybrid retrieval enabled but the local index snapshot is not loaded; using dense scores only")
+        return dense_matches
+    index, term_index = loaded
+
+    alpha = app_config.library_hybrid_alpha
+    lexical = term_index.top(
+        query_text,
+        app_config.library_hybrid_candidates,
+        candidates=index.filter_mask(metadata_filter),
+    )
+    best_lexical = lexical[0][1] if lexical else 0.0
+    lexical_scores = {index.ids[i]: score / best_lexical for i, score in lexical}
+
+    candidates: Dict[str, Dict[str, Any]] = {
+        match.get('id'): {
+            'id': match.get('id'),
+            'dense_score': match.get('score', 0.0),
+            'metadata': match.get('metadata', {}) or {},
+            'values': match.get('values'),
+        }
+        for match in dense_matches
+    }
+    missing = [record_id for record_id in lexical_scores if record_id not in candidates]
+    if missing:
+        dense_scores = index.scores(query_embedding)
+        for record_id in missing:
+            position = index.position(record_id)
+            assert position is not None
+            candidates[record_id] = {
+                'id': record_id,
+                'dense_score': float(dense_scores[position]),
+                'metadata': index.metadata[position],
+                'values': index.vectors([record_id]).get(record_id),
+            }
+
+    fused: List[Dict[str, Any]] = []
+    for record_id, candidate in candidates.items():
+        lexical_score = lexical_scores.get(record_id, 0.0)
+        fused.append({
+            **candidate,
+            'lexical_score': lexical_score,
+            'score': alpha * candidate['dense_score'] + (1 - alpha) * lexical_score,
+        })
+    return fused
+
+
+async def _search_candidates(
+    query_embedding: List[float],
+    metadata_filter: Optional[Dict[str, Any]],
+    query_text: Optional[str],
+    include_values: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Query the configured backend and return thresholded results, best first.
+
+    Results are flattened (metadata merged at top level, S3 path promoted to
+    'key'). With `include_values`, each result also carries its vector under
+    'values' when the backend can provide it.
+    """
+    backend = app_config.vector_index_backend
+    hybrid = app_config.library_hybrid_enabled and bool(query_text)
+    top_k = app_config.library_hybrid_candidates if hybrid else SEARCH_LIMIT
+    threshold = app_config.library_hybrid_min_score if hybrid else SIMILARITY_THRESHOLD
+
+    if backend == "local":
+        matches = await _query_local(query_embedding, metadata_filter, top_k, include_values)
+    else:
+        matches = await _query_pinecone(query_embedding, metadata_filter, top_k, include_values)
+
+    if hybrid:
+        matches = _fuse_hybrid(matches, query_text or "", query_embedding, metadata_filter)
+
+    # Filter results by threshold (cosine similarity, or the fused score in hybrid mode)
+    filtered_results: List[Dict[str, Any]] = []
+    for match in matches:
+        score = match.get('score', 0.0)
+        if score >= threshold:
+                            
+            metadata = match.get('metadata', {}) or {}
+            # Flatten metadata and keep a generic key for downstream S3 fetch
+            result: Dict[str, Any] = {
+                'id': match.get('id'),
+                'score': score,
+            }
+            if hybrid:
+                result['dense_score'] = match.get('dense_score')
+                result['lexical_score'] = match.get('lexical_score')
+            # Promote common s3 path fields to top-level 'key' for compatibility
+            key = (
+                metadata.get('object_key')
+            )
+            if key:
+                result['key'] = key
+            # Merge all metadata at top-level to preserve existing consumers
+            result.update(metadata)
+            values = match.get('values')
+            if include_values and values is not None and len(values):
+                result['values'] = values
+            filtered_results.append(result)
+
+    logger.debug(f"{backend} index returned {len(matches)} matches")
+    logger.debug(f"Filtered down to {len(filtered_results)} by threshold {threshold}")
+
+    # Sort by score (highest first)
+    filtered_results.sort(key=lambda x: x.get('score', 0.0), reverse=True)
+    return filtered_results
+
+
+def _log_search_results(top_results: List[Dict[str, Any]], **attributes: Any) -> None:
+    """Log the selected search results with logfire."""
+    with logfire.span('vector_search_results',
+                     backend=app_config.vector_index_backend,
+                     hybrid=app_config.library_hybrid_enabled,
+                     top_results_count=len(top_results),
+                     **attributes):
+        for result in top_results:
+            logfire.info(
+                'Search result',
+                result_id=result.get('id'),
+                score=result.get('score'),
+                dense_score=result.get('dense_score'),
+                lexical_score=result.get('lexical_score'),
+                s3_key=result.get('key'),
+            )
+
+
+async def search_vector_index(
+    query_embedding: List[float],
+    metadata_filter: Optional[Dict[str, Any]] = None,
+    query_text: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     """
-    Search the Pinecone index for similar materials.
+    Search the configured vector index (Pinecone or local) for similar materials.
+
+    With hybrid retrieval enabled and `query_text` given, dense matches are
+    fused with BM25 matches and thresholded on the fused score.
 
     Args:
         query_embedding: The embedding vector to search with
+        metadata_filter: Optional metadata pre-filter (Pinecone filter syntax)
+        query_text: Query text for the BM25 side of hybrid retrieval
 
     Returns:
         List of dictionaries containing search results with metadata and scores
@@ -50,99 +252,123 @@ async def search_vector_index(query_embedding: List[float]) -> List[Dict[str, An
     Raises:
         ValueError: If vector search fails
     """
+    backend = app_config.vector_index_backend
     try:
-        index = _get_pinecone_index()
-
-        loop = asyncio.get_event_loop()
-        logger.debug(
-            f"Querying Pinecone index='{app_config.pinecone_index_name}' top_k={SEARCH_LIMIT}"
-        )
-        response = await loop.run_in_executor(
-            None,
-            lambda: index.query(
-                vector=query_embedding,
-                top_k=SEARCH_LIMIT,
-                include_values=False,
-                include_metadata=True,
-            )
-        )
+        filtered_results = await _search_candidates(query_embedding, metadata_filter, query_text)
 
-        # Filter results by similarity threshold (Pinecone returns similarity score)
-        filtered_results: List[Dict[str, Any]] = []
-        for match in getattr(response, 'matches', []) or response.get('matches', []): # type: ignore
-            score = match.get('score', 0.0)
-            if score >= SIMILARITY_THRESHOLD:
-                                
-                metadata = match.get('metadata', {}) or {}
-                # Flatten metadata and keep a generic key for downstream S3 fetch
-                result: Dict[str, Any] = {
-                    'id': match.get('id'),
-                    'score': score,
-                }
-                # Promote common s3 path fields to top-level 'key' for compatibility
-                key = (
-                    metadata.get('object_key')
-                )
-                if key:
-                    result['key'] = key
-                # Merge all metadata at top-level to preserve existing consumers
-                result.update(metadata)
-                filtered_results.append(result)
-
-        logger.debug(f"Pinecone returned {len(getattr(response, 'matches', []) or response.get('matches', []))} matches") # type: ignore
-        logger.debug(f"Filtered down to {len(filtered_results)} by threshold {SIMILARITY_THRESHOLD}")
-        
-        # Sort by score (highest first) and take top 4
-        filtered_results.sort(key=lambda x: x.get('score', 0.0), reverse=True)
-        top_results = filtered_results[:4]
+        # Take top results
+        top_results = filtered_results[:MAX_RESULTS]
         
-        if len(filtered_results) > 4:
-            logger.info(f"Sorted by similarity and selected top 4 from {len(filtered_results)} results")
-        
-        # Log search results with logfire
-        with logfire.span('vector_search_results', 
-                         total_matches=len(getattr(response, 'matches', []) or response.get('matches', [])), # type: ignore
-                         filtered_count=len(filtered_results),
-                         top_results_count=len(top_results),
-                         similarity_threshold=SIMILARITY_THRESHOLD):
-            for result in top_results:
-                logfire.info(
-                    'Search result',
-                    result_id=result.get('id'),
-                    score=result.get('score'),
-                    s3_key=result.get('key'),
-                )
+        if len(filtered_results) > MAX_RESULTS:
+            logger.info(f"Sorted by similarity and selected top {MAX_RESULTS} from {len(filtered_results)} results")
         
+        _log_search_results(
+            top_results,
+            metadata_filtered=bool(metadata_filter),
+            filtered_count=len(filtered_results),
+        )
         return top_results
 
     except Exception as e:
-        logger.error(f"Pinecone search failed: {e}")
-        raise ValueError(f"Pinecone search failed: {e}")
+        logger.error(f"Vector search ({backend}) failed: {e}")
+        raise ValueError(f"Vector search ({backend}) failed: {e}")
+
+
+def _reciprocal_rank_fusion(rankings: List[List[Dict[str, Any]]], k: int = RRF_K) -> List[Dict[str, Any]]:
+    """Fuse ranked result lists; each result gets 'rrf_score' = sum of 1 / (k + rank)."""
+    fused: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, result in enumerate(ranking, start=1):
+            entry = fused.get(result['id'])
+            if entry is None:
+                entry = fused[result['id']] = {**result, 'rrf_score': 0.0}
+            elif result.get('score', 0.0) > entry.get('score', 0.0):
+                entry.update({**result, 'rrf_score': entry['rrf_score']})
+            entry['rrf_score'] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda r: r['rrf_score'], reverse=True)
+
+
+def _select_mmr(candidates: List[Dict[str, Any]], limit: int, mmr_lambda: float) -> List[Dict[str, Any]]:
+    """
+    Pick up to `limit` candidates by maximal marginal relevance.
+
+    Relevance is the normalized RRF score; redundancy is the highest cosine
+    similarity to an already selected document (0 when vectors are unknown).
+    """
+    if len(candidates) <= limit:
+        return candidates
 
+    best = candidates[0]['rrf_score'] or 1.0
+    relevance = np.array([c['rrf_score'] / best for c in candidates], dtype=np.float32)
 
-def extract_s3_paths(results: List[Dict[str, Any]]) -> List[str]:
+    vectors = np.zeros((len(candidates), 0), dtype=np.float32)
+    if all(c.get('values') is not None for c in candidates):
+        vectors = np.asarray([c['values'] for c in candidates], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+    selected: List[int] = [0]
+    while len(selected) < limit:
+        redundancy = (
+            (vectors @ vectors[selected].T).max(axis=1)
+            if vectors.shape[1]
+            else np.zeros(len(candidates), dtype=np.float32)
+        )
+        mmr = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        mmr[selected] = -np.inf
+        selected.append(int(np.argmax(mmr)))
+    return [candidates[i] for i in selected]
+
+
+async def search_vector_index_multi(
+    sub_queries: List[Tuple[str, List[float]]],
+    metadata_filter: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
     """
-    Extract S3 paths from search results.
+    Search with several sub-queries concurrently and fuse the rankings.
+
+    Each sub-query is thresholded like a single search; the rankings are
+    fused with reciprocal-rank fusion and the final documents are picked
+    with MMR, keeping the same result cap as `search_vector_index`.
 
     Args:
-        results: List of search result dictionaries
+        sub_queries: (query text, query embedding) pairs
+        metadata_filter: Optional metadata pre-filter (Pinecone filter syntax)
 
     Returns:
-        List of S3 object paths/keys
+        List of dictionaries containing search results with metadata and scores
+
+    Raises:
+        ValueError: If vector search fails
     """
-    s3_paths: List[str] = []
-
-    for result in results:
-        # Try different possible field names for S3 path
-        s3_path = (
-            result.get('s3_path')
-            or result.get('s3_key')
-            or result.get('bucket_path')
-            or result.get('key')
+    if len(sub_queries) == 1:
+        query_text, query_embedding = sub_queries[0]
+        return await search_vector_index(query_embedding, metadata_filter, query_text)
+
+    backend = app_config.vector_index_backend
+    try:
+        rankings = await asyncio.gather(*(
+            _search_candidates(embedding, metadata_filter, text, include_values=True)
+            for text, embedding in sub_queries
+        ))
+        fused = _reciprocal_rank_fusion(list(rankings))
+        top_results = _select_mmr(fused, MAX_RESULTS, app_config.library_mmr_lambda)
+        for result in top_results:
+            result.pop('values', None)
+
+        logger.info(
+            f"Multi-query search: {len(sub_queries)} sub-queries, {len(fused)} fused candidates, "
+            f"selected {len(top_results)}"
         )
-        if s3_path:
-            s3_paths.append(s3_path)
-            logger.debug(f"Extracted S3 path: {s3_path} (score: {result.get('score', 0):.2f})")
+        _log_search_results(
+            top_results,
+            metadata_filtered=bool(metadata_filter),
+            sub_query_count=len(sub_queries),
+            filtered_count=len(fused),
+        )
+        return top_results
 
-    logger.debug(f"Extracted {len(s3_paths)} S3 paths from {len(results)} search results")
-    return s3_paths
\ No newline at end of file
+    except Exception as e:
+        logger.error(f"Multi-query vector search ({backend}) failed: {e}")
+        raise ValueError(f"Vector search ({backend}) failed: {e}")
@@ -0,0 +1,141 @@
+"""
+Single-flight coalescing of library retrievals.
+
+Teachers in one institution often generate papers for the same course and
+topics within minutes. Identical lookups share one in-flight retrieval (and
+its fetched documents) instead of each embedding, searching and downloading
+the same materials; finished results are kept for a short TTL, within a
+byte budget of their documents.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from src.config import app_config
+
+from .embedding_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def retrieval_key(sub_queries: List[str], metadata_filter: Optional[Dict[str, Any]], *options: Any) -> str:
+    """
+    Return the coalescing key of a library retrieval.
+
+    Args:
+        sub_queries: Sub-query texts (normalized before hashing)
+        metadata_filter: Metadata pre-filter, if any
+        options: Other settings that change the result (e.g. excerpting)
+    """
+    payload = json.dumps(
+        [[normalize_query(q) for q in sub_queries], metadata_filter, list(options)],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+
+    The shared call runs in its own task, so a cancelled caller does not
+    cancel it for the others. Successful results are reused for `ttl_seconds`
+    after they finish (at most `max_entries` of them, together at most
+    `max_bytes` as measured by `size_of`); failures are shared by the callers
+    waiting on them but never cached.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 60.0,
+        max_entries: int = 32,
+        max_bytes: Optional[int] = None,
+        size_of: Callable[[Any], int] = lambda result: 0,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_of = size_of
+        self._in_flight: Dict[str, "asyncio.Task[Any]"] = {}
+        self._results: "OrderedDict[str, Tuple[float, int, Any]]" = OrderedDict()
+        self._retained_bytes = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Return the result of `fn`, shared with identical concurrent calls.
+
+        Args:
+            key: Coalescing key
+            fn: Coroutine factory performing the call
+        """
+        cached = self._results.get(key)
+        if cached is not None:
+            expires_at, _, result = cached
+            if expires_at > time.monotonic():
+                logger.debug(f"Reusing finished retrieval {key[:12]}")
+                return result
+            self._forget(key)
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            logger.debug(f"Joining in-flight retrieval {key[:12]}")
+        return await asyncio.shield(task)
+
+    @property
+    def retained_bytes(self) -> int:
+        """Size of the finished results currently kept."""
+        return self._retained_bytes
+
+    def clear(self) -> None:
+        """Forget finished results (in-flight calls keep running)."""
+        self._results.clear()
+        self._retained_bytes = 0
+
+    def _forget(self, key: str) -> None:
+        _, size, _ = self._results.pop(key)
+        self._retained_bytes -= size
+
+    def _finish(self, key: str, task: "asyncio.Task[Any]") -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+        # Drop expired results now rather than when they are next looked up
+        now = time.monotonic()
+        for expired in [k for k, (expires_at, _, _) in self._results.items() if expires_at <= now]:
+            self._forget(expired)
+
+        if task.cancelled() or task.exception() is not None or self.ttl_seconds <= 0:
+            return
+        result = task.result()
+        size = self.size_of(result)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        if key in self._results:
+            self._forget(key)
+        self._results[key] = (now + self.ttl_seconds, size, result)
+        self._retained_bytes += size
+        while len(self._results) > self.max_entries or (
+            self.max_bytes is not None and self._retained_bytes > self.max_bytes
+        ):
+            self._forget(next(iter(self._results)))
+
+
+# Process-wide coalescing of library retrievals
+library_single_flight = SingleFlight(
+    ttl_seconds=app_config.library_single_flight_ttl_seconds,
+    max_entries=app_config.library_single_flight_max_entries,
+    max_bytes=app_config.library_single_flight_max_bytes,
+    size_of=lambda contents: sum(len(content.data) for content in contents),
+)
@@ -0,0 +1,90 @@
+"""
+BM25 term index over library document text.
+
+Dense summary embeddings miss exact matches on course codes, unit names and
+technical terms. The term index scores those lexically; `search.py` fuses
+the BM25 score with the dense similarity.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "the", "to", "with", "null",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens without stopwords."""
+    return [t for t in _TOKEN_PATTERN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed corpus, with postings stored as NumPy arrays."""
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.size = len(texts)
+
+        postings: Dict[str, List[tuple[int, int]]] = defaultdict(list)
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for doc, text in enumerate(texts):
+            counts = Counter(tokenize(text or ""))
+            lengths[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                postings[term].append((doc, tf))
+
+        self.doc_lengths = lengths
+        self.avg_length = float(lengths.mean()) if self.size and lengths.sum() else 1.0
+        self._postings: Dict[str, tuple[np.ndarray, np.ndarray]] = {
+            term: (
+                np.fromiter((d for d, _ in entries), dtype=np.intp, count=len(entries)),
+                np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries)),
+            )
+            for term, entries in postings.items()
+        }
+
+    def __len__(self) -> int:
+        return self.size
+
+    def idf(self, term: str) -> float:
+        posting = self._postings.get(term)
+        df = 0 if posting is None else len(posting[0])
+        return math.log(1 + (self.size - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: str) -> np.ndarray:
+        """Return the BM25 score of the query against every document."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / self.avg_length)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            docs, tfs = posting
+            scores[docs] += self.idf(term) * tfs * (self.k1 + 1) / (tfs + norm[docs])
+        return scores
+
+    def top(self, query: str, top_k: int, candidates: Optional[np.ndarray] = None) -> List[tuple[int, float]]:
+        """
+        Return up to top_k (document position, score) pairs with a positive score.
+
+        Args:
+            query: Query text
+            top_k: Maximum number of documents
+            candidates: Optional boolean mask restricting eligible documents
+        """
+        scores = self.scores(query)
+        if candidates is not None:
+            scores = np.where(candidates, scores, 0.0)
+        positive = np.flatnonzero(scores > 0)
+        if positive.size == 0 or top_k <= 0:
+            return []
+        order = positive[np.argsort(-scores[positive])][:top_k]
+        return [(int(i), float(scores[i])) for i in order]
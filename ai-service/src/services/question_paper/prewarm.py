@@ -0,0 +1,115 @@
+"""
+Startup cache prewarming.
+
+A new replica loads the persisted access statistics and fills its caches with
+the most requested library documents, query embeddings and rendered images
+before it reports SERVING, so the first wave of requests after a deploy does
+not pay full S3 and embedding latency.
+
+`warm_up` runs the whole startup sequence (LaTeX toolchain and formats,
+local vector index, statistics and caches) while the health service reports
+NOT_SERVING.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Sequence
+
+from grpc_health.v1 import health, health_pb2
+
+from src.config import app_config
+
+from .access_stats import DOCUMENTS, QUERIES, RENDERS, access_stats
+from .library.embedding import generate_embeddings
+from .library.local_index import local_index_store
+from .library.s3_fetcher import fetch_documents_by_path
+from .response_mapper.image.latex_formats import precompile_latex_formats
+from .response_mapper.image.latex_toolchain import discover_latex_toolchain
+from .response_mapper.render_cache import rendered_image_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def _prewarm_documents(n: int) -> int:
+    keys = access_stats.top(DOCUMENTS, n)
+    if not keys:
+        return 0
+    return len(await fetch_documents_by_path(keys, record_access=False))
+
+
+async def _prewarm_embeddings(n: int) -> int:
+    queries = access_stats.top(QUERIES, n)
+    if not queries:
+        return 0
+    return len(await generate_embeddings(queries, record_access=False))
+
+
+async def _prewarm_renders(n: int) -> int:
+    # Only images persisted in the disk tier can be warmed (render plans are not stored)
+    keys = access_stats.top(RENDERS, n)
+    return sum([await rendered_image_cache.get(key) is not None for key in keys])
+
+
+async def prewarm_caches() -> None:
+    """Load the top documents, embeddings and rendered images into the caches."""
+    started = time.perf_counter()
+    steps = {
+        DOCUMENTS: _prewarm_documents(app_config.prewarm_top_documents),
+        QUERIES: _prewarm_embeddings(app_config.prewarm_top_queries),
+        RENDERS: _prewarm_renders(app_config.prewarm_top_renders),
+    }
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*steps.values(), return_exceptions=True),
+            app_config.prewarm_timeout_seconds,
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Cache prewarm timed out after {app_config.prewarm_timeout_seconds}s")
+        return
+
+    summary = []
+    for kind, result in zip(steps, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"Prewarming {kind} failed: {result}")
+        else:
+            summary.append(f"{kind}={result}")
+    logger.info(f"Prewarmed caches in {time.perf_counter() - started:.2f}s ({', '.join(summary)})")
+
+
+def set_serving(health_servicer: health.HealthServicer, service_names: Sequence[str], serving: bool) -> None:
+    """Set the overall ("") and per-service health status."""
+    status = health_pb2.HealthCheckResponse.SERVING if serving else health_pb2.HealthCheckResponse.NOT_SERVING
+    for name in ("", *service_names):
+        health_servicer.set(name, status)
+
+
+async def warm_up(health_servicer: health.HealthServicer, service_names: Sequence[str]) -> None:
+    """
+    Prepare the process for traffic, then report SERVING.
+
+    Args:
+        health_servicer: Health service of the server
+        service_names: Services reported NOT_SERVING until the warm-up has finished
+    """
+    set_serving(health_servicer, service_names, False)
+
+    # Locate pdflatex and ImageMagick once instead of probing on every render
+    discover_latex_toolchain()
+    if app_config.latex_formats_enabled:
+        try:
+            await precompile_latex_formats()
+        except Exception as e:
+            # Documents without a format compile with their full preamble
+            logger.warning(f"Failed to precompile LaTeX formats: {e}")
+
+    # Load (and keep syncing) the in-process vector index
+    if app_config.vector_index_backend == "local" or app_config.library_hybrid_enabled:
+        await local_index_store.start()
+
+    # Warm caches from persisted access statistics
+    if app_config.access_stats_enabled:
+        await access_stats.start()
+        await prewarm_caches()
+
+    set_serving(health_servicer, service_names, True)
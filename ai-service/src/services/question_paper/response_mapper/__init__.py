@@ -9,5 +9,14 @@ from src.services.question_paper.response_mapper.mapper import (
     convert_ai_to_core,
     process_question_images
 )
+from src.services.question_paper.response_mapper.speculative import (
+    SpeculativeImageRenderer,
+    image_content_hash
+)
 
-__all__ = ['convert_ai_to_core', 'process_question_images']
+__all__ = [
+    'convert_ai_to_core',
+    'process_question_images',
+    'SpeculativeImageRenderer',
+    'image_content_hash'
+]
@@ -12,10 +12,13 @@ from src.services.question_paper.response_mapper.image.rendering_interface impor
     ImageRenderStrategy,
     ImageRendererFactory
 )
+from src.services.question_paper.usage import current_usage_tracker
 from src.utils.google_ai_client import get_genai_client
 
 logger = logging.getLogger(__name__)
 
+IMAGEN_MODEL = "imagen-4.0-fast-generate-001"
+
 
 @ImageRendererFactory.register_strategy(AIQuestionImageRenderStrategy.AI_GENERATED)
 class AIGeneratedRenderer(ImageRenderStrategy):
@@ -41,18 +44,26 @@ class AIGeneratedRenderer(ImageRenderStrategy):
         try:
             logger.debug(f"Generating AI image with prompt: {output[:100]}...")
             
+            # Respect the request budget before paying for another image
+            usage_tracker = current_usage_tracker.get()
+            if usage_tracker is not None:
+                usage_tracker.check()
+            
             # Get the GenAI client
             client = get_genai_client()
             
             # Generate image directly using Google GenAI
             response = await client.aio.models.generate_images(
-                model="imagen-4.0-fast-generate-001",
+                model=IMAGEN_MODEL,
                 prompt=output,
                 config=types.GenerateImagesConfig(
                     number_of_images=1
                 )
             )
             
+            if usage_tracker is not None:
+                usage_tracker.record_images(IMAGEN_MODEL, len(response.generated_images or []))
+            
             # Extract the image bytes
             if not response.generated_images:
                 raise RuntimeError("No images generated from AI service")
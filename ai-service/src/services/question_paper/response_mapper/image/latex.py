@@ -2,16 +2,29 @@
 LaTeX rendering strategy for mathematical expressions and documents.
 
 This module uses pdflatex and ImageMagick to render LaTeX content to PNG images.
+Both run as asyncio subprocesses within the TeX job limit (see latex_toolchain).
+Documents with a known preamble compile against a precompiled format (see latex_formats).
+Standalone figures of one paper that share a preamble are compiled together as
+one multi-page document (see render_many).
 """
 
+import asyncio
 import logging
 import os
+import re
 import shutil
-import subprocess
 import tempfile
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
 
+from src.config import app_config
+from src.utils import metrics
 from src.services.question_paper.models.ai_question_paper import AIQuestionImageRenderStrategy
+from src.services.question_paper.response_mapper.image.latex_formats import format_env, prepare_latex_format
+from src.services.question_paper.response_mapper.image.latex_toolchain import (
+    discover_latex_toolchain,
+    run_latex_job,
+)
 from src.services.question_paper.response_mapper.image.rendering_interface import (
     ImageRenderStrategy,
     ImageRendererFactory
@@ -19,6 +32,10 @@ from src.services.question_paper.response_mapper.image.rendering_interface impor
 
 logger = logging.getLogger(__name__)
 
+_STANDALONE_CLASS = re.compile(r"^\s*\\documentclass\s*(?:\[([^\]]*)\])?\s*\{standalone\}")
+_BEGIN_DOCUMENT = "\\begin{document}"
+_END_DOCUMENT = "\\end{document}"
+
 
 @ImageRendererFactory.register_strategy(AIQuestionImageRenderStrategy.LATEX_RENDERED)
 class LaTeXRenderer(ImageRenderStrategy):
@@ -35,6 +52,8 @@ class LaTeXRenderer(ImageRenderStrategy):
         self.dpi = dpi
         self.quality = quality
     
+    supports_batch_rendering = True
+    
     @property
     def strategy_type(self) -> AIQuestionImageRenderStrategy:
         return AIQuestionImageRenderStrategy.LATEX_RENDERED
@@ -60,7 +79,7 @@ class LaTeXRenderer(ImageRenderStrategy):
             logger.debug(f"Rendering LaTeX content (length: {len(output)} chars)")
             
             # Convert LaTeX to image bytes
-            image_bytes = self._latex_to_image(output)
+            image_bytes = await self._latex_to_image(output)
             
             logger.info(f"Successfully rendered LaTeX to image ({len(image_bytes)} bytes)")
             return image_bytes
@@ -69,13 +88,112 @@ class LaTeXRenderer(ImageRenderStrategy):
             logger.error(f"LaTeX rendering failed: {type(e).__name__}: {e}")
             raise RuntimeError(f"LaTeX rendering failed: {e}")
     
-    def _latex_to_image(self, latex_expression: str) -> bytes:
+    async def render_many(self, outputs: List[str]) -> List[Union[bytes, Exception]]:
+        """
+        Render the LaTeX figures of one paper.
+        
+        Standalone figures with the same preamble are grouped (up to
+        LATEX_BATCH_MAX_FIGURES per group) into one multi-page standalone
+        document, compiled once and rasterized page by page in a single
+        ImageMagick run. When a batch fails its figures are rendered one by
+        one, so a broken figure only fails itself.
+        
+        Args:
+            outputs: Complete LaTeX documents to render
+            
+        Returns:
+            PNG bytes, or the exception that failed the render, per output (in order)
+        """
+        results: List[Union[bytes, Exception, None]] = [None] * len(outputs)
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        singles: List[int] = []
+        for index, output in enumerate(outputs):
+            split = _split_standalone_figure(output)
+            if split is None:
+                singles.append(index)
+            else:
+                groups.setdefault(split[:2], []).append(index)
+        
+        batches: List[Tuple[Tuple[str, str], List[int]]] = []
+        max_figures = app_config.latex_batch_max_figures
+        for preamble, indices in groups.items():
+            for start in range(0, len(indices), max_figures):
+                chunk = indices[start:start + max_figures]
+                if len(chunk) > 1:
+                    batches.append((preamble, chunk))
+                else:
+                    singles.extend(chunk)
+        
+        async def render_batch(preamble: Tuple[str, str], indices: List[int]) -> None:
+            bodies = [_split_standalone_figure(outputs[index])[2] for index in indices]  # type: ignore[index]
+            try:
+                images = await self._render_batch(preamble, bodies)
+            except Exception as e:
+                metrics.increment("latex.batch.fallbacks")
+                logger.warning(f"Batched LaTeX compilation of {len(indices)} figures failed, rendering them one by one: {e}")
+                images = await asyncio.gather(*(self.render(outputs[index]) for index in indices), return_exceptions=True)
+            for index, image in zip(indices, images):
+                results[index] = image
+        
+        async def render_single(index: int) -> None:
+            try:
+                results[index] = await self.render(outputs[index])
+            except Exception as e:
+                results[index] = e
+        
+        await asyncio.gather(
+            *(render_batch(preamble, indices) for preamble, indices in batches),
+            *(render_single(index) for index in singles),
+        )
+        return results  # type: ignore[return-value]
+    
+    async def _render_batch(self, preamble: Tuple[str, str], bodies: List[str]) -> List[bytes]:
+        """
+        Compile figure bodies as pages of one standalone document and rasterize every page.
+        
+        Raises:
+            RuntimeError: If compilation or conversion fails, or the page count differs
+        """
+        class_options, preamble_body = preamble
+        options = ",".join(option for option in (class_options, "multi=true") if option)
+        document = "\n".join([
+            f"\\documentclass[{options}]{{standalone}}",
+            preamble_body,
+            _BEGIN_DOCUMENT,
+            *(f"\\begin{{standalone}}\n{body}\n\\end{{standalone}}" for body in bodies),
+            _END_DOCUMENT,
+        ])
+        
+        temp_dir = await asyncio.to_thread(tempfile.mkdtemp)
+        try:
+            temp_path = Path(temp_dir)
+            tex_file = temp_path / "document.tex"
+            
+            await self._compile_document(document, tex_file, temp_dir)
+            await self._convert_pdf_to_png_imagemagick(
+                temp_path / "document.pdf", temp_path / "page-%d.png", all_pages=True
+            )
+            
+            # A figure spilling onto several pages would shift every later image
+            pages = sorted(temp_path.glob("page-*.png"), key=lambda path: int(path.stem.split("-")[1]))
+            if [path.name for path in pages] != [f"page-{page}.png" for page in range(len(bodies))]:
+                raise RuntimeError(f"expected {len(bodies)} pages, got {len(pages)}")
+            images = [await asyncio.to_thread(path.read_bytes) for path in pages]
+        finally:
+            await asyncio.to_thread(self._cleanup_temp_directory, temp_dir)
+        
+        metrics.increment("latex.batch.figures", len(bodies))
+        logger.info(f"Rendered {len(bodies)} LaTeX figures in one batch")
+        return images
+    
+    async def _latex_to_image(self, latex_expression: str) -> bytes:
         """
         Convert complete LaTeX document to image bytes.
 
         Pipeline:
         1. Creates a temporary LaTeX file
-        2. Compiles with pdflatex to generate a tightly-cropped PDF (standalone class)
+        2. Compiles with pdflatex to generate a tightly-cropped PDF (standalone class),
+           against a precompiled format when the preamble is a known one
         3. Converts the first PDF page to PNG using ImageMagick (trimmed, DPI, quality)
         4. Returns PNG image as bytes
         
@@ -91,25 +209,19 @@ class LaTeXRenderer(ImageRenderStrategy):
         temp_dir = None
         try:
             # Create temporary directory for LaTeX processing
-            temp_dir = tempfile.mkdtemp()
+            temp_dir = await asyncio.to_thread(tempfile.mkdtemp)
             temp_path = Path(temp_dir)
             
-            # Write LaTeX content to temporary file
             tex_file = temp_path / "document.tex"
-            with open(tex_file, 'w', encoding='utf-8') as f:
-                f.write(latex_expression.strip())
-            
-            # Compile LaTeX to PDF using pdflatex
             pdf_file = temp_path / "document.pdf"
-            self._compile_latex_to_pdf(tex_file, temp_dir)
+            await self._compile_document(latex_expression.strip(), tex_file, temp_dir)
 
             # Convert PDF to PNG using ImageMagick with tight crop
             png_file = temp_path / "document.png"
-            self._convert_pdf_to_png_imagemagick(pdf_file, png_file)
+            await self._convert_pdf_to_png_imagemagick(pdf_file, png_file)
             
             # Read PNG and return as bytes
-            with open(png_file, 'rb') as f:
-                image_bytes = f.read()
+            image_bytes = await asyncio.to_thread(png_file.read_bytes)
             
             logger.debug(f"Successfully rendered LaTeX to image bytes")
             return image_bytes
@@ -120,54 +232,81 @@ class LaTeXRenderer(ImageRenderStrategy):
         finally:
             # Clean up temporary directory
             if temp_dir and os.path.exists(temp_dir):
-                self._cleanup_temp_directory(temp_dir)
+                await asyncio.to_thread(self._cleanup_temp_directory, temp_dir)
+    
+    async def _compile_document(self, document: str, tex_file: Path, working_dir: str) -> None:
+        """
+        Write a document and compile it, against a precompiled format when its preamble is a known one.
+
+        Raises:
+            RuntimeError: If pdflatex compilation fails
+        """
+        prepared = await prepare_latex_format(document)
+        if prepared is not None:
+            format_name, remainder = prepared
+            tex_file.write_text(remainder.strip(), encoding='utf-8')
+            try:
+                await self._compile_latex_to_pdf(tex_file, working_dir, format_name=format_name)
+                return
+            except RuntimeError as e:
+                logger.info(f"Compiling against format {format_name} failed, using the full preamble: {e}")
+
+        tex_file.write_text(document, encoding='utf-8')
+        await self._compile_latex_to_pdf(tex_file, working_dir)
     
-    def _compile_latex_to_pdf(self, tex_file: Path, working_dir: str) -> None:
+    async def _compile_latex_to_pdf(self, tex_file: Path, working_dir: str, format_name: Optional[str] = None) -> None:
         """
         Compile LaTeX file to PDF using pdflatex.
 
         Args:
             tex_file: Path to the .tex file
             working_dir: Working directory for compilation
+            format_name: Precompiled format to compile against (the file then
+                starts after the preamble the format already holds)
 
         Raises:
             RuntimeError: If pdflatex compilation fails
         """
+        pdflatex = discover_latex_toolchain().pdflatex
+        if pdflatex is None:
+            raise RuntimeError("pdflatex not found. Please install a TeX distribution (e.g., texlive)")
+
+        timeout = app_config.latex_compile_timeout_seconds
         try:
             # Run pdflatex with non-interactive mode
-            result = subprocess.run([
-                'pdflatex',
+            returncode, stdout, stderr = await run_latex_job([
+                pdflatex,
+                *([f'-fmt={format_name}'] if format_name else []),
                 '-interaction=nonstopmode',
                 '-halt-on-error',
                 f'-output-directory={working_dir}',
                 str(tex_file)
             ],
-            capture_output=True,
-            text=True,
             cwd=working_dir,
-            timeout=90
+            timeout=timeout,
+            step='pdflatex',
+            env=format_env() if format_name else None,
             )
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"pdflatex compilation timed out after {timeout:g} seconds")
 
-            if result.returncode != 0:
-                logger.error(f"pdflatex failed with return code {result.returncode}")
-                logger.error(f"stdout: {result.stdout}")
-                logger.error(f"stderr: {result.stderr}")
-                raise RuntimeError(f"pdflatex compilation failed: {result.stderr}")
+        if returncode != 0:
+            logger.error(f"pdflatex failed with return code {returncode}")
+            logger.error(f"stdout: {stdout}")
+            logger.error(f"stderr: {stderr}")
+            raise RuntimeError(f"pdflatex compilation failed: {stderr}")
 
-            logger.debug("Successfully compiled LaTeX to PDF")
-
-        except subprocess.TimeoutExpired:
-            raise RuntimeError("pdflatex compilation timed out after 90 seconds")
-        except FileNotFoundError:
-            raise RuntimeError("pdflatex not found. Please install a TeX distribution (e.g., texlive)")
+        logger.debug("Successfully compiled LaTeX to PDF")
     
-    def _convert_pdf_to_png_imagemagick(self, pdf_file: Path, png_file: Path) -> None:
+    async def _convert_pdf_to_png_imagemagick(self, pdf_file: Path, png_file: Path, all_pages: bool = False) -> None:
         """
         Convert PDF to PNG using ImageMagick with a tight bounding box.
 
         Args:
             pdf_file: Path to input PDF file
-            png_file: Path to output PNG file
+            png_file: Path to output PNG file (a "%d" pattern numbered from 0
+                when converting all pages)
+            all_pages: Convert every page (each trimmed on its own) instead of the first
 
         Raises:
             RuntimeError: If conversion fails or ImageMagick is not installed
@@ -176,10 +315,12 @@ class LaTeXRenderer(ImageRenderStrategy):
         compression_level = max(0, min(9, int(round(self.quality / 11))))
 
         # Use first page only: "[0]"
-        input_spec = f"{pdf_file}[0]"
+        input_spec = str(pdf_file) if all_pages else f"{pdf_file}[0]"
 
-        # Prefer 'magick' (IM7), fall back to 'convert' (IM6)
-        command = self._find_imagemagick_command()
+        # Prefer 'magick' (IM7), fall back to 'convert' (IM6); located once per process
+        command = discover_latex_toolchain().imagemagick
+        if command is None:
+            raise RuntimeError("ImageMagick not found. Please install the 'imagemagick' package")
 
         args = [
             command,
@@ -192,38 +333,21 @@ class LaTeXRenderer(ImageRenderStrategy):
             str(png_file)
         ]
 
+        timeout = app_config.latex_convert_timeout_seconds
         try:
-            result = subprocess.run(
-                args,
-                capture_output=True,
-                text=True,
-                timeout=60
+            returncode, stdout, stderr = await run_latex_job(
+                args, cwd=str(pdf_file.parent), timeout=timeout, step='imagemagick'
             )
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"PDF to PNG conversion timed out after {timeout:g} seconds")
 
-            if result.returncode != 0:
-                logger.error(f"ImageMagick failed with return code {result.returncode}")
-                logger.error(f"stdout: {result.stdout}")
-                logger.error(f"stderr: {result.stderr}")
-                raise RuntimeError(f"PDF to PNG conversion failed: {result.stderr}")
-
-            logger.debug("Successfully converted PDF to PNG via ImageMagick")
+        if returncode != 0:
+            logger.error(f"ImageMagick failed with return code {returncode}")
+            logger.error(f"stdout: {stdout}")
+            logger.error(f"stderr: {stderr}")
+            raise RuntimeError(f"PDF to PNG conversion failed: {stderr}")
 
-        except subprocess.TimeoutExpired:
-            raise RuntimeError("PDF to PNG conversion timed out after 60 seconds")
-        except FileNotFoundError:
-            raise RuntimeError("ImageMagick not found. Please install the 'imagemagick' package")
-    
-    @staticmethod
-    def _find_imagemagick_command() -> str:
-        """Return the ImageMagick executable to use ('magick' if available else 'convert')."""
-        for cmd in ('magick', 'convert'):
-            try:
-                subprocess.run([cmd, '-version'], capture_output=True, text=True, timeout=5)
-                return cmd
-            except Exception:
-                continue
-        # Trigger FileNotFoundError path in callers
-        raise FileNotFoundError('No ImageMagick executable found (tried magick, convert)')
+        logger.debug("Successfully converted PDF to PNG via ImageMagick")
     
     @staticmethod
     def _cleanup_temp_directory(temp_dir: str) -> None:
@@ -240,6 +364,24 @@ class LaTeXRenderer(ImageRenderStrategy):
             logger.warning(f"Failed to clean up temporary directory {temp_dir}: {e}")
 
 
+def _split_standalone_figure(latex: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Split a standalone document into (class options, preamble, body) for batching.
+
+    Returns None for other classes, documents already using the multi option,
+    or anything not shaped as a single \\begin{document} ... \\end{document}.
+    """
+    match = _STANDALONE_CLASS.match(latex)
+    if match is None or "multi" in (match.group(1) or ""):
+        return None
+    rest = latex[match.end():]
+    begin, end = rest.find(_BEGIN_DOCUMENT), rest.rfind(_END_DOCUMENT)
+    if begin < 0 or end < begin or rest.count(_BEGIN_DOCUMENT) != 1 or rest[end + len(_END_DOCUMENT):].strip():
+        return None
+    options = ",".join(option.strip() for option in (match.group(1) or "").split(",") if option.strip())
+    return options, rest[:begin].strip(), rest[begin + len(_BEGIN_DOCUMENT):end].strip()
+
+
 def validate_latex_expression(latex_expression: str) -> bool:
     """
     Validate if a LaTeX expression is likely to render correctly.
@@ -0,0 +1,285 @@
+"""
+Precompiled LaTeX formats for the preambles the model keeps emitting.
+
+Most figures use the standalone class with amsmath/amssymb plus TikZ,
+pgfplots or circuitikz, and pdflatex spends most of a render loading those
+packages. For a known package set the preamble is dumped once into a `.fmt`
+file (`pdflatex -ini "&pdflatex" ... \\dump`); documents whose class line
+matches and which load at least those packages are then compiled against
+the format with only their `\\documentclass` line removed. Packages already
+in the format are skipped by LaTeX, any others load as usual.
+
+Formats exist only for an allow-list of class lines (the common standalone
+options, their multi-page variants used by batched rendering, and
+LATEX_FORMAT_CLASS_LINES), so arbitrary options cannot grow the format
+directory. They are built at startup (or at image build time with
+scripts/build_latex_formats.py); one missing at render time is built in the
+background. Anything else, or a failed compilation against a format, uses
+the full preamble as before.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+from src.config import app_config
+from src.utils import metrics
+
+from .latex_toolchain import discover_latex_toolchain, run_latex_job
+
+logger = logging.getLogger(__name__)
+
+# Package sets dumped into formats, most specific first (packages are loaded without options)
+KNOWN_PACKAGE_SETS: List[Tuple[str, Tuple[str, ...]]] = [
+    ("circuitikz", ("amsmath", "amssymb", "tikz", "circuitikz")),
+    ("pgfplots", ("amsmath", "amssymb", "tikz", "pgfplots")),
+    ("tikz", ("amsmath", "amssymb", "tikz")),
+    ("ams", ("amsmath", "amssymb")),
+]
+# Standalone class options with formats, each also in the multi-page variant batched rendering uses
+STANDALONE_CLASS_OPTIONS = ["", "border=2pt", "border=5pt", "border=10pt"]
+PREBUILT_CLASS_LINES = [
+    f"\\documentclass{'[' + options + ']' if options else ''}{{standalone}}"
+    for base in STANDALONE_CLASS_OPTIONS
+    for options in (base, ",".join(filter(None, [base, "multi=true"])))
+]
+
+_COMMENT = re.compile(r"(?<!\\)%.*$", re.MULTILINE)
+_DOCUMENTCLASS = re.compile(r"\\documentclass\s*(?:\[[^\]]*\])?\s*\{[^}]*\}")
+_USEPACKAGE = re.compile(r"\\usepackage\s*(?:\[([^\]]*)\])?\s*\{([^}]*)\}")
+_BEGIN_DOCUMENT = "\\begin{document}"
+
+_building: Dict[str, "asyncio.Task[Optional[str]]"] = {}
+_building_loop: Optional[asyncio.AbstractEventLoop] = None
+_failed: Set[str] = set()
+
+
+@dataclass(frozen=True)
+class LatexFormat:
+    """A class line plus package set dumped into one format file."""
+    label: str
+    class_line: str
+    packages: Tuple[str, ...]
+
+    @property
+    def name(self) -> str:
+        """Format file name; changes with the class line, packages and the installed pdflatex."""
+        pdflatex = discover_latex_toolchain().pdflatex or ""
+        try:
+            toolchain_id = f"{os.path.realpath(pdflatex)}:{os.stat(pdflatex).st_mtime_ns}"
+        except OSError:
+            toolchain_id = pdflatex
+        payload = "\0".join([self.class_line, *self.packages, toolchain_id]).encode("utf-8")
+        return f"claexa-{self.label}-{hashlib.sha256(payload).hexdigest()[:12]}"
+
+    def source(self) -> str:
+        """The preamble followed by \\dump."""
+        lines = [self.class_line, *(f"\\usepackage{{{package}}}" for package in self.packages), "\\dump"]
+        return "\n".join(lines) + "\n"
+
+
+def _normalize(text: str) -> str:
+    """Drop whitespace outside brace groups (inside them it is significant, e.g. border={2pt 5pt})."""
+    normalized = []
+    depth = 0
+    for char in text:
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth = max(0, depth - 1)
+        elif char.isspace() and depth == 0:
+            continue
+        normalized.append(char)
+    return "".join(normalized)
+
+
+def allowed_class_lines() -> List[str]:
+    """Normalized class lines formats are built for (prebuilt plus LATEX_FORMAT_CLASS_LINES)."""
+    configured = [line for line in app_config.latex_format_class_lines.split(";") if line.strip()]
+    return list(dict.fromkeys(_normalize(line) for line in PREBUILT_CLASS_LINES + configured))
+
+
+def _parse_preamble(latex: str) -> Optional[Tuple[str, FrozenSet[Tuple[str, str]]]]:
+    """
+    Read the class line and the (options, package) pairs of a document's preamble.
+
+    Returns None when the document has no preamble or anything precedes \\documentclass.
+    """
+    end = latex.find(_BEGIN_DOCUMENT)
+    if end < 0:
+        return None
+    preamble = _COMMENT.sub("", latex[:end])
+    match = _DOCUMENTCLASS.search(preamble)
+    if match is None or preamble[:match.start()].strip():
+        return None
+
+    packages = set()
+    for options, names in _USEPACKAGE.findall(preamble):
+        for name in names.split(","):
+            if name.strip():
+                packages.add((_normalize(options), name.strip()))
+    return _normalize(match.group(0)), frozenset(packages)
+
+
+def match_latex_format(latex: str) -> Optional[Tuple[LatexFormat, str]]:
+    """
+    Find the known format a document can be compiled against.
+
+    Returns:
+        Tuple of (format, document without its \\documentclass line), or None
+    """
+    parsed = _parse_preamble(latex)
+    if parsed is None:
+        return None
+    class_line, packages = parsed
+    if class_line not in allowed_class_lines():
+        return None
+    with_options = {package for options, package in packages if options}
+    for label, package_set in KNOWN_PACKAGE_SETS:
+        # A format package loaded again with options would be an option clash
+        if all(("", package) in packages and package not in with_options for package in package_set):
+            remainder = _DOCUMENTCLASS.sub("", latex, count=1)
+            return LatexFormat(label=label, class_line=class_line, packages=package_set), remainder
+    return None
+
+
+def format_dir() -> Path:
+    # Absolute, since pdflatex runs in per-render temporary directories
+    return Path(app_config.latex_format_dir).resolve()
+
+
+def format_env() -> Dict[str, str]:
+    """Environment letting pdflatex find the format files (plus its default format path)."""
+    return {**os.environ, "TEXFORMATS": f"{format_dir()}{os.pathsep}"}
+
+
+async def _build_format(latex_format: LatexFormat) -> Optional[str]:
+    """Dump a format file; returns its name, or None if the build failed."""
+    pdflatex = discover_latex_toolchain().pdflatex
+    if pdflatex is None:
+        return None
+    name = latex_format.name
+    # Build next to the formats, so moving the result into place is a same-filesystem rename
+    await asyncio.to_thread(format_dir().mkdir, parents=True, exist_ok=True)
+    temp_dir = await asyncio.to_thread(tempfile.mkdtemp, prefix=f".{name}-", dir=format_dir())
+    try:
+        (Path(temp_dir) / f"{name}.tex").write_text(latex_format.source(), encoding="utf-8")
+        try:
+            returncode, stdout, _ = await run_latex_job(
+                [pdflatex, "-ini", f"-jobname={name}", "-interaction=nonstopmode", "-halt-on-error", "&pdflatex", f"{name}.tex"],
+                cwd=temp_dir,
+                timeout=app_config.latex_compile_timeout_seconds,
+                step="pdflatex-ini",
+            )
+        except asyncio.TimeoutError:
+            returncode, stdout = -1, "timed out"
+        built = Path(temp_dir) / f"{name}.fmt"
+        if returncode != 0 or not built.exists():
+            logger.warning(f"Failed to build LaTeX format {name}: {stdout[-500:]}")
+            _failed.add(name)
+            return None
+
+        # Move into place atomically so concurrent compilations never see a partial format
+        os.replace(built, format_dir() / f"{name}.fmt")
+        logger.info(f"Built LaTeX format {name} ({latex_format.class_line} + {', '.join(latex_format.packages)})")
+        return name
+    finally:
+        await asyncio.to_thread(shutil.rmtree, temp_dir, True)
+
+
+def _build_once(latex_format: LatexFormat) -> "asyncio.Task[Optional[str]]":
+    global _building_loop
+    loop = asyncio.get_running_loop()
+    if loop is not _building_loop:
+        _building.clear()
+        _building_loop = loop
+    name = latex_format.name
+    task = _building.get(name)
+    if task is None:
+        task = asyncio.create_task(_build_format(latex_format))
+        _building[name] = task
+    return task
+
+
+async def ensure_latex_format(latex_format: LatexFormat, wait: bool = True) -> Optional[str]:
+    """
+    Return the name of a built format, building it if needed.
+
+    Args:
+        latex_format: Format to look up
+        wait: Wait for a missing format to be built; otherwise start the build
+            in the background and return None
+
+    Returns:
+        Format name, or None when it is not (yet) available
+    """
+    name = latex_format.name
+    if (format_dir() / f"{name}.fmt").exists():
+        return name
+    if name in _failed:
+        return None
+    task = _build_once(latex_format)
+    if not wait:
+        return None
+    return await asyncio.shield(task)
+
+
+async def prepare_latex_format(latex: str) -> Optional[Tuple[str, str]]:
+    """
+    Pick a precompiled format for a document.
+
+    Returns:
+        Tuple of (format name, document to compile against it), or None to
+        compile the full document (no match, disabled or format not built yet)
+    """
+    if not app_config.latex_formats_enabled:
+        return None
+    matched = match_latex_format(latex)
+    if matched is None:
+        metrics.increment("latex.format.misses")
+        return None
+    latex_format, remainder = matched
+    name = await ensure_latex_format(latex_format, wait=False)
+    if name is None:
+        metrics.increment("latex.format.misses")
+        return None
+    metrics.increment("latex.format.hits")
+    return name, remainder
+
+
+async def precompile_latex_formats() -> List[str]:
+    """Build the formats of the known package sets for every allowed class line (startup/build time)."""
+    if discover_latex_toolchain().pdflatex is None:
+        return []
+    formats = [
+        LatexFormat(label=label, class_line=class_line, packages=packages)
+        for class_line in allowed_class_lines()
+        for label, packages in KNOWN_PACKAGE_SETS
+    ]
+    results = await asyncio.gather(*(ensure_latex_format(latex_format) for latex_format in formats), return_exceptions=True)
+    names = []
+    for latex_format, result in zip(formats, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"Failed to build LaTeX format {latex_format.name}: {result}")
+        elif result is not None:
+            names.append(result)
+    return names
+
+
+__all__ = [
+    "KNOWN_PACKAGE_SETS",
+    "LatexFormat",
+    "allowed_class_lines",
+    "ensure_latex_format",
+    "format_env",
+    "match_latex_format",
+    "precompile_latex_formats",
+    "prepare_latex_format",
+]
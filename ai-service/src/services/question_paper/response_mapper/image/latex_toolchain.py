@@ -0,0 +1,121 @@
+"""
+LaTeX toolchain discovery and non-blocking job execution.
+
+pdflatex and ImageMagick are located once (at server startup) instead of
+being probed on every render, and run as asyncio subprocesses so a
+compilation never blocks the event loop. At most LATEX_MAX_JOBS TeX jobs
+run at a time; the time spent queued for a job slot and running it are
+recorded as metrics.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from src.config import app_config
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class LatexToolchain:
+    """Executables used to render LaTeX (None when not installed)."""
+    pdflatex: Optional[str]
+    imagemagick: Optional[str]
+
+
+_toolchain: Optional[LatexToolchain] = None
+_job_semaphore: Optional[asyncio.Semaphore] = None
+_job_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def discover_latex_toolchain(refresh: bool = False) -> LatexToolchain:
+    """Locate pdflatex and ImageMagick ('magick' if available else 'convert'), once per process."""
+    global _toolchain
+    if _toolchain is None or refresh:
+        _toolchain = LatexToolchain(
+            pdflatex=shutil.which("pdflatex"),
+            imagemagick=shutil.which("magick") or shutil.which("convert"),
+        )
+        if _toolchain.pdflatex is None or _toolchain.imagemagick is None:
+            logger.warning(
+                f"LaTeX rendering unavailable (pdflatex={_toolchain.pdflatex}, imagemagick={_toolchain.imagemagick})"
+            )
+        else:
+            logger.info(f"LaTeX toolchain: pdflatex={_toolchain.pdflatex}, imagemagick={_toolchain.imagemagick}")
+    return _toolchain
+
+
+def latex_max_jobs() -> int:
+    """Maximum concurrent TeX jobs (LATEX_MAX_JOBS, 0 = number of cores)."""
+    return app_config.latex_max_jobs or os.cpu_count() or 1
+
+
+def _get_job_semaphore() -> asyncio.Semaphore:
+    global _job_semaphore, _job_semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _job_semaphore is None or _job_semaphore_loop is not loop:
+        # Semaphores bind to the loop they are first awaited on
+        _job_semaphore = asyncio.Semaphore(latex_max_jobs())
+        _job_semaphore_loop = loop
+    return _job_semaphore
+
+
+async def run_latex_job(
+    args: List[str],
+    cwd: str,
+    timeout: float,
+    step: str,
+    env: Optional[Dict[str, str]] = None,
+) -> Tuple[int, str, str]:
+    """
+    Run one toolchain command as an asyncio subprocess within the job limit.
+
+    Args:
+        args: Command and arguments
+        cwd: Working directory
+        timeout: Seconds before the process is killed
+        step: Metric label of the command (e.g. "pdflatex", "imagemagick")
+        env: Optional environment (defaults to the server's)
+
+    Returns:
+        Tuple of (return code, stdout, stderr)
+
+    Raises:
+        asyncio.TimeoutError: If the command runs longer than `timeout`
+    """
+    queued = time.perf_counter()
+    async with _get_job_semaphore():
+        started = time.perf_counter()
+        metrics.record("latex.job.queue_wait", started - queued, unit="s", step=step)
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            cwd=cwd,
+            env=env,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        finally:
+            metrics.record("latex.job.run_time", time.perf_counter() - started, unit="s", step=step)
+
+    return (
+        process.returncode if process.returncode is not None else -1,
+        stdout.decode("utf-8", errors="replace"),
+        stderr.decode("utf-8", errors="replace"),
+    )
+
+
+__all__ = ["LatexToolchain", "discover_latex_toolchain", "latex_max_jobs", "run_latex_job"]
@@ -5,9 +5,10 @@ This module defines the interface for different image rendering strategies
 and provides concrete implementations for each rendering type.
 """
 
+import asyncio
 import logging
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import List, Optional, Union
 
 from src.services.question_paper.models.ai_question_paper import AIQuestionImageRenderStrategy
 
@@ -17,6 +18,9 @@ logger = logging.getLogger(__name__)
 class ImageRenderStrategy(ABC):
     """Abstract base class for image rendering strategies."""
     
+    # Whether render_many does better than rendering outputs one by one
+    supports_batch_rendering: bool = False
+    
     @abstractmethod
     async def render(self, output: str) -> bytes:
         """
@@ -33,6 +37,21 @@ class ImageRenderStrategy(ABC):
         """
         pass
     
+    async def render_many(self, outputs: List[str]) -> List[Union[bytes, Exception]]:
+        """
+        Render several outputs of one paper.
+        
+        Strategies that can share work between renders override this (and set
+        supports_batch_rendering); the default renders each output on its own.
+        
+        Args:
+            outputs: The output contents to render
+            
+        Returns:
+            Image bytes, or the exception that failed the render, per output (in order)
+        """
+        return list(await asyncio.gather(*(self.render(output) for output in outputs), return_exceptions=True))
+    
     @property
     @abstractmethod
     def strategy_type(self) -> AIQuestionImageRenderStrategy:
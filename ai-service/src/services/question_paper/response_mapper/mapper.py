@@ -5,8 +5,9 @@ This module provides functionality to map AI-generated question papers
 to the core QuestionPaper model, handling different image rendering strategies.
 """
 
+import asyncio
 import logging
-from typing import List
+from typing import List, Optional
 
 from src.services.question_paper.models.ai_question_paper import AIQuestionPaper, AIQuestion
 from src.services.question_paper.models.core_question_paper import (
@@ -16,67 +17,104 @@ from src.services.question_paper.models.core_question_paper import (
     QuestionImage,
     SubQuestion
 )
-from src.services.question_paper.response_mapper.image import ImageRendererFactory
+from src.services.question_paper.response_mapper.render_cache import render_image
+from src.services.question_paper.response_mapper.speculative import SpeculativeImageRenderer, image_content_hash
 from src.services.question_paper.tools.adapters.byte_to_base64 import ByteToBase64Adapter
 
 logger = logging.getLogger(__name__)
 
 
-async def convert_ai_to_core(ai_paper: AIQuestionPaper) -> QuestionPaper:
+async def convert_ai_to_core(
+    ai_paper: AIQuestionPaper,
+    image_renderer: Optional[SpeculativeImageRenderer] = None,
+) -> QuestionPaper:
     """
     Convert AI question paper to core QuestionPaper model.
     
     This function orchestrates the conversion process, utilizing the strategy pattern
-    for handling different image rendering types.
+    for handling different image rendering types. The paper's images are
+    rendered as one batch, so compatible LaTeX figures compile together, and
+    questions are converted concurrently (renders are bounded per strategy)
+    and keep their order.
     
     Args:
         ai_paper: AI-generated question paper
+        image_renderer: Optional speculative renderer holding images already
+            rendered for candidate papers of the same request
         
     Returns:
         Core QuestionPaper model with all questions and images processed
     """
     logger.info(f"Converting AI question paper '{ai_paper.name}' with {len(ai_paper.questions)} questions")
     
-    questions = []
-    for idx, ai_question in enumerate(ai_paper.questions, 1):
-        logger.debug(f"Processing question {idx}/{len(ai_paper.questions)}")
-        
-        # Convert options
-        options = []
-        if ai_question.options:
-            options = [QuestionOption(text=opt.text) for opt in ai_question.options]
-        
-        # Convert sub-questions
-        sub_questions = []
-        if ai_question.sub_questions:
-            for sub_q in ai_question.sub_questions:
-                sub_options = []
-                if sub_q.options:
-                    sub_options = [QuestionOption(text=opt.text) for opt in sub_q.options]
-                sub_questions.append(SubQuestion(
-                    text=sub_q.text,
-                    marks=sub_q.marks,
-                    options=sub_options
-                ))
-        
-        # Process images using strategy pattern
-        images = await process_question_images(ai_question)
-        
-        questions.append(Question(
-            text=ai_question.text,
-            marks=ai_question.marks,
-            bloom_level=ai_question.bloom_level,
-            options=options,
-            images=images,
-            sub_questions=sub_questions
+    # Start the paper's renders as one batch; questions then await their image
+    owns_renderer = image_renderer is None
+    if image_renderer is None:
+        image_renderer = SpeculativeImageRenderer()
+    image_renderer.prefetch(ai_paper)
+    try:
+        questions = await asyncio.gather(*(
+            convert_question(ai_question, image_renderer)
+            for ai_question in ai_paper.questions
         ))
+    finally:
+        if owns_renderer:
+            await image_renderer.aclose()
     
-    result = QuestionPaper(name=ai_paper.name, questions=questions)
+    result = QuestionPaper(name=ai_paper.name, questions=list(questions))
     logger.info(f"Successfully converted AI question paper to core model with {len(questions)} questions")
     return result
 
 
-async def process_question_images(ai_question: AIQuestion) -> List[QuestionImage]:
+async def convert_question(
+    ai_question: AIQuestion,
+    image_renderer: Optional[SpeculativeImageRenderer] = None,
+) -> Question:
+    """
+    Convert one AI question (options, sub-questions and images) to the core model.
+    
+    Args:
+        ai_question: AI-generated question
+        image_renderer: Optional speculative renderer (see convert_ai_to_core)
+        
+    Returns:
+        Core Question model
+    """
+    # Convert options
+    options = []
+    if ai_question.options:
+        options = [QuestionOption(text=opt.text) for opt in ai_question.options]
+    
+    # Convert sub-questions
+    sub_questions = []
+    if ai_question.sub_questions:
+        for sub_q in ai_question.sub_questions:
+            sub_options = []
+            if sub_q.options:
+                sub_options = [QuestionOption(text=opt.text) for opt in sub_q.options]
+            sub_questions.append(SubQuestion(
+                text=sub_q.text,
+                marks=sub_q.marks,
+                options=sub_options
+            ))
+    
+    # Process images using strategy pattern
+    images = await process_question_images(ai_question, image_renderer)
+    
+    return Question(
+        text=ai_question.text,
+        marks=ai_question.marks,
+        bloom_level=ai_question.bloom_level,
+        options=options,
+        images=images,
+        sub_questions=sub_questions
+    )
+
+
+async def process_question_images(
+    ai_question: AIQuestion,
+    image_renderer: Optional[SpeculativeImageRenderer] = None,
+) -> List[QuestionImage]:
     """
     Process images for AI question using the appropriate rendering strategy.
     
@@ -86,6 +124,8 @@ async def process_question_images(ai_question: AIQuestion) -> List[QuestionImage
     
     Args:
         ai_question: AI question with potential image configuration
+        image_renderer: Optional speculative renderer; images with an unchanged
+            content hash are reused instead of rendered again
         
     Returns:
         List of QuestionImage objects with base64-encoded images
@@ -96,15 +136,16 @@ async def process_question_images(ai_question: AIQuestion) -> List[QuestionImage
         return images
     
     try:
-        # Get the appropriate renderer using the factory
-        renderer = ImageRendererFactory.create_renderer(ai_question.image.render_strategy)
-        
         logger.debug(
             f"Using {ai_question.image.render_strategy.value} strategy to render image"
         )
         
-        # Render the image using the selected strategy
-        image_bytes = await renderer.render(ai_question.image.output)
+        if image_renderer is not None:
+            # Reuse a speculative render of the same image plan when available
+            image_bytes = await image_renderer.render(ai_question.image)
+        else:
+            # Render with the selected strategy, reusing cached renders of the same image plan
+            image_bytes = await render_image(ai_question.image, image_content_hash(ai_question.image))
         
         # Convert bytes to base64
         base64_image = ByteToBase64Adapter.bytes_to_base64(image_bytes)
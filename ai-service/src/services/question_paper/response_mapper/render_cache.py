@@ -0,0 +1,189 @@
+"""
+Cache of rendered question images keyed by image-plan content hash.
+
+The same figure plans (a standard circuit, a common molecule, a textbook
+graph) recur across papers. Rendered bytes are kept in an in-memory LRU and,
+when a directory is configured, on disk so they survive restarts and can be
+prewarmed.
+"""
+
+import asyncio
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple, Union
+
+from src.config import app_config
+from src.services.question_paper.access_stats import RENDERS, access_stats
+from src.services.question_paper.models.ai_question_paper import AIQuestionImage, AIQuestionImageRenderStrategy
+from src.services.question_paper.response_mapper.image import ImageRendererFactory
+from src.services.question_paper.response_mapper.render_limits import render_slot
+
+logger = logging.getLogger(__name__)
+
+
+class RenderedImageCache:
+    """Two-tier (memory LRU, optional disk) cache of rendered image bytes."""
+
+    def __init__(self, max_entries: int = 256, cache_dir: Optional[str] = None):
+        self.max_entries = max_entries
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = Lock()
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Look up rendered bytes, promoting disk hits into memory."""
+        with self._lock:
+            image_bytes = self._entries.get(key)
+            if image_bytes is not None:
+                self._entries.move_to_end(key)
+                return image_bytes
+
+        if self.cache_dir is None:
+            return None
+
+        image_bytes = await asyncio.to_thread(self._read_disk, key)
+        if image_bytes is not None:
+            self._remember(key, image_bytes)
+        return image_bytes
+
+    async def put(self, key: str, image_bytes: bytes) -> None:
+        """Store rendered bytes in memory and, when configured, on disk."""
+        self._remember(key, image_bytes)
+
+        if self.cache_dir is not None:
+            try:
+                await asyncio.to_thread(self._write_disk, key, image_bytes)
+            except OSError as e:
+                logger.warning(f"Failed to persist rendered image {key[:12]}: {e}")
+
+    def clear(self) -> None:
+        """Drop all in-memory entries (disk entries are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key: str, image_bytes: bytes) -> None:
+        with self._lock:
+            self._entries[key] = image_bytes
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        assert self.cache_dir is not None
+        return self.cache_dir / key[:2] / f"{key}.img"
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Unreadable rendered image cache file for {key[:12]}: {e}")
+            return None
+
+    def _write_disk(self, key: str, image_bytes: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file first so concurrent readers never see partial images
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(image_bytes)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+async def render_image(image: AIQuestionImage, key: str) -> bytes:
+    """
+    Render an image plan, reusing cached bytes for the same content hash.
+
+    Renders wait for a slot of their strategy (see render_limits).
+
+    Args:
+        image: AI image configuration (render strategy and output)
+        key: Content hash of the image plan
+
+    Returns:
+        Image as bytes
+    """
+    access_stats.record(RENDERS, key)
+    cached = await rendered_image_cache.get(key)
+    if cached is not None:
+        logger.debug(f"Rendered image cache hit for {key[:12]}")
+        return cached
+
+    return await _render_and_cache(image, key)
+
+
+async def render_images(images: List[Tuple[AIQuestionImage, str]]) -> List[Union[bytes, Exception]]:
+    """
+    Render the image plans of one paper, reusing cached bytes.
+
+    Uncached images of a strategy that supports batch rendering (LaTeX) are
+    handed to its render_many together, in one render slot; all others are
+    rendered one by one as in render_image.
+
+    Args:
+        images: Distinct (image plan, content hash) pairs
+
+    Returns:
+        Image bytes, or the exception that failed the render, per image (in order)
+    """
+    results: List[Union[bytes, Exception, None]] = [None] * len(images)
+    uncached: Dict[AIQuestionImageRenderStrategy, List[int]] = {}
+    for index, (image, key) in enumerate(images):
+        access_stats.record(RENDERS, key)
+        cached = await rendered_image_cache.get(key)
+        if cached is not None:
+            results[index] = cached
+        else:
+            uncached.setdefault(image.render_strategy, []).append(index)
+
+    async def render_group(strategy: AIQuestionImageRenderStrategy, indices: List[int]) -> None:
+        try:
+            renderer = ImageRendererFactory.create_renderer(strategy)
+        except ValueError as e:
+            for index in indices:
+                results[index] = e
+            return
+
+        if renderer.supports_batch_rendering and len(indices) > 1:
+            async with render_slot(strategy):
+                rendered = await renderer.render_many([images[index][0].output for index in indices])
+            for index, image_bytes in zip(indices, rendered):
+                if not isinstance(image_bytes, Exception):
+                    await rendered_image_cache.put(images[index][1], image_bytes)
+        else:
+            rendered = await asyncio.gather(
+                *(_render_and_cache(*images[index]) for index in indices), return_exceptions=True
+            )
+        for index, image_bytes in zip(indices, rendered):
+            results[index] = image_bytes
+
+    await asyncio.gather(*(render_group(strategy, indices) for strategy, indices in uncached.items()))
+    return results  # type: ignore[return-value]
+
+
+async def _render_and_cache(image: AIQuestionImage, key: str) -> bytes:
+    renderer = ImageRendererFactory.create_renderer(image.render_strategy)
+    async with render_slot(image.render_strategy):
+        image_bytes = await renderer.render(image.output)
+    await rendered_image_cache.put(key, image_bytes)
+    return image_bytes
+
+
+# Process-wide rendered image cache
+rendered_image_cache = RenderedImageCache(
+    max_entries=app_config.render_cache_max_entries,
+    cache_dir=app_config.render_cache_dir or None,
+)
@@ -0,0 +1,74 @@
+"""
+Per-strategy concurrency limits for image rendering.
+
+Questions of a paper are converted concurrently, so every render of a
+strategy waits for a slot of that strategy. CPU-bound strategies (LaTeX,
+matplotlib, Graphviz, RDKit) are limited to the number of cores and the
+I/O-bound AI image generation to a higher cap; single strategies can be
+overridden with RENDER_CONCURRENCY_OVERRIDES (e.g. "latex_rendered=2").
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+from src.config import app_config
+from src.services.question_paper.models.ai_question_paper import AIQuestionImageRenderStrategy
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+# Strategies that mostly wait on remote APIs rather than local CPU
+IO_BOUND_STRATEGIES = {AIQuestionImageRenderStrategy.AI_GENERATED}
+
+_semaphores: Dict[AIQuestionImageRenderStrategy, asyncio.Semaphore] = {}
+_semaphores_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _overrides() -> Dict[str, int]:
+    overrides: Dict[str, int] = {}
+    for item in app_config.render_concurrency_overrides.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip().isdigit():
+            overrides[name.strip()] = max(1, int(value))
+    return overrides
+
+
+def render_concurrency(strategy: AIQuestionImageRenderStrategy) -> int:
+    """Maximum concurrent renders of a strategy."""
+    override = _overrides().get(strategy.value)
+    if override is not None:
+        return override
+    if strategy in IO_BOUND_STRATEGIES:
+        return app_config.render_io_concurrency
+    return app_config.render_cpu_concurrency or os.cpu_count() or 1
+
+
+def _semaphore(strategy: AIQuestionImageRenderStrategy) -> asyncio.Semaphore:
+    global _semaphores_loop
+    loop = asyncio.get_running_loop()
+    if loop is not _semaphores_loop:
+        # Semaphores bind to the loop they are first awaited on
+        _semaphores.clear()
+        _semaphores_loop = loop
+    semaphore = _semaphores.get(strategy)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(render_concurrency(strategy))
+        _semaphores[strategy] = semaphore
+    return semaphore
+
+
+@asynccontextmanager
+async def render_slot(strategy: AIQuestionImageRenderStrategy) -> AsyncIterator[None]:
+    """Hold one of the strategy's render slots, recording the time spent waiting for it."""
+    semaphore = _semaphore(strategy)
+    started = time.perf_counter()
+    async with semaphore:
+        metrics.record("images.render.wait", time.perf_counter() - started, unit="s", strategy=strategy.value)
+        yield
+
+
+__all__ = ["IO_BOUND_STRATEGIES", "render_concurrency", "render_slot"]
@@ -0,0 +1,143 @@
+"""
+Speculative image rendering for question papers.
+
+Rendering of a candidate paper can start while the verification agent is
+still reviewing it. Rendered images are keyed by a content hash of the image
+plan, so when verification passes the final paper reuses every image as-is,
+and when it fails only the images whose plan changed are rendered again.
+The images of a paper are rendered as one batch (see render_images), so
+strategies like LaTeX can compile them together.
+"""
+
+import asyncio
+import hashlib
+import logging
+from typing import Dict, List, Set, Tuple
+
+from src.services.question_paper.models.ai_question_paper import AIQuestionImage, AIQuestionPaper
+from src.services.question_paper.response_mapper.render_cache import render_image, render_images
+
+logger = logging.getLogger(__name__)
+
+
+def image_content_hash(image: AIQuestionImage) -> str:
+    """
+    Return a stable content hash for an image plan.
+
+    Args:
+        image: AI image configuration (render strategy and output)
+
+    Returns:
+        Hex-encoded SHA-256 of the strategy and output
+    """
+    payload = f"{image.render_strategy.value}\0{image.output}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class SpeculativeImageRenderer:
+    """
+    Per-request image renderer that can start rendering ahead of time.
+
+    Candidate papers are handed to `prefetch` as soon as they are produced;
+    the final paper is then rendered through `render`, which awaits the
+    in-flight (or finished) task for the same content hash instead of
+    rendering again.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task[bytes]] = {}
+        self._used: Set[str] = set()
+        self._batches: List[Tuple[asyncio.Task, List[str]]] = []
+
+    def prefetch(self, ai_paper: AIQuestionPaper) -> int:
+        """
+        Start rendering every image of a candidate paper in the background.
+
+        Args:
+            ai_paper: Candidate question paper
+
+        Returns:
+            Number of new render tasks started (already known images are skipped)
+        """
+        pending: Dict[str, AIQuestionImage] = {}
+        for ai_question in ai_paper.questions:
+            if not ai_question.image:
+                continue
+            key = image_content_hash(ai_question.image)
+            if key not in self._tasks:
+                pending.setdefault(key, ai_question.image)
+
+        started = len(pending)
+        if pending:
+            batch = asyncio.create_task(render_images([(image, key) for key, image in pending.items()]))
+            for index, key in enumerate(pending):
+                self._tasks[key] = asyncio.create_task(self._batch_result(batch, index))
+            self._batches.append((batch, list(pending)))
+
+        logger.info(
+            f"Speculative rendering started for {started} image(s) "
+            f"({len(self._tasks)} known for this request)"
+        )
+        return started
+
+    async def render(self, image: AIQuestionImage) -> bytes:
+        """
+        Return rendered bytes for an image, reusing a speculative render if available.
+
+        Args:
+            image: AI image configuration of the final paper
+
+        Returns:
+            Image as bytes
+
+        Raises:
+            ValueError: If the render strategy is not supported
+            RuntimeError: If rendering fails
+        """
+        key = image_content_hash(image)
+        task = self._tasks.get(key)
+        if task is None:
+            logger.debug(f"No speculative render for image {key[:12]}, rendering now")
+            task = asyncio.create_task(render_image(image, key))
+            self._tasks[key] = task
+        else:
+            logger.debug(f"Reusing speculative render for image {key[:12]}")
+
+        self._used.add(key)
+        return await task
+
+    @staticmethod
+    async def _batch_result(batch: "asyncio.Task[list]", index: int) -> bytes:
+        # Shielded: cancelling one image must not cancel the rest of its batch
+        result = (await asyncio.shield(batch))[index]
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    async def aclose(self) -> None:
+        """Cancel speculative renders that the final paper did not use."""
+        stale = [
+            task for key, task in self._tasks.items()
+            if key not in self._used and not task.done()
+        ]
+        stale += [
+            batch for batch, keys in self._batches
+            if not batch.done() and not any(key in self._used for key in keys)
+        ]
+        for task in stale:
+            task.cancel()
+        if stale:
+            await asyncio.gather(*stale, return_exceptions=True)
+            logger.info(f"Cancelled {len(stale)} stale speculative render(s)")
+
+        # Retrieve exceptions of finished-but-unused tasks so they are not reported as unhandled
+        for key, task in self._tasks.items():
+            if key not in self._used and task.done() and not task.cancelled():
+                task.exception()
+
+        self._tasks.clear()
+        self._used.clear()
+        self._batches.clear()
+
+
+__all__ = ['SpeculativeImageRenderer', 'image_content_hash']
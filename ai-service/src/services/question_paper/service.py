@@ -1,18 +1,29 @@
+import asyncio
 import logging
-from typing import List
+from typing import Any, Dict, List, Optional
 from pydantic_ai import BinaryContent
+from pydantic_ai.exceptions import UsageLimitExceeded
+from pydantic_ai.usage import RunUsage
     
+from src.config import app_config
 from src.services.question_paper.dto.generate.request import QuestionPaperGenerateRequestDTO
 from src.services.question_paper.dto.generate.response import QuestionPaperGenerateResponseDTO
-from src.utils.converter import map_references_to_binary_contents
+from src.utils.content_hash import dedupe_documents
+from src.utils.converter import compact_references, map_references_to_binary_contents, object_key_for_handle
 from src.utils.errors import ServiceError
 
-from .agent import question_paper_agent
+from .agent import question_paper_agent, generation_model_name
+from .deps import QuestionPaperAgentDeps
 from .user_prompt import build_prompt
 from .mapper import convert_ai_to_core
-from .library.embedding import generate_embedding
-from .library.search import search_vector_index, extract_s3_paths
-from .library.s3_fetcher import fetch_documents_from_s3_paths
+from .response_mapper import SpeculativeImageRenderer
+from .usage import UsageTracker, current_usage_tracker, tenant_usage_ledger
+from .library.filters import build_metadata_filter, build_search_query, build_sub_query_topics
+from .library.query_composer import embed_library_queries
+from .library.search import search_vector_index_multi
+from .library.excerpts import build_excerpt, group_results_by_document
+from .library.s3_fetcher import fetch_documents_by_path
+from .library.single_flight import library_single_flight, retrieval_key
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +32,7 @@ async def _search_library_materials(data: QuestionPaperGenerateRequestDTO) -> Li
     """
     Mandatory RAG search for library materials.
     Builds a structured search query and searches for relevant documents.
+    Identical concurrent searches share one retrieval (see library.single_flight).
     
     Args:
         data: QuestionPaperGenerateRequestDTO containing search parameters
@@ -29,46 +41,21 @@ async def _search_library_materials(data: QuestionPaperGenerateRequestDTO) -> Li
         List of BinaryContent objects from library search
     """
     try:
-        # Build structured search query dynamically based on available data
-        topics_str = ', '.join(data.topics) if isinstance(data.topics, list) else data.topics
+        # Build the structured sub-queries (all topics, then one per topic) and metadata pre-filter
+        topic_groups = build_sub_query_topics(data)
+        sub_queries = [build_search_query(data, topics) for topics in topic_groups]
+        metadata_filter = build_metadata_filter(data)
+        logger.info(
+            f"Performing mandatory library search for: '{sub_queries[0]}' "
+            f"({len(sub_queries)} sub-queries, filter: {metadata_filter})"
+        )
         
-        # Build query with only available fields
-        parts = [
-            f"institution: {data.audience}" if data.audience else None,
-            f"doc_type: {getattr(data, 'doc_type', None)}" if getattr(data, 'doc_type', None) else None,
-            f"subject: {data.course}" if data.course else None,
-            f"academic_year: {getattr(data, 'academic_year', None)}" if getattr(data, 'academic_year', None) else None,
-            f"target_level: {getattr(data, 'target_level', None)}" if getattr(data, 'target_level', None) else None,
-            f"document_code: {getattr(data, 'document_code', None)}" if getattr(data, 'document_code', None) else None,
-            f"language: {getattr(data, 'language', None)}" if getattr(data, 'language', None) else None,
-            f"total_marks: {getattr(data, 'total_marks', None)}" if getattr(data, 'total_marks', None) else None,
-            f"time_limit: {getattr(data, 'time_limit', None)}" if getattr(data, 'time_limit', None) else None,
-            f"key_topics: {topics_str}" if data.topics else None,
-        ]
-        
-        search_query = ' '.join(filter(None, parts))
-        logger.info(f"Performing mandatory library search for: '{search_query}'")
-        
-        # Generate embedding for the concatenated query
-        query_embedding = await generate_embedding(search_query)
-        logger.debug(f"Generated embedding with dimension: {len(query_embedding)}")
-        
-        # Search Pinecone vector index
-        search_results = await search_vector_index(query_embedding)
-        logger.info(f"Pinecone search returned {len(search_results)} results")
-        
-        # Extract S3 paths from search results
-        s3_paths = extract_s3_paths(search_results)
-        logger.info(f"Extracted {len(s3_paths)} S3 paths from search results")
-        
-        # Fetch documents from S3 (top 5 are already limited by search)
-        if s3_paths:
-            binary_contents = await fetch_documents_from_s3_paths(s3_paths)
-            logger.info(f"Successfully fetched {len(binary_contents)} documents from S3")
-            return binary_contents
-        
-        logger.info("No documents found in library search")
-        return []
+        key = retrieval_key(sub_queries, metadata_filter, app_config.library_page_excerpts_enabled)
+        binary_contents = await library_single_flight.do(
+            key, lambda: _retrieve_library_materials(data, topic_groups, sub_queries, metadata_filter)
+        )
+        # Callers share the BinaryContent objects but each gets its own list
+        return list(binary_contents)
         
     except Exception as e:
         # Log error but don't fail the request - proceed without library materials
@@ -76,25 +63,89 @@ async def _search_library_materials(data: QuestionPaperGenerateRequestDTO) -> Li
         return []
 
 
+async def _retrieve_library_materials(
+    data: QuestionPaperGenerateRequestDTO,
+    topic_groups: List[List[str]],
+    sub_queries: List[str],
+    metadata_filter: Optional[Dict[str, Any]],
+) -> List[BinaryContent]:
+    """Embed the sub-queries, search the library and fetch the selected documents."""
+    # Compose sub-query vectors from the topic-vector table (or embed them in one batched call)
+    query_embeddings = await embed_library_queries(data, topic_groups, sub_queries)
+    logger.debug(f"Generated {len(query_embeddings)} embeddings with dimension: {len(query_embeddings[0])}")
+    
+    # Search the vector index per sub-query and fuse the rankings
+    search_results = await search_vector_index_multi(list(zip(sub_queries, query_embeddings)), metadata_filter)
+    logger.info(f"Vector search returned {len(search_results)} results")
+    
+    # Group chunk and summary hits by document (page spans for chunk hits)
+    documents = group_results_by_document(search_results)
+    s3_paths = [document.key for document in documents]
+    logger.info(f"Selected {len(s3_paths)} library documents from search results")
+    
+    # Fetch documents from S3 (top 4 are already limited by search), then cut them to the matching pages
+    if s3_paths:
+        fetched = await fetch_documents_by_path(s3_paths)
+        logger.info(f"Successfully fetched {len(fetched)} documents from S3")
+        # Documents whose download failed (and was skipped) are dropped
+        documents = [document for document in documents if document.key in fetched]
+        binary_contents = [fetched[document.key] for document in documents]
+        if app_config.library_page_excerpts_enabled:
+            binary_contents = await asyncio.gather(*(
+                asyncio.to_thread(build_excerpt, content, document)
+                for content, document in zip(binary_contents, documents)
+            ))
+        return list(binary_contents)
+    
+    logger.info("No documents found in library search")
+    return []
+
+
+async def _compact_user_documents(
+    documents: List[BinaryContent],
+    user_documents: List[BinaryContent],
+) -> List[BinaryContent]:
+    """Compact the user references among the documents (library documents are sent as stored)."""
+    user_document_ids = {id(document) for document in user_documents}
+    targets = [document for document in documents if id(document) in user_document_ids]
+    compacted = dict(zip((id(document) for document in targets), await compact_references(targets)))
+    return [compacted.get(id(document), document) for document in documents]
+
+
 async def generate_question_paper(
     request: QuestionPaperGenerateRequestDTO,
 ) -> QuestionPaperGenerateResponseDTO:
     """Generate a question paper from request DTO."""
+    speculative_renderer = SpeculativeImageRenderer() if app_config.speculative_rendering_enabled else None
+    usage_tracker = UsageTracker.from_config(tenant_id=request.tenant_id)
+    usage_token = current_usage_tracker.set(usage_tracker)
+    tenant_reservation = None
     try:
+        # Step 0: Refuse work for tenants that already reached their ceiling, else hold this request's estimate
+        tenant_reservation = tenant_usage_ledger.reserve(
+            request.tenant_id,
+            app_config.usage_tenant_reservation_usd or app_config.usage_max_request_cost_usd,
+        )
+        
         # Step 1: MANDATORY RAG search - concatenate course+audience, embed, and search library
         library_documents = await _search_library_materials(request)
         logger.info(f"Library search completed with {len(library_documents)} documents")
         
-        # Step 2: Fetch user-provided reference documents (URLs or local paths)
+        # Step 2: Fetch user-provided reference documents (URLs, local paths, bucket keys or upload handles)
         user_documents = []
-        if request.user_reference_media_urls:
+        object_keys = request.user_reference_object_keys + [
+            object_key_for_handle(handle) for handle in request.user_reference_handles
+        ]
+        if request.user_reference_media_urls or object_keys:
             user_documents = await map_references_to_binary_contents(
-                request.user_reference_media_urls
+                request.user_reference_media_urls, object_keys=object_keys
             )
             logger.info(f"Fetched {len(user_documents)} user-provided reference documents")
 
-        # Step 3: Combine library documents and user documents
-        all_documents = library_documents + user_documents
+        # Step 3: Combine library documents and user documents, sending each source file once
+        all_documents = dedupe_documents(library_documents + user_documents)
+        if app_config.reference_compaction_enabled and user_documents:
+            all_documents = await _compact_user_documents(all_documents, user_documents)
         logger.info(f"Total documents for generation: {len(all_documents)}")
 
         # Step 4: Build prompt and generate AI paper
@@ -102,19 +153,51 @@ async def generate_question_paper(
         
         logger.info(f"Generating question paper for: {request.course}")
         
-        # Pass all documents to the agent
-        result = await question_paper_agent.run([prompt, *all_documents])
-        ai_paper = result.output
+        # Pass all documents to the agent; candidate images may start rendering during verification
+        deps = QuestionPaperAgentDeps(speculative_renderer=speculative_renderer, usage=usage_tracker)
+        generation_usage = usage_tracker.track_run(generation_model_name, RunUsage())
+        try:
+            result = await question_paper_agent.run(
+                [prompt, *all_documents],
+                deps=deps,
+                usage=generation_usage,
+                usage_limits=usage_tracker.usage_limits(),
+            )
+            ai_paper = result.output
+        except UsageLimitExceeded as ule:
+            # Stop gracefully with the last verified candidate when there is one
+            candidate = deps.candidate_paper(request.course)
+            if candidate is None:
+                raise
+            logger.warning(f"Usage limit reached during generation ({ule}), returning the last candidate paper")
+            ai_paper = candidate
                         
-        # Step 5: Convert to core model
-        core_paper = await convert_ai_to_core(ai_paper)
+        # Step 5: Convert to core model (reusing speculative renders of unchanged images)
+        core_paper = await convert_ai_to_core(ai_paper, image_renderer=speculative_renderer)
+        
+        usage = usage_tracker.summary()
+        logger.info(
+            f"Request usage: input_tokens={usage.input_tokens} output_tokens={usage.output_tokens} "
+            f"estimated_cost_usd={usage.estimated_cost_usd}"
+        )
         
         # Return response
-        return QuestionPaperGenerateResponseDTO(question_paper=core_paper)
+        return QuestionPaperGenerateResponseDTO(question_paper=core_paper, usage=usage)
 
+    except UsageLimitExceeded as ule:
+        logger.warning(f"Usage limit exceeded: {ule}")
+        raise ServiceError(429, f"Request usage limit reached: {ule}")
+    except ServiceError:
+        raise
     except ValueError as ve:
         logger.warning(f"Validation error: {ve}")
         raise ServiceError(400, str(ve))
     except Exception as err:
         logger.exception("Error generating question paper")
-        raise ServiceError(500, f"Internal server error: {str(err)}")
\ No newline at end of file
+        raise ServiceError(500, f"Internal server error: {str(err)}")
+    finally:
+        if speculative_renderer is not None:
+            await speculative_renderer.aclose()
+        if tenant_reservation is not None:
+            tenant_usage_ledger.settle(tenant_reservation, usage_tracker.estimated_cost_usd)
+        current_usage_tracker.reset(usage_token)
\ No newline at end of file
@@ -39,6 +39,7 @@ _model = OpenAIChatModel(
     provider=openrouter_model_provider,
     settings=settings
 )
+verification_model_name = _model.model_name
     
 _system_prompt = get_system_prompt()
 
@@ -2,7 +2,10 @@ from enum import Enum
 from typing import List, Literal, Optional
 from pydantic import BaseModel
 
-from src.services.question_paper.models.ai_question_paper import AIQuestion, AIQuestionOption, AISubQuestion
+from src.services.question_paper.models.ai_question_paper import AIQuestion, AIQuestionOption, AIQuestionPaper, AISubQuestion
+
+# Bloom level of each difficulty (the system prompt's difficulty table)
+DIFFICULTY_BLOOM_LEVELS = {"easy": 2, "medium": 3, "hard": 4}
 
 class AIQuestionPaperVerificationFeedback(BaseModel):
     """Feedback for AI question paper verification."""
@@ -22,4 +25,20 @@ class AIQuestionWithoutImages(BaseModel):
 
 class AIQuestionPaperWithoutImages(BaseModel):
     """Question paper without images."""
-    questions: List[AIQuestionWithoutImages]
\ No newline at end of file
+    questions: List[AIQuestionWithoutImages]
+
+    def to_question_paper(self, name: str) -> AIQuestionPaper:
+        """Convert to a question paper (without images), e.g. to return a candidate as the result."""
+        return AIQuestionPaper(
+            name=name,
+            questions=[
+                AIQuestion(
+                    text=question.text,
+                    marks=question.marks,
+                    bloom_level=DIFFICULTY_BLOOM_LEVELS[question.difficulty_level],
+                    options=question.options,
+                    sub_questions=question.sub_questions,
+                )
+                for question in self.questions
+            ],
+        )
\ No newline at end of file
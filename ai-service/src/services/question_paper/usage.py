@@ -0,0 +1,315 @@
+"""
+Per-request token and cost accounting for question paper generation.
+
+Every model call made on behalf of a request (the generation agent, the
+verification agent and Imagen renders) is recorded against a `UsageTracker`.
+The tracker estimates cost from a per-model price table and enforces the
+configured per-request and per-tenant ceilings.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+from pydantic_ai.exceptions import UsageLimitExceeded
+from pydantic_ai.usage import RunUsage, UsageLimits
+
+from src.config import app_config
+from src.utils.errors import ServiceError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ModelPrice:
+    """Estimated USD prices for a model."""
+    input_per_million: float = 0.0
+    output_per_million: float = 0.0
+    per_image: float = 0.0
+
+
+# Estimated list prices (USD); override with USAGE_PRICE_OVERRIDES
+DEFAULT_MODEL_PRICES: Dict[str, ModelPrice] = {
+    "learnlm-2.0-flash-experimental": ModelPrice(input_per_million=0.10, output_per_million=0.40),
+    "deepseek/deepseek-chat-v3.1": ModelPrice(input_per_million=0.27, output_per_million=1.00),
+    "imagen-4.0-fast-generate-001": ModelPrice(per_image=0.02),
+}
+
+
+def _load_model_prices() -> Dict[str, ModelPrice]:
+    """Merge the default price table with JSON overrides from configuration."""
+    prices = dict(DEFAULT_MODEL_PRICES)
+    if not app_config.usage_price_overrides:
+        return prices
+
+    try:
+        overrides = json.loads(app_config.usage_price_overrides)
+        for model_name, price in overrides.items():
+            prices[model_name] = ModelPrice(**price)
+    except Exception as e:
+        logger.warning(f"Ignoring invalid USAGE_PRICE_OVERRIDES: {e}")
+    return prices
+
+
+MODEL_PRICES = _load_model_prices()
+
+
+class ModelUsage(BaseModel):
+    """Usage of a single model within one request."""
+    model: str
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    images: int = 0
+    estimated_cost_usd: float = 0.0
+
+
+class RequestUsage(BaseModel):
+    """Usage of all models within one request."""
+    models: List[ModelUsage] = []
+    input_tokens: int = 0
+    output_tokens: int = 0
+    estimated_cost_usd: float = 0.0
+
+
+@dataclass(repr=False, kw_only=True)
+class RequestUsageLimits(UsageLimits):
+    """
+    pydantic-ai limits checked against the usage of the whole request.
+
+    An agent run only sees its own `RunUsage`; these limits also count the
+    other runs attached to the tracker (verification, earlier rounds), so
+    generation and verification share one budget.
+    """
+    tracker: Optional["UsageTracker"] = None
+
+    def check_before_request(self, usage: RunUsage) -> None:
+        super().check_before_request(usage)
+        self._check_request_budget()
+
+    def check_tokens(self, usage: RunUsage) -> None:
+        super().check_tokens(usage)
+        self._check_request_budget()
+
+    def _check_request_budget(self) -> None:
+        reason = self.tracker.exceeded_reason() if self.tracker is not None else None
+        if reason:
+            raise UsageLimitExceeded(f"Request usage limit reached: {reason}")
+
+
+class UsageTracker:
+    """
+    Accumulates model usage for one request and enforces its ceilings.
+
+    Live `RunUsage` objects (for example the one passed to the generation
+    agent run) can be attached with `track_run`; they are read whenever a
+    summary or a budget check is computed, so in-flight usage is included.
+    """
+
+    def __init__(
+        self,
+        tenant_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        max_cost_usd: Optional[float] = None,
+        max_verification_rounds: Optional[int] = None,
+    ):
+        self.tenant_id = tenant_id
+        self.max_tokens = max_tokens
+        self.max_cost_usd = max_cost_usd
+        self.max_verification_rounds = max_verification_rounds
+        self.verification_rounds = 0
+        self._runs: List[Tuple[str, RunUsage]] = []
+        self._images: Dict[str, int] = defaultdict(int)
+
+    @classmethod
+    def from_config(cls, tenant_id: Optional[str] = None) -> "UsageTracker":
+        """Create a tracker with the ceilings from application configuration (0 disables a ceiling)."""
+        return cls(
+            tenant_id=tenant_id,
+            max_tokens=app_config.usage_max_request_tokens or None,
+            max_cost_usd=app_config.usage_max_request_cost_usd or None,
+            max_verification_rounds=app_config.usage_max_verification_rounds or None,
+        )
+
+    def track_run(self, model_name: str, usage: RunUsage) -> RunUsage:
+        """Attach a (possibly still running) agent usage object to this request."""
+        self._runs.append((model_name, usage))
+        return usage
+
+    def record_images(self, model_name: str, count: int = 1) -> None:
+        """Record generated images for an image model."""
+        self._images[model_name] += count
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(usage.input_tokens + usage.output_tokens for _, usage in self._runs)
+
+    @property
+    def estimated_cost_usd(self) -> float:
+        return self.summary().estimated_cost_usd
+
+    def summary(self) -> RequestUsage:
+        """Return per-model usage and estimated cost for this request."""
+        per_model: Dict[str, ModelUsage] = {}
+
+        for model_name, usage in self._runs:
+            entry = per_model.setdefault(model_name, ModelUsage(model=model_name))
+            entry.requests += usage.requests
+            entry.input_tokens += usage.input_tokens
+            entry.output_tokens += usage.output_tokens
+
+        for model_name, count in self._images.items():
+            entry = per_model.setdefault(model_name, ModelUsage(model=model_name))
+            entry.requests += count
+            entry.images += count
+
+        for entry in per_model.values():
+            price = MODEL_PRICES.get(entry.model, ModelPrice())
+            entry.estimated_cost_usd = round(
+                entry.input_tokens * price.input_per_million / 1_000_000
+                + entry.output_tokens * price.output_per_million / 1_000_000
+                + entry.images * price.per_image,
+                6,
+            )
+
+        models = list(per_model.values())
+        return RequestUsage(
+            models=models,
+            input_tokens=sum(m.input_tokens for m in models),
+            output_tokens=sum(m.output_tokens for m in models),
+            estimated_cost_usd=round(sum(m.estimated_cost_usd for m in models), 6),
+        )
+
+    def exceeded_reason(self) -> Optional[str]:
+        """Return why the request budget is exhausted, or None if it is not."""
+        if self.max_tokens is not None and self.total_tokens >= self.max_tokens:
+            return f"token budget of {self.max_tokens} exhausted"
+        if self.max_cost_usd is not None and self.estimated_cost_usd >= self.max_cost_usd:
+            return f"cost budget of ${self.max_cost_usd:.4f} exhausted"
+        return None
+
+    def check(self) -> None:
+        """
+        Raise if the request budget is exhausted.
+
+        Raises:
+            ServiceError: 429 when a per-request ceiling is reached
+        """
+        reason = self.exceeded_reason()
+        if reason:
+            raise ServiceError(429, f"Request usage limit reached: {reason}")
+
+    def usage_limits(self) -> UsageLimits:
+        """Return pydantic-ai limits for an agent run, checked against this request's remaining budget."""
+        return RequestUsageLimits(tracker=self)
+
+    def start_verification_round(self) -> Optional[str]:
+        """
+        Count a verification round.
+
+        Returns:
+            None if the round may run, otherwise the reason it must be skipped
+        """
+        if self.max_verification_rounds is not None and self.verification_rounds >= self.max_verification_rounds:
+            return f"maximum of {self.max_verification_rounds} verification rounds reached"
+        reason = self.exceeded_reason()
+        if reason:
+            return reason
+        self.verification_rounds += 1
+        return None
+
+
+class TenantUsageLedger:
+    """
+    In-process rolling-window ledger of estimated spend per tenant.
+
+    Best-effort: each worker process keeps its own ledger, so with N processes
+    a tenant can spend up to N times the ceiling, and the window starts over
+    when a process restarts. Within a process, `reserve` checks the ceiling
+    and holds an estimate of the request's cost in one step, so concurrent
+    requests of a tenant see each other; `settle` replaces the estimate with
+    the actual cost.
+    """
+
+    def __init__(self, window_seconds: int):
+        self.window_seconds = window_seconds
+        # Entries are [timestamp, cost] lists so a reservation can be settled in place
+        self._charges: Dict[str, Deque[List[float]]] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    def _prune(self, tenant_id: str, now: float) -> Deque[List[float]]:
+        charges = self._charges[tenant_id]
+        while charges and charges[0][0] < now - self.window_seconds:
+            charges.popleft()
+        return charges
+
+    def spent(self, tenant_id: str) -> float:
+        """Return the tenant's estimated spend in the current window."""
+        with self._lock:
+            return sum(cost for _, cost in self._prune(tenant_id, time.monotonic()))
+
+    def charge(self, tenant_id: str, cost_usd: float) -> None:
+        """Add a request's estimated cost to the tenant's window."""
+        if cost_usd <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._prune(tenant_id, now).append([now, cost_usd])
+
+    def reserve(self, tenant_id: Optional[str], estimate_usd: float) -> Optional[List[float]]:
+        """
+        Check the tenant's ceiling and hold an estimated cost against it.
+
+        Args:
+            tenant_id: Tenant of the request (None skips the ceiling)
+            estimate_usd: Cost held until the request settles
+
+        Returns:
+            Reservation to pass to `settle`, or None when no ceiling applies
+
+        Raises:
+            ServiceError: 429 when the per-tenant ceiling is reached
+        """
+        ceiling = app_config.usage_tenant_cost_ceiling_usd
+        if not tenant_id or not ceiling:
+            return None
+        with self._lock:
+            now = time.monotonic()
+            charges = self._prune(tenant_id, now)
+            spent = sum(cost for _, cost in charges)
+            if spent >= ceiling:
+                logger.warning(f"Tenant {tenant_id} reached usage ceiling (${spent:.4f} >= ${ceiling:.4f})")
+                raise ServiceError(429, "Tenant usage limit reached, try again later")
+            reservation = [now, estimate_usd]
+            charges.append(reservation)
+            return reservation
+
+    def settle(self, reservation: List[float], cost_usd: float) -> None:
+        """Replace a reservation's estimate with the request's actual cost."""
+        with self._lock:
+            reservation[1] = cost_usd
+
+
+# Process-wide tenant ledger
+tenant_usage_ledger = TenantUsageLedger(window_seconds=app_config.usage_tenant_window_seconds)
+
+# Tracker of the request being served (propagates into tasks started by the request)
+current_usage_tracker: ContextVar[Optional[UsageTracker]] = ContextVar("current_usage_tracker", default=None)
+
+
+__all__ = [
+    "ModelPrice",
+    "ModelUsage",
+    "RequestUsage",
+    "RequestUsageLimits",
+    "UsageTracker",
+    "TenantUsageLedger",
+    "tenant_usage_ledger",
+    "current_usage_tracker",
+]
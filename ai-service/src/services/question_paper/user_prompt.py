@@ -20,4 +20,8 @@ def build_prompt(request: QuestionPaperGenerateRequestDTO) -> str:
     """
     # Use Pydantic's built-in method to correctly serialize the model to a JSON string.
     # `indent=2` is used for readability in logs; it can be removed for a more compact output.
-    return request.model_dump_json(indent=2) 
\ No newline at end of file
+    # Billing, retrieval and storage-location fields are not part of the generation input.
+    return request.model_dump_json(
+        indent=2,
+        exclude={"tenant_id", "library_filter", "user_reference_object_keys", "user_reference_handles"},
+    ) 
\ No newline at end of file
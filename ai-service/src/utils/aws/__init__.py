@@ -1,3 +1,4 @@
-from .s3_document_fetcher import fetch_documents_from_s3
+from .memory_cache import hot_document_cache
+from .s3_document_fetcher import fetch_documents_by_key, fetch_documents_from_s3, shutdown_s3_executor, upload_document
 
-__all__ = ["fetch_documents_from_s3"] 
\ No newline at end of file
+__all__ = ["fetch_documents_by_key", "fetch_documents_from_s3", "hot_document_cache", "shutdown_s3_executor", "upload_document"]
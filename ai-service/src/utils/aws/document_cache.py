@@ -0,0 +1,214 @@
+"""
+Content-addressed on-disk cache of S3 documents.
+
+Library objects are keyed by the SHA-256 of their bytes, so they never change
+and can be kept on local disk indefinitely (up to a size cap). The cache lives
+in a plain directory, so every worker process on a node shares it: entries are
+written atomically, recency is the file mtime and hit counts live in a small
+sidecar, and eviction holds a lock file, which keeps eviction decisions
+consistent across processes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import Iterator, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Non-POSIX: eviction is only serialized within the process
+    fcntl = None  # type: ignore[assignment]
+
+from src.config import app_config
+
+logger = logging.getLogger(__name__)
+
+_SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def content_hash_of_key(s3_key: str) -> Optional[str]:
+    """Return the SHA-256 an object key is named after, if it is content-addressed."""
+    name = s3_key.rsplit("/", 1)[-1].lower()
+    return name if _SHA256_PATTERN.match(name) else None
+
+
+class DiskDocumentCache:
+    """
+    Size-capped on-disk cache of document bytes keyed by bucket and object key.
+
+    Each entry is a data file plus a JSON sidecar holding the media type, the
+    SHA-256 of the data and the hit count. Reads are checked against the
+    digest (and against the key itself for content-addressed keys); corrupt
+    entries are dropped. When the cache exceeds `max_bytes`, entries are
+    evicted least recently used first ("lru") or least frequently used first
+    ("lfu", ties broken by recency).
+
+    The total size is tracked incrementally from this process's writes; the
+    directory is only rescanned when that estimate exceeds the cap or is
+    older than `rescan_seconds` (other processes write to it as well).
+    """
+
+    LOCK_FILE = ".evict.lock"
+
+    def __init__(self, cache_dir: str, max_bytes: int, policy: str = "lru", rescan_seconds: float = 300.0):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.rescan_seconds = rescan_seconds
+        self._evict_lock = Lock()
+        self._size_bytes: Optional[int] = None
+        self._scanned_at = 0.0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, bucket_name: str, s3_key: str) -> Optional[Tuple[bytes, str]]:
+        """
+        Read a cached document.
+
+        Returns:
+            Tuple of (bytes, media type), or None on a miss
+        """
+        data_path, meta_path = self._paths(bucket_name, s3_key)
+        try:
+            meta = json.loads(meta_path.read_text())
+            data = data_path.read_bytes()
+            if hashlib.sha256(data).hexdigest() != meta["sha256"]:
+                raise ValueError("digest mismatch")
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Discarding corrupt document cache entry for {s3_key}: {e}")
+            self._remove(data_path, meta_path)
+            return None
+
+        self._touch(data_path, meta_path, meta)
+        return data, meta.get("media_type", "application/octet-stream")
+
+    def put(self, bucket_name: str, s3_key: str, data: bytes, media_type: str) -> None:
+        """Store a document, then evict entries beyond the size cap."""
+        if not data:
+            return
+        digest = hashlib.sha256(data).hexdigest()
+        expected = content_hash_of_key(s3_key)
+        if expected is not None and expected != digest:
+            logger.warning(f"Not caching {s3_key}: content does not match its hash key")
+            return
+
+        data_path, meta_path = self._paths(bucket_name, s3_key)
+        data_path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            previous_size = data_path.stat().st_size
+        except OSError:
+            previous_size = 0
+        # Data first, sidecar last: readers treat an entry without a sidecar as a miss
+        self._write_atomic(data_path, data)
+        meta = {"key": s3_key, "media_type": media_type, "sha256": digest, "hits": 0}
+        self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        self._evict(len(data) - previous_size)
+
+    def _paths(self, bucket_name: str, s3_key: str) -> Tuple[Path, Path]:
+        name = content_hash_of_key(s3_key) or hashlib.sha256(s3_key.encode("utf-8")).hexdigest()
+        directory = self.cache_dir / bucket_name / name[:2]
+        return directory / name, directory / f"{name}.json"
+
+    def _touch(self, data_path: Path, meta_path: Path, meta: dict) -> None:
+        try:
+            os.utime(data_path)
+            if self.policy == "lfu":
+                meta["hits"] = meta.get("hits", 0) + 1
+                self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+        except OSError:
+            pass
+
+    def _evict(self, added_bytes: int) -> None:
+        with self._evict_lock:
+            size = self._size_bytes
+            if size is not None and time.monotonic() - self._scanned_at < self.rescan_seconds:
+                self._size_bytes = size = size + added_bytes
+                if size <= self.max_bytes:
+                    return
+            with self._file_lock():
+                self._size_bytes = self._scan_and_evict()
+                self._scanned_at = time.monotonic()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Hold the cache directory's eviction lock (shared by every process on the node)."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.cache_dir / self.LOCK_FILE, "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _scan_and_evict(self) -> int:
+        """Measure the cache and evict down to the cap; returns the size kept."""
+        entries = []
+        total = 0
+        for meta_path in self.cache_dir.glob("*/*/*.json"):
+            data_path = meta_path.with_suffix("")
+            try:
+                stat = data_path.stat()
+                hits = json.loads(meta_path.read_text()).get("hits", 0) if self.policy == "lfu" else 0
+            except (OSError, ValueError):
+                continue
+            total += stat.st_size
+            entries.append((hits, stat.st_mtime, stat.st_size, data_path, meta_path))
+
+        if total <= self.max_bytes:
+            return total
+        entries.sort(key=lambda entry: (entry[0], entry[1]))
+        evicted = 0
+        for _, _, size, data_path, meta_path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(data_path, meta_path)
+            total -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} documents from the disk cache ({total} bytes kept)")
+        return total
+
+    @staticmethod
+    def _remove(data_path: Path, meta_path: Path) -> None:
+        # Sidecar first so concurrent readers see a miss rather than a partial entry
+        for path in (meta_path, data_path):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove document cache file {path}: {e}")
+
+    @staticmethod
+    def _write_atomic(path: Path, payload: bytes) -> None:
+        # Write to a temp file first so concurrent readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+# Node-wide document cache shared by worker processes (None when disabled)
+document_disk_cache: Optional[DiskDocumentCache] = (
+    DiskDocumentCache(
+        app_config.document_cache_dir,
+        max_bytes=app_config.document_cache_max_bytes,
+        policy=app_config.document_cache_policy,
+    )
+    if app_config.document_cache_dir
+    else None
+)
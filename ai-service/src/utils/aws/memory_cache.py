@@ -0,0 +1,149 @@
+"""
+In-process cache of the most popular S3 documents.
+
+The cache holds fetched `BinaryContent` objects under a hard byte budget.
+Admission is TinyLFU-style: a compact frequency sketch counts every access,
+and a new document only displaces resident ones if it has been requested
+more often than each of them, so a one-off huge PDF cannot flush the hot
+set. Hits return the cached object itself, so its bytes are never copied.
+"""
+
+import hashlib
+import logging
+from array import array
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Optional, Tuple
+
+from pydantic_ai import BinaryContent
+
+from src.config import app_config
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class FrequencySketch:
+    """
+    Count-min sketch of access frequencies with periodic aging.
+
+    Counters saturate at 15 and are all halved after `sample_size`
+    increments, so popularity reflects recent traffic.
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, width: int = 1024, sample_size: int = 10_000):
+        self.width = max(16, width)
+        self.sample_size = sample_size
+        self._table = [array("B", bytes(self.width)) for _ in range(self.DEPTH)]
+        self._additions = 0
+
+    def _indexes(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=4 * self.DEPTH).digest()
+        return [int.from_bytes(digest[i * 4:(i + 1) * 4], "little") % self.width for i in range(self.DEPTH)]
+
+    def increment(self, key: str) -> None:
+        """Record one access of `key`."""
+        for row, index in zip(self._table, self._indexes(key)):
+            if row[index] < self.MAX_COUNT:
+                row[index] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._age()
+
+    def frequency(self, key: str) -> int:
+        """Estimated recent access count of `key`."""
+        return min(row[index] for row, index in zip(self._table, self._indexes(key)))
+
+    def _age(self) -> None:
+        for row in self._table:
+            for i in range(len(row)):
+                row[i] >>= 1
+        self._additions //= 2
+
+
+class HotDocumentCache:
+    """
+    Byte-budgeted LRU of documents with TinyLFU admission.
+
+    Hit, miss, eviction and rejected-admission counts are reported under
+    `documents.memory_cache.*`.
+    """
+
+    def __init__(self, max_bytes: int, max_entries_hint: int = 256):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, BinaryContent]" = OrderedDict()
+        self._sketch = FrequencySketch(width=max_entries_hint * 8, sample_size=max_entries_hint * 10)
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[BinaryContent]:
+        """Return the cached document (the same object on every hit), or None."""
+        with self._lock:
+            self._sketch.increment(key)
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+        metrics.increment("documents.memory_cache.hits" if content is not None else "documents.memory_cache.misses")
+        return content
+
+    def put(self, key: str, content: BinaryContent) -> bool:
+        """
+        Offer a fetched document to the cache.
+
+        Returns:
+            Whether the document was admitted
+        """
+        size = len(content.data)
+        with self._lock:
+            if key in self._entries:
+                return True
+            if size > self.max_bytes:
+                admitted, victims = False, []
+            else:
+                admitted, victims = self._admit(key, size)
+            if admitted:
+                for victim_key, _ in victims:
+                    self.size_bytes -= len(self._entries.pop(victim_key).data)
+                self._entries[key] = content
+                self.size_bytes += size
+            size_bytes = self.size_bytes
+
+        if admitted:
+            if victims:
+                metrics.increment("documents.memory_cache.evictions", len(victims))
+            metrics.set_gauge("documents.memory_cache.size", size_bytes, unit="By")
+        else:
+            metrics.increment("documents.memory_cache.rejections")
+            logger.debug(f"Document {key} not admitted to the memory cache ({size} bytes)")
+        return admitted
+
+    def clear(self) -> None:
+        """Drop every cached document."""
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def _admit(self, key: str, size: int) -> Tuple[bool, List[Tuple[str, int]]]:
+        # Walk victims from the LRU end until the candidate fits; each must be colder than it
+        needed = self.size_bytes + size - self.max_bytes
+        candidate_frequency = self._sketch.frequency(key)
+        victims: List[Tuple[str, int]] = []
+        for victim_key, victim in self._entries.items():
+            if needed <= 0:
+                break
+            if self._sketch.frequency(victim_key) >= candidate_frequency:
+                return False, []
+            victims.append((victim_key, len(victim.data)))
+            needed -= len(victim.data)
+        return True, victims
+
+
+# Process-wide hot document cache (None when disabled)
+hot_document_cache: Optional[HotDocumentCache] = (
+    HotDocumentCache(app_config.document_memory_cache_max_bytes)
+    if app_config.document_memory_cache_max_bytes > 0
+    else None
+)
@@ -1,11 +1,16 @@
+import asyncio
 import logging
-from typing import List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 try:
     import boto3
+    from botocore.config import Config as BotoConfig
     from botocore.exceptions import ClientError as BotoClientError, NoCredentialsError as BotoNoCredentialsError
 except ImportError:  # Fallbacks to satisfy type-checkers and runtime except blocks
     boto3 = None  # type: ignore
+    BotoConfig = None  # type: ignore
     BotoClientError = Exception  # type: ignore[assignment]
     BotoNoCredentialsError = Exception  # type: ignore[assignment]
 
@@ -13,11 +18,21 @@ from src.utils.errors import ServiceError
 from pydantic_ai import BinaryContent
 
 from src.config import app_config
+from src.utils import metrics
+
+from .document_cache import document_disk_cache
 
 logger = logging.getLogger(__name__)
 
 # Module-level cached client
 _s3_client = None
+# Dedicated pool for blocking S3 downloads (bounds fetch parallelism)
+_s3_executor: Optional[ThreadPoolExecutor] = None
+# Pool for the byte-range parts of large objects (separate so parts never wait on whole-object downloads)
+_s3_range_executor: Optional[ThreadPoolExecutor] = None
+
+# Response bodies are read in chunks of this size so the download deadline is checked while reading
+READ_CHUNK_BYTES = 1024 ** 2
 
 
 def _get_s3_client():
@@ -35,8 +50,18 @@ def _get_s3_client():
             aws_access_key_id=app_config.aws_access_key_id,
             aws_secret_access_key=app_config.aws_secret_access_key,
             region_name=app_config.aws_region,
+            config=BotoConfig(
+                max_pool_connections=app_config.s3_max_pool_connections,
+                tcp_keepalive=app_config.s3_tcp_keepalive,
+                connect_timeout=app_config.s3_connect_timeout_seconds,
+                read_timeout=app_config.s3_read_timeout_seconds,
+                retries={"mode": app_config.s3_retry_mode, "total_max_attempts": app_config.s3_max_attempts},
+            ),
+        )
+        logger.info(
+            f"Connected to AWS S3 in region: {app_config.aws_region} "
+            f"(pool={app_config.s3_max_pool_connections}, retries={app_config.s3_retry_mode})"
         )
-        logger.info(f"Connected to AWS S3 in region: {app_config.aws_region}")
     except Exception as e:
         logger.error(f"Failed to initialize S3 client: {e}")
         raise ValueError(f"S3 client initialization failed: {e}")
@@ -51,6 +76,149 @@ def reset_s3_client() -> None:
     logger.debug("S3 client cache reset")
 
 
+def _get_s3_executor() -> ThreadPoolExecutor:
+    """Get or create the thread pool that runs blocking S3 downloads."""
+    global _s3_executor
+    if _s3_executor is None:
+        _s3_executor = ThreadPoolExecutor(
+            max_workers=app_config.s3_fetch_concurrency,
+            thread_name_prefix="s3-fetch",
+        )
+    return _s3_executor
+
+
+def _get_s3_range_executor() -> ThreadPoolExecutor:
+    """Get or create the thread pool that downloads byte ranges of large objects."""
+    global _s3_range_executor
+    if _s3_range_executor is None:
+        _s3_range_executor = ThreadPoolExecutor(
+            max_workers=app_config.s3_fetch_concurrency * app_config.s3_range_concurrency,
+            thread_name_prefix="s3-range",
+        )
+    return _s3_range_executor
+
+
+def shutdown_s3_executor() -> None:
+    """Shut down the S3 download pools (new ones are created on next use)."""
+    global _s3_executor, _s3_range_executor
+    for executor in (_s3_executor, _s3_range_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    _s3_executor = None
+    _s3_range_executor = None
+
+
+def _check_deadline(deadline: Optional[float], s3_key: str) -> None:
+    """Raise TimeoutError once the (monotonic) download deadline has passed."""
+    if deadline is not None and time.monotonic() > deadline:
+        raise TimeoutError(f"Download of {s3_key} exceeded its deadline")
+
+
+def _read_body(body, deadline: Optional[float], s3_key: str) -> bytes:
+    """Read a streaming response body, checking the deadline between chunks."""
+    if deadline is None:
+        return body.read()
+    chunks = []
+    while True:
+        try:
+            _check_deadline(deadline, s3_key)
+        except TimeoutError:
+            body.close()
+            raise
+        chunk = body.read(READ_CHUNK_BYTES)
+        if not chunk:
+            return b"".join(chunks)
+        chunks.append(chunk)
+
+
+def _get_range(
+    bucket_name: str, s3_key: str, start: int, end: int, deadline: Optional[float] = None
+) -> Tuple[bytes, dict]:
+    """Download bytes [start, end] of an object (blocking) and record the call."""
+    _check_deadline(deadline, s3_key)
+    started = time.perf_counter()
+    response = _get_s3_client().get_object(Bucket=bucket_name, Key=s3_key, Range=f"bytes={start}-{end}")
+    data = _read_body(response['Body'], deadline, s3_key)
+    metrics.record("s3.get_object.duration", time.perf_counter() - started, unit="s", ranged=True)
+    metrics.increment("s3.get_object.bytes", len(data), unit="By")
+    return data, response
+
+
+def _get_object(bucket_name: str, s3_key: str, deadline: Optional[float] = None) -> Tuple[bytes, str]:
+    """
+    Download an object (blocking); returns its bytes and content type.
+
+    The first request asks for one part only; objects larger than
+    S3_MULTIPART_THRESHOLD_BYTES then fetch their remaining parts as
+    parallel byte-range GETs and are joined into one buffer. Past the
+    (monotonic) `deadline` every part stops at its next chunk and
+    TimeoutError is raised, so an abandoned download frees its pool slots.
+    """
+    part_size = app_config.s3_part_size_bytes
+    started = time.perf_counter()
+    try:
+        response = _get_s3_client().get_object(Bucket=bucket_name, Key=s3_key, Range=f"bytes=0-{part_size - 1}")
+    except BotoClientError as e:  # type: ignore[misc]
+        # Empty objects reject any range; fetch them whole
+        if e.response['Error']['Code'] != 'InvalidRange':  # type: ignore[attr-defined]
+            raise
+        response = _get_s3_client().get_object(Bucket=bucket_name, Key=s3_key)
+    first_part = _read_body(response['Body'], deadline, s3_key)
+    metrics.record("s3.get_object.duration", time.perf_counter() - started, unit="s", ranged=False)
+    metrics.increment("s3.get_object.bytes", len(first_part), unit="By")
+    # Get content type from S3 metadata, default to application/octet-stream
+    content_type = response.get('ContentType', 'application/octet-stream')
+
+    # Content-Range is "bytes 0-<end>/<total>" (absent when the object fits in the first part)
+    content_range = response.get('ContentRange') or ""
+    total = int(content_range.rsplit("/", 1)[-1]) if "/" in content_range else len(first_part)
+    if total <= len(first_part):
+        return first_part, content_type
+
+    if total <= app_config.s3_multipart_threshold_bytes:
+        rest, _ = _get_range(bucket_name, s3_key, len(first_part), total - 1, deadline)
+        return first_part + rest, content_type
+
+    # Split the remainder into parts downloaded in parallel, then join them in order
+    executor = _get_s3_range_executor()
+    ranges = [(start, min(start + part_size, total) - 1) for start in range(len(first_part), total, part_size)]
+    futures = [executor.submit(_get_range, bucket_name, s3_key, start, end, deadline) for start, end in ranges]
+    try:
+        parts = [first_part] + [future.result()[0] for future in futures]
+    except BaseException:
+        # Parts not started yet are dropped; running ones stop at the deadline
+        for future in futures:
+            future.cancel()
+        raise
+    metrics.increment("s3.get_object.ranged", unit="1")
+    logger.debug(f"Fetched {s3_key} as {len(parts)} byte ranges ({total} bytes)")
+    return b"".join(parts), content_type
+
+
+def _load_object(bucket_name: str, s3_key: str, timeout: Optional[float] = None) -> Tuple[bytes, str]:
+    """
+    Read an object from the node's disk cache, downloading (and caching) it on a miss.
+
+    The download `timeout` starts here, once a pool worker has picked the
+    object up, so time spent queued for the pool does not count against it.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    if document_disk_cache is None:
+        return _get_object(bucket_name, s3_key, deadline)
+
+    cached = document_disk_cache.get(bucket_name, s3_key)
+    if cached is not None:
+        logger.debug(f"Document cache hit for {s3_key}")
+        return cached
+
+    content_bytes, content_type = _get_object(bucket_name, s3_key, deadline)
+    try:
+        document_disk_cache.put(bucket_name, s3_key, content_bytes, content_type)
+    except OSError as e:
+        logger.warning(f"Failed to cache document {s3_key} on disk: {e}")
+    return content_bytes, content_type
+
+
 async def fetch_document(s3_key: str, bucket_name: str) -> BinaryContent:
     """
     Fetch a single document from S3.
@@ -66,11 +234,11 @@ async def fetch_document(s3_key: str, bucket_name: str) -> BinaryContent:
 
     try:
         logger.info(f"Fetching document from S3: s3://{resolved_bucket}/{s3_key}")
-        response = _get_s3_client().get_object(Bucket=resolved_bucket, Key=s3_key)
-        content_bytes = response['Body'].read()
-
-        # Get content type from S3 metadata, default to application/octet-stream
-        content_type = response.get('ContentType', 'application/octet-stream')
+        # Read (or download) on the S3 pool so the event loop keeps serving other requests;
+        # the worker enforces the per-object timeout from when it starts the download
+        content_bytes, content_type = await asyncio.get_running_loop().run_in_executor(
+            _get_s3_executor(), _load_object, resolved_bucket, s3_key, app_config.s3_fetch_timeout_seconds or None
+        )
 
         logger.debug(
             f"Fetched S3 object bytes={len(content_bytes)} content_type={content_type}"
@@ -79,6 +247,10 @@ async def fetch_document(s3_key: str, bucket_name: str) -> BinaryContent:
 
         return BinaryContent(data=content_bytes, media_type=content_type)
 
+    except TimeoutError:
+        logger.error(f"Timed out fetching {s3_key} after {app_config.s3_fetch_timeout_seconds}s")
+        raise ServiceError(504, f"Timed out fetching document: {s3_key}")
+
     except BotoClientError as e:  # type: ignore[misc]
         error_code = e.response['Error']['Code']  # type: ignore[assignment]
         logger.error(f"S3 ClientError fetching {s3_key}: {error_code} - {e}")
@@ -101,36 +273,133 @@ async def fetch_document(s3_key: str, bucket_name: str) -> BinaryContent:
         raise ServiceError(500, f"Failed to fetch document from S3: {str(e)}")
 
 
-async def fetch_documents(s3_keys: List[str], bucket_name: Optional[str] = None) -> List[BinaryContent]:
+def _put_object(bucket_name: str, s3_key: str, data: bytes, content_type: str) -> None:
+    """Upload an object (blocking) and seed the node's disk cache with it."""
+    _get_s3_client().put_object(Bucket=bucket_name, Key=s3_key, Body=data, ContentType=content_type)
+    if document_disk_cache is not None:
+        try:
+            document_disk_cache.put(bucket_name, s3_key, data, content_type)
+        except OSError as e:
+            logger.warning(f"Failed to cache document {s3_key} on disk: {e}")
+
+
+async def upload_document(
+    s3_key: str,
+    data: bytes,
+    content_type: str,
+    bucket_name: Optional[str] = None,
+) -> None:
     """
-    Fetch multiple documents from S3.
+    Upload a document to S3 on the S3 pool.
+
+    Args:
+        s3_key: The S3 object key to write
+        data: Document bytes
+        content_type: Media type stored as the object's ContentType
+        bucket_name: Optional bucket name, defaults to configured bucket
+    """
+    resolved_bucket = bucket_name or app_config.aws_s3_bucket_name
+
+    try:
+        logger.info(f"Uploading document to S3: s3://{resolved_bucket}/{s3_key} ({len(data)} bytes)")
+        upload = asyncio.get_running_loop().run_in_executor(
+            _get_s3_executor(), _put_object, resolved_bucket, s3_key, data, content_type
+        )
+        await asyncio.wait_for(upload, app_config.s3_fetch_timeout_seconds or None)
+        metrics.increment("s3.put_object.bytes", len(data), unit="By")
+
+    except asyncio.TimeoutError:
+        logger.error(f"Timed out uploading {s3_key} after {app_config.s3_fetch_timeout_seconds}s")
+        raise ServiceError(504, f"Timed out uploading document: {s3_key}")
+
+    except BotoClientError as e:  # type: ignore[misc]
+        error_code = e.response['Error']['Code']  # type: ignore[assignment]
+        logger.error(f"S3 ClientError uploading {s3_key}: {error_code} - {e}")
+
+        if error_code == 'NoSuchBucket':
+            raise ServiceError(404, f"Bucket not found: {resolved_bucket}")
+        elif error_code == 'AccessDenied':
+            raise ServiceError(403, f"Access denied to document: {s3_key}")
+        else:
+            raise ServiceError(500, f"S3 error uploading document: {error_code}")
+
+    except BotoNoCredentialsError:  # type: ignore[misc]
+        logger.error("AWS credentials not found")
+        raise ServiceError(500, "AWS credentials not configured")
+
+    except Exception as e:
+        logger.error(f"Unexpected error uploading {s3_key}: {e}")
+        raise ServiceError(500, f"Failed to upload document to S3: {str(e)}")
+
+
+async def fetch_documents_by_key(
+    s3_keys: List[str],
+    bucket_name: Optional[str] = None,
+    skip_failed: Optional[bool] = None,
+) -> Dict[str, BinaryContent]:
+    """
+    Fetch multiple documents from S3 concurrently.
+
+    Parallelism is bounded by the S3 pool size (S3_FETCH_CONCURRENCY).
 
     Args:
         s3_keys: List of S3 object keys to fetch
         bucket_name: Optional bucket name, defaults to configured bucket
+        skip_failed: Drop documents that fail instead of failing the whole
+            call (defaults to S3_FETCH_SKIP_FAILED)
 
     Returns:
-        List of BinaryContent objects
+        Mapping of S3 key to BinaryContent, in the order of `s3_keys`
     """
     if not s3_keys:
-        return []
+        return {}
 
     resolved_bucket = bucket_name or app_config.aws_s3_bucket_name
-    fetched_contents: List[BinaryContent] = []
+    if skip_failed is None:
+        skip_failed = app_config.s3_fetch_skip_failed
+    unique_keys = list(dict.fromkeys(s3_keys))
+
+    results = await asyncio.gather(
+        *(fetch_document(s3_key, resolved_bucket) for s3_key in unique_keys),
+        return_exceptions=True,
+    )
+
+    fetched_contents: Dict[str, BinaryContent] = {}
+    for s3_key, result in zip(unique_keys, results):
+        if isinstance(result, BaseException):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if not skip_failed:
+                if isinstance(result, ServiceError):
+                    # Re-raise service errors (already logged in fetch_document)
+                    raise result
+                logger.error(f"Unexpected error fetching document {s3_key}: {result}")
+                raise ServiceError(500, f"Failed to fetch document {s3_key}: {str(result)}")
+            logger.warning(f"Skipping document {s3_key}: {result}")
+            continue
+        fetched_contents[s3_key] = result
+
+    logger.info(f"Successfully fetched {len(fetched_contents)}/{len(unique_keys)} documents from S3")
+    return fetched_contents
 
-    for s3_key in s3_keys:
-        try:
-            content = await fetch_document(s3_key, resolved_bucket)
-            fetched_contents.append(content)
-        except ServiceError:
-            # Re-raise service errors (already logged in fetch_document)
-            raise
-        except Exception as e:
-            logger.error(f"Unexpected error fetching document {s3_key}: {e}")
-            raise ServiceError(500, f"Failed to fetch document {s3_key}: {str(e)}")
 
-    logger.info(f"Successfully fetched {len(fetched_contents)} documents from S3")
-    return fetched_contents
+async def fetch_documents(
+    s3_keys: List[str],
+    bucket_name: Optional[str] = None,
+    skip_failed: Optional[bool] = None,
+) -> List[BinaryContent]:
+    """
+    Fetch multiple documents from S3 concurrently.
+
+    Args:
+        s3_keys: List of S3 object keys to fetch
+        bucket_name: Optional bucket name, defaults to configured bucket
+        skip_failed: Drop documents that fail instead of failing the whole call
+
+    Returns:
+        List of BinaryContent objects (skipped documents are left out)
+    """
+    return list((await fetch_documents_by_key(s3_keys, bucket_name, skip_failed)).values())
 
 
 async def fetch_documents_from_s3(s3_keys: List[str], bucket_name: Optional[str] = None) -> List[BinaryContent]:
@@ -0,0 +1,72 @@
+"""
+Content hashes of generation documents.
+
+Every document is stamped with the SHA-256 of its source file as it is
+loaded, carried in `BinaryContent.identifier`. Library object keys already
+are that hash, upload handles too, and downloads hash while streaming, so
+most documents never need a separate pass. Derived documents (page
+excerpts, compacted references) keep their source's hash, which lets the
+same file coming from the library and from a user reference be sent once.
+"""
+
+import hashlib
+import logging
+import re
+from typing import Dict, List, Optional
+
+from pydantic_ai import BinaryContent
+
+from src.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_SHA256_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def is_content_hash(value: Optional[str]) -> bool:
+    """Whether a string is a SHA-256 hex digest (e.g. a content-addressed object key)."""
+    return bool(value) and _SHA256_PATTERN.match(value) is not None  # type: ignore[arg-type]
+
+
+def with_content_hash(content: BinaryContent, digest: Optional[str] = None) -> BinaryContent:
+    """Return the content stamped with its source hash (computed when not given)."""
+    digest = digest or hashlib.sha256(content.data).hexdigest()
+    if content.identifier == digest:
+        return content
+    return BinaryContent(data=content.data, media_type=content.media_type, identifier=digest)
+
+
+def content_hash(content: BinaryContent) -> str:
+    """Source hash of a document, hashing its bytes if it was never stamped."""
+    if is_content_hash(content.identifier):
+        return content.identifier
+    return hashlib.sha256(content.data).hexdigest()
+
+
+def dedupe_documents(documents: List[BinaryContent]) -> List[BinaryContent]:
+    """
+    Drop documents whose source was already included.
+
+    Of several documents from the same source the largest is kept (a user's
+    whole textbook over the library's page excerpt of it), at the position
+    of the first one.
+    """
+    kept: Dict[str, int] = {}
+    deduped: List[BinaryContent] = []
+    for content in documents:
+        digest = content_hash(content)
+        index = kept.get(digest)
+        if index is None:
+            kept[digest] = len(deduped)
+            deduped.append(content)
+        elif len(content.data) > len(deduped[index].data):
+            deduped[index] = content
+
+    dropped = len(documents) - len(deduped)
+    if dropped:
+        logger.info(f"Dropped {dropped} duplicate documents before generation")
+        metrics.increment("documents.duplicates_dropped", dropped, unit="1")
+    return deduped
+
+
+__all__ = ["content_hash", "dedupe_documents", "is_content_hash", "with_content_hash"]
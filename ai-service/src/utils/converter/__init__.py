@@ -2,11 +2,18 @@ from pathlib import Path
 from typing import Union
 
 from pydantic_ai import BinaryContent
+from .reference_compaction import compact_references, shutdown_compaction_executor
 from .reference_mapper import map_references_to_binary_contents
+from .reference_upload import ReferenceUpload, UploadedReference, object_key_for_handle
 
 
 __all__ = [
+    "compact_references",
     "map_references_to_binary_contents",
+    "object_key_for_handle",
+    "ReferenceUpload",
+    "UploadedReference",
+    "shutdown_compaction_executor",
 ]
 
 
@@ -0,0 +1,147 @@
+"""
+HTTP cache for user reference downloads.
+
+Teachers regenerate papers with the same uploaded references, so downloads
+are cached per URL with their validators (ETag, Last-Modified) and freshness
+(Cache-Control max-age). A fresh entry is served without a request; a stale
+one is revalidated with a conditional GET, so unchanged references cost a
+304 round-trip at most. Bodies are stored content-addressed (by SHA-256) in
+a size-capped DiskDocumentCache, so identical files behind different URLs
+are stored once.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from src.config import app_config
+from src.utils.aws.document_cache import DiskDocumentCache
+
+logger = logging.getLogger(__name__)
+
+BLOB_NAMESPACE = "references"
+
+_MAX_AGE_PATTERN = re.compile(r"(?:^|,)\s*(?:s-maxage|max-age)\s*=\s*(\d+)", re.IGNORECASE)
+
+
+@dataclass
+class CachedReference:
+    """Cache entry of one reference URL."""
+    url: str
+    sha256: str
+    media_type: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fresh_until: float = 0.0
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.fresh_until
+
+    def conditional_headers(self) -> Dict[str, str]:
+        """Request headers revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def _cache_policy(headers) -> Tuple[bool, float]:
+    """
+    Read Cache-Control from response headers.
+
+    Returns:
+        Tuple of (storable, freshness lifetime in seconds)
+    """
+    cache_control = (headers.get("cache-control") or "").lower()
+    if "no-store" in cache_control:
+        return False, 0.0
+    if "no-cache" in cache_control:
+        return True, 0.0
+    match = _MAX_AGE_PATTERN.search(cache_control)
+    return True, float(match.group(1)) if match else 0.0
+
+
+class ReferenceCache:
+    """URL index (validators, freshness) over a content-addressed body store."""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.index_dir = Path(cache_dir) / "urls"
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.blobs = DiskDocumentCache(str(Path(cache_dir) / "blobs"), max_bytes=max_bytes)
+
+    def lookup(self, url: str) -> Optional[CachedReference]:
+        """Return the entry of a URL, or None when unknown."""
+        try:
+            return CachedReference(**json.loads(self._index_path(url).read_text()))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"Discarding unreadable reference cache entry for {url}: {e}")
+            return None
+
+    def load(self, entry: CachedReference) -> Optional[bytes]:
+        """Read the cached body of an entry (None if it was evicted or is corrupt)."""
+        cached = self.blobs.get(BLOB_NAMESPACE, entry.sha256)
+        return cached[0] if cached is not None else None
+
+    def store(self, url: str, data: bytes, media_type: str, headers) -> Optional[CachedReference]:
+        """Cache a downloaded body if its response allows it."""
+        storable, max_age = _cache_policy(headers)
+        etag, last_modified = headers.get("etag"), headers.get("last-modified")
+        if not storable or not (etag or last_modified or max_age > 0):
+            return None
+
+        entry = CachedReference(
+            url=url,
+            sha256=hashlib.sha256(data).hexdigest(),
+            media_type=media_type,
+            etag=etag,
+            last_modified=last_modified,
+            fresh_until=time.time() + max_age,
+        )
+        self.blobs.put(BLOB_NAMESPACE, entry.sha256, data, media_type)
+        self._write_entry(entry)
+        return entry
+
+    def revalidated(self, entry: CachedReference, headers) -> None:
+        """Record a 304: refresh freshness and any updated validators."""
+        _, max_age = _cache_policy(headers)
+        entry.etag = headers.get("etag") or entry.etag
+        entry.last_modified = headers.get("last-modified") or entry.last_modified
+        entry.fresh_until = time.time() + max_age
+        self._write_entry(entry)
+
+    def _index_path(self, url: str) -> Path:
+        name = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.index_dir / name[:2] / f"{name}.json"
+
+    def _write_entry(self, entry: CachedReference) -> None:
+        path = self._index_path(entry.url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file first so concurrent readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(asdict(entry), f)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+# Node-wide reference cache (None when disabled)
+reference_cache: Optional[ReferenceCache] = (
+    ReferenceCache(app_config.reference_cache_dir, max_bytes=app_config.reference_cache_max_bytes)
+    if app_config.reference_cache_dir
+    else None
+)
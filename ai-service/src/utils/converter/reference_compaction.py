@@ -0,0 +1,399 @@
+"""
+Compaction of user references before generation.
+
+Phone-scanned PDFs routinely carry 20 MB page images that only inflate the
+model request. When enabled, each large user reference is normalized in a
+process pool (the work is CPU-bound): PDF page images are downsampled to a
+target DPI and re-encoded as JPEG, blank and duplicate pages are dropped and
+identical objects are merged; standalone images are downscaled and
+converted to JPEG (WebP when they carry transparency). Results that are
+smaller than the input are cached by content hash. Compaction is
+best-effort: any failure, timeout or output that is not smaller keeps the
+original document.
+
+At most one job per pool process is submitted at a time, so the timeout
+covers the compaction itself rather than time spent queued. A job that
+times out cannot be interrupted inside its process, so the pool is
+terminated and replaced (compactions running alongside it fall back to
+their originals).
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from threading import Lock
+from typing import List, Optional, Tuple
+
+from pydantic_ai import BinaryContent
+
+try:
+    from pypdf import PdfReader, PdfWriter
+except ImportError:  # PDFs are passed through unchanged
+    PdfReader = None  # type: ignore[assignment,misc]
+    PdfWriter = None  # type: ignore[assignment,misc]
+
+try:
+    from PIL import Image, ImageStat
+except ImportError:  # Images are passed through unchanged
+    Image = None  # type: ignore[assignment]
+    ImageStat = None  # type: ignore[assignment]
+
+from src.config import app_config
+from src.utils import metrics
+from src.utils.aws.document_cache import document_disk_cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_NAMESPACE = "compacted-references"
+# Long edge of an A4 page in inches (sets the pixel budget of standalone images)
+_PAGE_LONG_EDGE_INCHES = 11.69
+# Grayscale standard deviation below which a scanned page counts as blank
+_BLANK_STDDEV = 2.5
+# Only downsample images this much denser than the target DPI
+_DPI_TOLERANCE = 1.25
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+_slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+@dataclass(frozen=True)
+class CompactionSettings:
+    """Parameters of one compaction run (part of the cache key)."""
+    target_dpi: int
+    jpeg_quality: int
+
+    @classmethod
+    def from_config(cls) -> "CompactionSettings":
+        return cls(
+            target_dpi=app_config.reference_compaction_target_dpi,
+            jpeg_quality=app_config.reference_compaction_jpeg_quality,
+        )
+
+    def cache_key(self, data: bytes) -> str:
+        fingerprint = repr(sorted(asdict(self).items())).encode("utf-8")
+        return hashlib.sha256(hashlib.sha256(data).digest() + fingerprint).hexdigest()
+
+
+def _downscale(image, max_width: int, max_height: int):
+    """Shrink a PIL image to fit the box (never enlarges)."""
+    if image.width <= max_width and image.height <= max_height:
+        return image
+    scaled = image.copy()
+    scaled.thumbnail((max(max_width, 1), max(max_height, 1)), Image.Resampling.LANCZOS)
+    return scaled
+
+
+def _image_fingerprint(image) -> bytes:
+    """Average hash of a 16x16 grayscale thumbnail (equal for re-scans of a page)."""
+    small = image.convert("L").resize((16, 16), Image.Resampling.BILINEAR)
+    pixels = small.tobytes()
+    mean = sum(pixels) / len(pixels)
+    return bytes(int(pixel > mean) for pixel in pixels)
+
+
+def _is_blank_image(image) -> bool:
+    return ImageStat.Stat(image.convert("L")).stddev[0] < _BLANK_STDDEV
+
+
+def _page_images(page) -> list:
+    try:
+        return [image_file.image for image_file in page.images if image_file.image is not None]
+    except Exception:  # Undecodable image filters: treat as opaque content
+        return []
+
+
+def _page_signature(page) -> Tuple[Optional[bytes], bool]:
+    """
+    Fingerprint a PDF page and tell whether it is blank.
+
+    Returns:
+        Tuple of (fingerprint or None when the page cannot be compared, blank)
+    """
+    contents = page.get_contents()
+    content_bytes = contents.get_data() if contents is not None else b""
+    text = (page.extract_text() or "").strip()
+    images = _page_images(page)
+    resources = page["/Resources"] if "/Resources" in page else {}
+    has_xobjects = "/XObject" in resources
+
+    if images:
+        blank = not text and all(_is_blank_image(image) for image in images)
+    else:
+        blank = not text and not has_xobjects and not content_bytes.strip()
+    if has_xobjects and not images:
+        # Form XObjects are not inspected, so such pages are never treated as duplicates
+        return None, False
+
+    digest = hashlib.sha256(content_bytes)
+    digest.update(text.encode("utf-8"))
+    for image in images:
+        digest.update(_image_fingerprint(image))
+    return digest.digest(), blank
+
+
+def compact_pdf(data: bytes, settings: CompactionSettings) -> bytes:
+    """
+    Compact a PDF: drop blank and duplicate pages, downsample page images, merge identical objects.
+
+    Linearization is not attempted (pypdf cannot write linearized files).
+
+    Raises:
+        ImportError: If pypdf or Pillow is not installed
+    """
+    if PdfReader is None or PdfWriter is None or Image is None:
+        raise ImportError("pypdf and Pillow are required. Install with: pip install 'pypdf[image]'")
+
+    reader = PdfReader(io.BytesIO(data))
+    writer = PdfWriter()
+    seen = set()
+    for page in reader.pages:
+        fingerprint, blank = _page_signature(page)
+        if blank or (fingerprint is not None and fingerprint in seen):
+            continue
+        if fingerprint is not None:
+            seen.add(fingerprint)
+        writer.add_page(page)
+
+    if not writer.pages:
+        # Every page looked blank; keep the document as it is rather than sending nothing
+        return data
+
+    for page in writer.pages:
+        width_inches = float(page.mediabox.width) / 72 or 1.0
+        height_inches = float(page.mediabox.height) / 72 or 1.0
+        max_width = round(settings.target_dpi * width_inches)
+        max_height = round(settings.target_dpi * height_inches)
+        for image_file in page.images:
+            try:
+                image = image_file.image
+                if image is None or (
+                    image.width <= max_width * _DPI_TOLERANCE and image.height <= max_height * _DPI_TOLERANCE
+                ):
+                    continue
+                scaled = _downscale(image, max_width, max_height)
+                if scaled.mode not in ("RGB", "L"):
+                    scaled = scaled.convert("RGB")
+                image_file.replace(scaled, quality=settings.jpeg_quality)
+            except Exception as e:
+                logger.debug(f"Keeping page image {image_file.name} as is: {e}")
+        page.compress_content_streams()
+
+    writer.compress_identical_objects()
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def compact_image(data: bytes, settings: CompactionSettings) -> Tuple[bytes, str]:
+    """
+    Downscale an image to the page budget of the target DPI and re-encode it.
+
+    Raises:
+        ImportError: If Pillow is not installed
+    """
+    if Image is None:
+        raise ImportError("Pillow package not available. Install with: pip install pillow")
+
+    image = Image.open(io.BytesIO(data))
+    if getattr(image, "n_frames", 1) > 1:
+        raise ValueError("Animated images are not compacted")
+    long_edge = round(settings.target_dpi * _PAGE_LONG_EDGE_INCHES)
+    scaled = _downscale(image, long_edge, long_edge)
+
+    output = io.BytesIO()
+    if scaled.mode in ("RGBA", "LA", "PA") or "transparency" in scaled.info:
+        scaled.save(output, "WEBP", quality=settings.jpeg_quality)
+        return output.getvalue(), "image/webp"
+    scaled.convert("RGB" if scaled.mode != "L" else "L").save(
+        output, "JPEG", quality=settings.jpeg_quality, optimize=True
+    )
+    return output.getvalue(), "image/jpeg"
+
+
+def compact_document(data: bytes, media_type: str, settings: CompactionSettings) -> Tuple[bytes, str]:
+    """
+    Compact one document (runs in a worker process).
+
+    Returns:
+        Tuple of (bytes, media type); the input when nothing smaller was produced
+    """
+    if media_type == "application/pdf":
+        compacted, compacted_type = compact_pdf(data, settings), media_type
+    elif media_type.startswith("image/"):
+        compacted, compacted_type = compact_image(data, settings)
+    else:
+        return data, media_type
+    if len(compacted) >= len(data):
+        return data, media_type
+    return compacted, compacted_type
+
+
+class CompactedReferenceCache:
+    """
+    In-memory LRU of compacted references, backed by the node's disk cache when configured.
+
+    The memory tier is bounded by entries and by total bytes; a reference
+    larger than `max_bytes` is only cached on disk.
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 256 * 1024 ** 2):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = Lock()
+
+    @property
+    def size_bytes(self) -> int:
+        """Bytes held in memory."""
+        with self._lock:
+            return self._bytes
+
+    async def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                return cached
+        if document_disk_cache is None:
+            return None
+        cached = await asyncio.to_thread(document_disk_cache.get, CACHE_NAMESPACE, key)
+        if cached is not None:
+            self._remember(key, cached)
+        return cached
+
+    async def put(self, key: str, data: bytes, media_type: str) -> None:
+        self._remember(key, (data, media_type))
+        if document_disk_cache is not None:
+            try:
+                await asyncio.to_thread(document_disk_cache.put, CACHE_NAMESPACE, key, data, media_type)
+            except OSError as e:
+                logger.warning(f"Failed to cache compacted reference {key[:12]}: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remember(self, key: str, value: Tuple[bytes, str]) -> None:
+        if len(value[0]) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[key] = value
+            self._bytes += len(value[0])
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Get or create the compaction process pool (spawned, so workers never inherit gRPC threads)."""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=app_config.reference_compaction_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots, _slots_loop
+    loop = asyncio.get_running_loop()
+    if _slots is None or _slots_loop is not loop:
+        # Semaphores bind to the loop they are first awaited on
+        _slots = asyncio.Semaphore(app_config.reference_compaction_workers)
+        _slots_loop = loop
+    return _slots
+
+
+def shutdown_compaction_executor() -> None:
+    """Shut down the compaction process pool (a new one is created on next use)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _recycle_executor(executor: ProcessPoolExecutor) -> None:
+    """Terminate a pool whose worker is stuck on a timed-out job; the next compaction starts a new one."""
+    global _executor
+    if _executor is executor:
+        _executor = None
+    # Worker processes are not exposed publicly (Python < 3.14 has no terminate_workers)
+    for process in list((getattr(executor, "_processes", None) or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def compact_reference(content: BinaryContent, settings: Optional[CompactionSettings] = None) -> BinaryContent:
+    """Compact one reference, reusing cached output for the same content; falls back to the original."""
+    if len(content.data) < app_config.reference_compaction_min_bytes:
+        return content
+    if content.media_type != "application/pdf" and not content.media_type.startswith("image/"):
+        return content
+
+    settings = settings or CompactionSettings.from_config()
+    key = settings.cache_key(content.data)
+    cached = await compacted_reference_cache.get(key)
+    if cached is not None:
+        metrics.increment("references.compaction.cache_hits", unit="1")
+        return BinaryContent(data=cached[0], media_type=cached[1], identifier=content.identifier)
+
+    # Submit only when a worker is free, so the timeout does not include queueing
+    async with _get_slots():
+        executor = _get_executor()
+        try:
+            compaction = asyncio.get_running_loop().run_in_executor(
+                executor, compact_document, content.data, content.media_type, settings
+            )
+            data, media_type = await asyncio.wait_for(compaction, app_config.reference_compaction_timeout_seconds)
+        except asyncio.TimeoutError:
+            logger.warning(f"Reference compaction timed out after {app_config.reference_compaction_timeout_seconds}s")
+            _recycle_executor(executor)
+            return content
+        except Exception as e:
+            logger.warning(f"Reference compaction failed, sending the original: {e}")
+            return content
+
+    if len(data) >= len(content.data):
+        # Nothing smaller was produced; keep the original and do not cache it
+        metrics.increment("references.compaction.unchanged", unit="1")
+        logger.debug(f"Compaction did not shrink {content.media_type} reference ({len(content.data)} bytes)")
+        return content
+
+    metrics.increment("references.compaction.saved_bytes", len(content.data) - len(data), unit="By")
+    logger.info(f"Compacted reference {content.media_type} {len(content.data)} -> {len(data)} bytes ({media_type})")
+    await compacted_reference_cache.put(key, data, media_type)
+    return BinaryContent(data=data, media_type=media_type, identifier=content.identifier)
+
+
+async def compact_references(contents: List[BinaryContent]) -> List[BinaryContent]:
+    """Compact references concurrently (bounded by the process pool), preserving order."""
+    settings = CompactionSettings.from_config()
+    return list(await asyncio.gather(*(compact_reference(content, settings) for content in contents)))
+
+
+# Process-wide cache of compacted references
+compacted_reference_cache = CompactedReferenceCache(
+    max_entries=app_config.reference_compaction_cache_entries,
+    max_bytes=app_config.reference_compaction_cache_max_bytes,
+)
+
+
+__all__ = [
+    "CompactionSettings",
+    "compact_document",
+    "compact_references",
+    "compacted_reference_cache",
+    "shutdown_compaction_executor",
+]
@@ -1,16 +1,41 @@
 import asyncio
+import codecs
+import hashlib
 import logging
 import mimetypes
+import tempfile
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Set, Tuple
 
 import httpx
 from pydantic_ai import BinaryContent
 
+from src.config import app_config
+from src.utils.aws import fetch_documents_by_key, hot_document_cache
+from src.utils.aws.document_cache import document_disk_cache
+from src.utils.content_hash import is_content_hash, with_content_hash
+from src.utils.http_client import get_http_client, host_slot
+
+from .reference_cache import reference_cache
+
 
 logger = logging.getLogger(__name__)
 
 
+# Content-Types that say nothing about the actual media (sniffed instead)
+GENERIC_MEDIA_TYPES = {"", "application/octet-stream", "binary/octet-stream"}
+# Bytes inspected to sniff the content type
+SNIFF_BYTES = 16
+
+_MAGIC_NUMBERS = [
+    (b"%PDF-", "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+
+
 def _guess_media_type(path: Path, fallback: str = "application/octet-stream") -> str:
     if path.suffix.lower() == ".pdf":
         return "application/pdf"
@@ -22,34 +47,237 @@ def _is_url(ref: str) -> bool:
     return ref.startswith("http://") or ref.startswith("https://")
 
 
+def _allowed_media_types() -> Set[str]:
+    return {t.strip().lower() for t in app_config.reference_allowed_media_types.split(",") if t.strip()}
+
+
+def _base_media_type(content_type: Optional[str]) -> str:
+    return (content_type or "").split(";", 1)[0].strip().lower()
+
+
+def _sniff_media_type(head: bytes, declared: Optional[str], url: str) -> str:
+    """
+    Determine the media type from the first bytes of a download.
+
+    Magic numbers win over the declared Content-Type; text-like content
+    keeps a declared text type; otherwise the URL path is used.
+    """
+    for magic, media_type in _MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+
+    declared_type = _base_media_type(declared)
+    if declared_type not in GENERIC_MEDIA_TYPES:
+        return declared_type
+    if head and b"\0" not in head:
+        try:
+            # Incremental decoding tolerates a character cut off at the end of the head
+            codecs.getincrementaldecoder("utf-8")().decode(head)
+            return "text/plain"
+        except UnicodeDecodeError:
+            pass
+    try:
+        return _guess_media_type(Path(httpx.URL(url).path))
+    except Exception:
+        return "application/octet-stream"
+
+
+def _check_media_type(media_type: str, url: str) -> None:
+    if media_type not in _allowed_media_types():
+        raise ValueError(f"Unsupported reference media type {media_type} for URL {url}")
+
+
+def _check_size(size: int, url: str) -> None:
+    if size > app_config.reference_max_bytes:
+        raise ValueError(
+            f"Reference {url} exceeds the {app_config.reference_max_bytes} byte limit"
+        )
+
+
+async def _stream_reference(
+    session: httpx.AsyncClient,
+    url: str,
+    headers: Dict[str, str],
+) -> Tuple[Optional[bytes], str, str, httpx.Headers]:
+    """
+    Stream a reference download with early size and media-type checks.
+
+    The declared Content-Length and Content-Type are checked before the body
+    is read, the type is sniffed from the first bytes, and the body is
+    hashed as it streams. Memory is bounded by REFERENCE_MAX_BYTES: the
+    returned bytes hold the whole body, so a download peaks at its full
+    size. Spooling bodies past REFERENCE_SPOOL_THRESHOLD_BYTES to a temporary
+    file only keeps them from being held twice (as chunks and joined) while
+    the result is assembled.
+
+    Returns:
+        Tuple of (bytes, media type, SHA-256, response headers); bytes are None on 304 Not Modified
+    """
+    async with host_slot(url):
+        async with session.stream("GET", url, headers=headers) as response:
+            if response.status_code == 304 and headers:
+                return None, "", "", response.headers
+            response.raise_for_status()
+            declared: Optional[str] = response.headers.get("content-type")
+
+            # Reject before downloading the body when the headers already disqualify it
+            content_length = response.headers.get("content-length", "")
+            if content_length.isdigit():
+                _check_size(int(content_length), url)
+            if _base_media_type(declared) not in GENERIC_MEDIA_TYPES:
+                _check_media_type(_base_media_type(declared), url)
+
+            with tempfile.SpooledTemporaryFile(max_size=app_config.reference_spool_threshold_bytes) as spool:
+                head = b""
+                media_type: Optional[str] = None
+                size = 0
+                digest = hashlib.sha256()
+                async for chunk in response.aiter_bytes():
+                    size += len(chunk)
+                    _check_size(size, url)
+                    if media_type is None:
+                        head += chunk[:SNIFF_BYTES]
+                        if len(head) >= SNIFF_BYTES:
+                            media_type = _sniff_media_type(head, declared, url)
+                            _check_media_type(media_type, url)
+                    digest.update(chunk)
+                    spool.write(chunk)
+
+                if media_type is None:
+                    media_type = _sniff_media_type(head, declared, url)
+                    _check_media_type(media_type, url)
+                # The one full in-memory copy of the body (BinaryContent needs bytes)
+                spool.seek(0)
+                data = spool.read()
+
+    logger.debug(f"Downloaded reference bytes={size} media_type={media_type}")
+    return data, media_type, digest.hexdigest(), response.headers
+
+
 async def _download_to_binary(session: httpx.AsyncClient, url: str) -> BinaryContent:
+    """
+    Download a reference, honouring the reference cache when enabled.
+
+    Fresh cache entries are served without a request; stale ones are
+    revalidated with a conditional GET and reused on 304 Not Modified.
+    """
+    entry = await asyncio.to_thread(reference_cache.lookup, url) if reference_cache is not None else None
+    if entry is not None and entry.is_fresh():
+        data = await asyncio.to_thread(reference_cache.load, entry)
+        if data is not None:
+            logger.info(f"Serving cached reference for URL: {url}")
+            return BinaryContent(data=data, media_type=entry.media_type, identifier=entry.sha256)
+        entry = None
+
     logger.info(f"Downloading reference from URL: {url}")
     try:
-        response = await session.get(url, timeout=30.0, follow_redirects=True)
-        response.raise_for_status()
-        content_type: Optional[str] = response.headers.get("content-type")
-        if not content_type:
-            # Fallback: try to infer from URL path
-            try:
-                content_type = _guess_media_type(Path(httpx.URL(url).path))
-            except Exception:
-                content_type = "application/octet-stream"
-
-        return BinaryContent(data=response.content, media_type=content_type)
+        data, media_type, digest, response_headers = await _stream_reference(
+            session, url, entry.conditional_headers() if entry else {}
+        )
+        if data is None and entry is not None and reference_cache is not None:
+            cached = await asyncio.to_thread(reference_cache.load, entry)
+            if cached is not None:
+                logger.info(f"Reference not modified, serving cached copy: {url}")
+                await asyncio.to_thread(reference_cache.revalidated, entry, response_headers)
+                return BinaryContent(data=cached, media_type=entry.media_type, identifier=entry.sha256)
+            # Body evicted since the entry was written: fetch it again unconditionally
+            data, media_type, digest, response_headers = await _stream_reference(session, url, {})
     except httpx.HTTPError as e:
         logger.error(f"Failed to download URL {url}: {e}")
         raise ValueError(f"Failed to download URL {url}: {e}") from e
 
+    assert data is not None
+    if reference_cache is not None:
+        try:
+            await asyncio.to_thread(reference_cache.store, url, data, media_type, response_headers)
+        except OSError as e:
+            logger.warning(f"Failed to cache reference {url}: {e}")
+    return BinaryContent(data=data, media_type=media_type, identifier=digest)
+
+
+async def _library_copy(digest: str, read_disk: bool = True) -> Optional[BinaryContent]:
+    """
+    Find a document with this content hash in the node's library caches.
 
-async def map_references_to_binary_contents(refs: List[str]) -> List[BinaryContent]:
+    Library object keys are the SHA-256 of the file, so a user reference
+    with the same hash can be served from (and share the bytes of) the
+    cached library document.
+    """
+    if hot_document_cache is not None:
+        content = hot_document_cache.get(digest)
+        if content is not None:
+            return with_content_hash(content, digest)
+    if read_disk and document_disk_cache is not None:
+        cached = await asyncio.to_thread(document_disk_cache.get, app_config.aws_s3_bucket_name, digest)
+        if cached is not None:
+            return BinaryContent(data=cached[0], media_type=cached[1], identifier=digest)
+    return None
+
+
+async def _reuse_library_copy(content: BinaryContent) -> BinaryContent:
+    """Swap a loaded reference for the in-memory library copy of the same file, if any."""
+    library_copy = await _library_copy(content.identifier, read_disk=False)
+    if library_copy is None:
+        return content
+    logger.info(f"User reference matches library document {content.identifier[:12]}, reusing the cached copy")
+    return library_copy
+
+
+async def _fetch_object_references(object_keys: List[str]) -> List[BinaryContent]:
+    """
+    Fetch references stored as bucket objects through the pooled S3 path.
+
+    Content-addressed keys (upload handles, library keys) are looked up in
+    the library caches by hash before anything is downloaded.
+    """
+    keys = [key.strip().lstrip("/") for key in object_keys]
+    if not all(keys):
+        raise ValueError("Reference object keys must not be empty")
+
+    digests = {key: key.rsplit("/", 1)[-1] for key in keys if is_content_hash(key.rsplit("/", 1)[-1])}
+    library_copies: Dict[str, BinaryContent] = {}
+    for key, digest in digests.items():
+        library_copy = await _library_copy(digest)
+        if library_copy is not None:
+            library_copies[key] = library_copy
+
+    missing = [key for key in keys if key not in library_copies]
+    fetched = await fetch_documents_by_key(missing, skip_failed=False) if missing else {}
+    results: List[BinaryContent] = []
+    for key in keys:
+        if key in library_copies:
+            results.append(library_copies[key])
+            continue
+        content = fetched[key]
+        media_type = _base_media_type(content.media_type)
+        if media_type in GENERIC_MEDIA_TYPES:
+            media_type = _sniff_media_type(content.data[:SNIFF_BYTES], media_type, key)
+        _check_size(len(content.data), key)
+        _check_media_type(media_type, key)
+        digest = digests.get(key) or hashlib.sha256(content.data).hexdigest()
+        results.append(BinaryContent(data=content.data, media_type=media_type, identifier=digest))
+    return results
+
+
+async def map_references_to_binary_contents(
+    refs: List[str],
+    object_keys: Optional[List[str]] = None,
+) -> List[BinaryContent]:
     """
     Map a list of references (URLs or local file paths) to BinaryContent objects.
 
-    - http/https URLs are downloaded using httpx
+    - http/https URLs are downloaded with the shared pooled HTTP client
     - Local file paths are read from disk
+    - Object keys are fetched from the configured S3 bucket
+
+    Every document is stamped with its content hash, and references whose
+    hash matches a cached library document reuse that copy.
 
     Args:
         refs: list of reference strings
+        object_keys: optional S3 object keys of references in the bucket
 
     Returns:
         List[BinaryContent]
@@ -57,7 +285,7 @@ async def map_references_to_binary_contents(refs: List[str]) -> List[BinaryConte
     Raises:
         ValueError on invalid references or download errors
     """
-    if not refs:
+    if not refs and not object_keys:
         return []
 
     url_refs: List[str] = []
@@ -74,19 +302,23 @@ async def map_references_to_binary_contents(refs: List[str]) -> List[BinaryConte
     for path in file_refs:
         if not path.is_file():
             raise ValueError(f"Reference is not a file: {path}")
+        _check_size(path.stat().st_size, str(path))
         media_type = _guess_media_type(path)
         data = path.read_bytes()
-        results.append(BinaryContent(data=data, media_type=media_type))
+        results.append(with_content_hash(BinaryContent(data=data, media_type=media_type)))
 
     # Download URLs concurrently
     if url_refs:
-        async with httpx.AsyncClient() as session:
-            tasks = [
-                _download_to_binary(session, url)
-                for url in url_refs
-            ]
-            downloaded: List[BinaryContent] = await asyncio.gather(*tasks)
-            results.extend(downloaded)
+        session = get_http_client()
+        tasks = [
+            _download_to_binary(session, url)
+            for url in url_refs
+        ]
+        downloaded: List[BinaryContent] = await asyncio.gather(*tasks)
+        results.extend(await asyncio.gather(*(_reuse_library_copy(content) for content in downloaded)))
+
+    if object_keys:
+        results.extend(await _fetch_object_references(object_keys))
 
     return results
 
@@ -0,0 +1,107 @@
+"""
+Client-streamed user reference uploads.
+
+The app-server pushes reference bytes in chunks over the UploadReference
+RPC instead of publishing them at a URL first. Chunks are size-checked,
+hashed and spooled as they arrive, the media type is sniffed from the first
+bytes, and the finished document is written to S3 under its SHA-256. That
+digest is the handle cited in Generate; identical uploads share one object.
+"""
+
+import hashlib
+import logging
+import re
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+from src.config import app_config
+from src.utils.aws import upload_document
+
+from .reference_mapper import (
+    SNIFF_BYTES,
+    _check_media_type,
+    _check_size,
+    _sniff_media_type,
+)
+
+logger = logging.getLogger(__name__)
+
+_HANDLE_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+@dataclass
+class UploadedReference:
+    """Result of a finished upload."""
+    handle: str
+    size_bytes: int
+    media_type: str
+
+
+def object_key_for_handle(handle: str) -> str:
+    """
+    Resolve an upload handle to its S3 object key.
+
+    Raises:
+        ValueError if the handle is not a SHA-256 hex digest
+    """
+    if not _HANDLE_PATTERN.match(handle):
+        raise ValueError(f"Invalid reference handle: {handle!r}")
+    return f"{app_config.reference_upload_prefix.strip('/')}/{handle}"
+
+
+class ReferenceUpload:
+    """Accumulates the chunks of one upload; use as a context manager."""
+
+    def __init__(self) -> None:
+        self._spool = tempfile.SpooledTemporaryFile(max_size=app_config.reference_spool_threshold_bytes)
+        self._digest = hashlib.sha256()
+        self._head = b""
+        self._size = 0
+        self.declared_media_type: Optional[str] = None
+        self.name = "upload"
+
+    def __enter__(self) -> "ReferenceUpload":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._spool.close()
+
+    def write(self, data: bytes, media_type: str = "", file_name: str = "") -> None:
+        """
+        Append one chunk; the media type and file name are taken from the first chunk setting them.
+
+        Raises:
+            ValueError once the upload passes REFERENCE_MAX_BYTES
+        """
+        if media_type and self.declared_media_type is None:
+            self.declared_media_type = media_type
+        if file_name and self.name == "upload":
+            self.name = file_name
+        self._size += len(data)
+        _check_size(self._size, self.name)
+        if len(self._head) < SNIFF_BYTES:
+            self._head += data[:SNIFF_BYTES - len(self._head)]
+        self._digest.update(data)
+        self._spool.write(data)
+
+    async def commit(self) -> UploadedReference:
+        """
+        Store the upload in S3 under its content hash.
+
+        Raises:
+            ValueError if the upload is empty or of an unsupported media type
+        """
+        if self._size == 0:
+            raise ValueError("Reference upload is empty")
+        media_type = _sniff_media_type(self._head, self.declared_media_type, self.name)
+        _check_media_type(media_type, self.name)
+
+        handle = self._digest.hexdigest()
+        self._spool.seek(0)
+        await upload_document(object_key_for_handle(handle), self._spool.read(), media_type)
+        logger.info(f"Stored uploaded reference {self.name} as {handle} ({self._size} bytes, {media_type})")
+        return UploadedReference(handle=handle, size_bytes=self._size, media_type=media_type)
+
+
+__all__ = ["ReferenceUpload", "UploadedReference", "object_key_for_handle"]
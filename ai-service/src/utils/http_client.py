@@ -0,0 +1,91 @@
+"""
+Process-wide managed HTTP client.
+
+One pooled `httpx.AsyncClient` is shared by every request, so repeat
+downloads (e.g. from the media CDN) reuse warm keep-alive connections
+instead of paying a TLS handshake each time. HTTP/2 is used when the `h2`
+package is installed. The server opens the client at startup and closes it
+on shutdown.
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+except ImportError:
+    h2 = None  # type: ignore
+
+from src.config import app_config
+
+logger = logging.getLogger(__name__)
+
+# Module-level shared client and per-host request slots
+_http_client: Optional[httpx.AsyncClient] = None
+_host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    http2 = app_config.http2_enabled and h2 is not None
+    if app_config.http2_enabled and h2 is None:
+        logger.warning("h2 package not available, falling back to HTTP/1.1. Install with: pip install 'httpx[http2]'")
+
+    client = httpx.AsyncClient(
+        http2=http2,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=app_config.http_max_connections,
+            max_keepalive_connections=app_config.http_max_keepalive_connections,
+            keepalive_expiry=app_config.http_keepalive_expiry_seconds,
+        ),
+        timeout=httpx.Timeout(
+            app_config.http_read_timeout_seconds,
+            connect=app_config.http_connect_timeout_seconds,
+        ),
+    )
+    logger.info(
+        f"Created shared HTTP client (http2={http2}, max_connections={app_config.http_max_connections}, "
+        f"per_host={app_config.http_per_host_concurrency})"
+    )
+    return client
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get or create the shared HTTP client."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = _create_http_client()
+    return _http_client
+
+
+async def start_http_client() -> None:
+    """Open the shared HTTP client (called at server startup)."""
+    get_http_client()
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client and its connections (called at server shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    _host_semaphores.clear()
+
+
+@asynccontextmanager
+async def host_slot(url: str) -> AsyncIterator[None]:
+    """Limit concurrent requests per host to HTTP_PER_HOST_CONCURRENCY."""
+    host = httpx.URL(url).host
+    semaphore = _host_semaphores.get(host)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(app_config.http_per_host_concurrency)
+        _host_semaphores[host] = semaphore
+    async with semaphore:
+        yield
+
+
+__all__ = ["close_http_client", "get_http_client", "host_slot", "start_http_client"]
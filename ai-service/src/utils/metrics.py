@@ -0,0 +1,40 @@
+"""
+Thin wrapper around logfire metrics.
+
+Instruments are created on first use and cached by name, so call sites only
+name the metric: `increment("documents.memory_cache.hits")`.
+"""
+
+from typing import Any, Dict
+
+import logfire
+
+_instruments: Dict[str, Any] = {}
+
+
+def _instrument(kind: str, name: str, unit: str, description: str) -> Any:
+    instrument = _instruments.get(name)
+    if instrument is None:
+        factory = {
+            "counter": logfire.metric_counter,
+            "histogram": logfire.metric_histogram,
+            "gauge": logfire.metric_gauge,
+        }[kind]
+        instrument = factory(name, unit=unit, description=description)
+        _instruments[name] = instrument
+    return instrument
+
+
+def increment(name: str, amount: int = 1, unit: str = "1", description: str = "", **attributes: Any) -> None:
+    """Add `amount` to a counter."""
+    _instrument("counter", name, unit, description).add(amount, attributes or None)
+
+
+def record(name: str, value: float, unit: str = "1", description: str = "", **attributes: Any) -> None:
+    """Record a value in a histogram (latencies, sizes)."""
+    _instrument("histogram", name, unit, description).record(value, attributes or None)
+
+
+def set_gauge(name: str, value: float, unit: str = "1", description: str = "", **attributes: Any) -> None:
+    """Set the current value of a gauge."""
+    _instrument("gauge", name, unit, description).set(value, attributes or None)
@@ -0,0 +1,159 @@
+"""
+Tests for access statistics and the startup prewarm.
+
+Run with: python -m pytest tests/test_access_stats.py -v
+"""
+
+import asyncio
+import io
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from grpc_health.v1 import health, health_pb2
+
+from src.services.question_paper import prewarm
+from src.services.question_paper.access_stats import DOCUMENTS, QUERIES, RENDERS, AccessStats
+from src.utils.aws import s3_document_fetcher
+
+
+class FakeS3Client:
+    """Objects in memory with a settable LastModified."""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self.objects[Key] = (Body, datetime.now(timezone.utc))
+
+    def get_object(self, Bucket, Key):
+        return {"Body": io.BytesIO(self.objects[Key][0])}
+
+    def delete_object(self, Bucket, Key):
+        del self.objects[Key]
+
+    def get_paginator(self, operation):
+        client = self
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                contents = [
+                    {"Key": key, "LastModified": modified}
+                    for key, (_, modified) in client.objects.items()
+                    if key.startswith(Prefix)
+                ]
+                return [{"Contents": contents}]
+
+        return Paginator()
+
+
+def test_statistics_persist_and_decay_by_age(tmp_path):
+    path = tmp_path / "stats.json"
+    stats = AccessStats(path=str(path), half_life_hours=1)
+    for _ in range(4):
+        stats.record(DOCUMENTS, "hot")
+    stats.record(DOCUMENTS, "cold")
+    stats.record(QUERIES, "subject: physics")
+    asyncio.run(stats.flush())
+    # Written one half-life ago
+    an_hour_ago = time.time() - 3600
+    os.utime(path, (an_hour_ago, an_hour_ago))
+
+    for _ in range(2):
+        # Restarting again does not halve the counts again
+        restarted = AccessStats(path=str(path), half_life_hours=1)
+        asyncio.run(restarted.load())
+
+        assert restarted.top(DOCUMENTS, 5) == ["hot"]
+        assert restarted.snapshot()[DOCUMENTS] == {"hot": 2}
+        assert restarted.top(QUERIES, 5) == []
+
+
+def test_replicas_persist_their_own_objects_and_merge_all_on_load(monkeypatch):
+    client = FakeS3Client()
+    monkeypatch.setattr(s3_document_fetcher, "_s3_client", client)
+    first = AccessStats(s3_prefix="stats/", replica_id="a")
+    second = AccessStats(s3_prefix="stats", replica_id="b")
+    first.record(DOCUMENTS, "doc-a", 3)
+    second.record(DOCUMENTS, "doc-b", 2)
+    asyncio.run(first.flush())
+    asyncio.run(second.flush())
+    client.objects["stats/gone.json"] = (b"{}", datetime.now(timezone.utc) - timedelta(days=30))
+
+    restarted = AccessStats(s3_prefix="stats", replica_id="a")
+    asyncio.run(restarted.load())
+    restarted.record(DOCUMENTS, "doc-c")
+    asyncio.run(restarted.flush())
+
+    assert restarted.snapshot()[DOCUMENTS] == {"doc-a": 3, "doc-b": 2, "doc-c": 1}
+    assert sorted(client.objects) == ["stats/a.json", "stats/b.json"]
+    # Only its own counts go to its object, so nothing is counted twice
+    assert json.loads(client.objects["stats/a.json"][0])[DOCUMENTS] == {"doc-a": 3, "doc-c": 1}
+    assert json.loads(client.objects["stats/b.json"][0])[DOCUMENTS] == {"doc-b": 2}
+
+
+def test_prewarm_loads_top_entries_without_counting_them(monkeypatch):
+    stats = AccessStats()
+    stats.record(DOCUMENTS, "doc-a", 3)
+    stats.record(DOCUMENTS, "doc-b")
+    stats.record(QUERIES, "subject: chemistry", 2)
+    stats.record(RENDERS, "render-hash")
+    monkeypatch.setattr(prewarm, "access_stats", stats)
+    monkeypatch.setattr(prewarm.app_config, "prewarm_top_documents", 1)
+
+    fetched, embedded = [], []
+
+    async def fake_fetch(keys, record_access=True):
+        assert record_access is False
+        fetched.extend(keys)
+        return {key: b"" for key in keys}
+
+    async def fake_embed(queries, record_access=True):
+        assert record_access is False
+        embedded.extend(queries)
+        return [[0.0] for _ in queries]
+
+    monkeypatch.setattr(prewarm, "fetch_documents_by_path", fake_fetch)
+    monkeypatch.setattr(prewarm, "generate_embeddings", fake_embed)
+
+    asyncio.run(prewarm.prewarm_caches())
+
+    assert fetched == ["doc-a"]
+    assert embedded == ["subject: chemistry"]
+
+
+def test_warm_up_reports_not_serving_until_prewarm_finishes(monkeypatch):
+    health_servicer = health.HealthServicer()
+
+    def status(service: str = "") -> int:
+        return health_servicer.Check(health_pb2.HealthCheckRequest(service=service), None).status
+
+    prewarm_started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_prewarm():
+        prewarm_started.set()
+        await release.wait()
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(prewarm, "prewarm_caches", slow_prewarm)
+    monkeypatch.setattr(prewarm.access_stats, "start", noop)
+    monkeypatch.setattr(prewarm.app_config, "access_stats_enabled", True)
+    monkeypatch.setattr(prewarm.app_config, "latex_formats_enabled", False)
+    monkeypatch.setattr(prewarm.app_config, "vector_index_backend", "pinecone")
+    monkeypatch.setattr(prewarm.app_config, "library_hybrid_enabled", False)
+
+    async def run():
+        warming = asyncio.create_task(prewarm.warm_up(health_servicer, ["test.Service"]))
+        await prewarm_started.wait()
+        during = status(), status("test.Service")
+        release.set()
+        await warming
+        return during, (status(), status("test.Service"))
+
+    during, after = asyncio.run(run())
+
+    assert during == (health_pb2.HealthCheckResponse.NOT_SERVING,) * 2
+    assert after == (health_pb2.HealthCheckResponse.SERVING,) * 2
@@ -0,0 +1,96 @@
+"""
+Tests for the document caches.
+
+Run with: python -m pytest tests/test_document_cache.py -v
+"""
+
+import hashlib
+import os
+
+from pydantic_ai import BinaryContent
+
+from src.utils.aws.document_cache import DiskDocumentCache
+from src.utils.aws.memory_cache import HotDocumentCache
+
+
+def _hash_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_disk_cache_round_trip_and_integrity(tmp_path):
+    cache = DiskDocumentCache(str(tmp_path), max_bytes=1024)
+    data = b"%PDF-1.7 textbook"
+    key = _hash_key(data)
+
+    cache.put("bucket", key, data, "application/pdf")
+    assert cache.get("bucket", key) == (data, "application/pdf")
+
+    # Bytes that do not match the hash key are never cached
+    cache.put("bucket", _hash_key(b"other"), data, "application/pdf")
+    assert cache.get("bucket", _hash_key(b"other")) is None
+
+    # Corrupted entries are dropped on read
+    data_path = next(p for p in tmp_path.rglob(key))
+    data_path.write_bytes(b"%PDF-1.7 tampered")
+    assert cache.get("bucket", key) is None
+    assert not data_path.exists()
+
+
+def test_disk_cache_evicts_least_recently_used_beyond_cap(tmp_path):
+    cache = DiskDocumentCache(str(tmp_path), max_bytes=250)
+    blobs = [bytes([i]) * 100 for i in range(3)]
+    keys = [_hash_key(blob) for blob in blobs]
+
+    cache.put("bucket", keys[0], blobs[0], "application/pdf")
+    cache.put("bucket", keys[1], blobs[1], "application/pdf")
+    # Make the first entry older, then read it so it becomes the most recent
+    os.utime(next(tmp_path.rglob(keys[1])), (1, 1))
+    os.utime(next(tmp_path.rglob(keys[0])), (0, 0))
+    assert cache.get("bucket", keys[0]) is not None
+
+    cache.put("bucket", keys[2], blobs[2], "application/pdf")
+
+    assert cache.get("bucket", keys[0]) is not None
+    assert cache.get("bucket", keys[1]) is None
+    assert cache.get("bucket", keys[2]) is not None
+
+
+def test_disk_cache_only_rescans_when_over_budget(tmp_path, monkeypatch):
+    cache = DiskDocumentCache(str(tmp_path), max_bytes=250)
+    other_process = DiskDocumentCache(str(tmp_path), max_bytes=250)
+    scans = []
+    original_scan = DiskDocumentCache._scan_and_evict
+    monkeypatch.setattr(
+        DiskDocumentCache, "_scan_and_evict", lambda self: scans.append(self) or original_scan(self)
+    )
+    blobs = [bytes([i]) * 100 for i in range(3)]
+
+    other_process.put("bucket", _hash_key(blobs[0]), blobs[0], "application/pdf")
+    cache.put("bucket", _hash_key(blobs[1]), blobs[1], "application/pdf")
+    # Within budget by this process's own count: no directory scan
+    cache.put("bucket", _hash_key(blobs[1]), blobs[1], "application/pdf")
+    assert scans == [other_process, cache]
+
+    # The initial scan saw the other process's entry, so this write goes over the cap
+    cache.put("bucket", _hash_key(blobs[2]), blobs[2], "application/pdf")
+    assert scans[-1] is cache
+    assert sum(p.stat().st_size for p in tmp_path.glob("bucket/*/*") if p.suffix != ".json") <= 250
+
+
+def test_hot_cache_returns_the_cached_object_and_protects_the_hot_set():
+    cache = HotDocumentCache(max_bytes=300)
+    hot = BinaryContent(data=b"h" * 200, media_type="application/pdf")
+
+    assert cache.get("hot") is None
+    assert cache.put("hot", hot)
+    for _ in range(3):
+        assert cache.get("hot") is hot
+
+    # A one-off document that would need to evict the hot one is rejected
+    assert cache.get("once") is None
+    assert not cache.put("once", BinaryContent(data=b"o" * 200, media_type="application/pdf"))
+    assert cache.get("hot") is hot
+
+    # Documents larger than the whole budget are never admitted
+    assert not cache.put("huge", BinaryContent(data=b"x" * 400, media_type="application/pdf"))
+    assert cache.size_bytes == 200
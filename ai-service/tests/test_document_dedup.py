@@ -0,0 +1,48 @@
+"""
+Tests for content-hash deduplication of generation documents.
+
+Run with: python -m pytest tests/test_document_dedup.py -v
+"""
+
+import asyncio
+import hashlib
+
+from pydantic_ai import BinaryContent
+
+from src.utils.aws.memory_cache import HotDocumentCache
+from src.utils.content_hash import content_hash, dedupe_documents, with_content_hash
+from src.utils.converter import reference_mapper
+
+BOOK = b"%PDF-1.7\n" + b"textbook" * 1000
+BOOK_HASH = hashlib.sha256(BOOK).hexdigest()
+
+
+def test_same_source_is_sent_once_keeping_the_fuller_copy():
+    excerpt = BinaryContent(data=b"%PDF-1.7\npages 3-4", media_type="application/pdf", identifier=BOOK_HASH)
+    other = BinaryContent(data=b"other notes", media_type="text/plain")
+    user_copy = BinaryContent(data=BOOK, media_type="application/pdf")
+    same_file_other_url = BinaryContent(data=BOOK, media_type="application/pdf")
+
+    deduped = dedupe_documents([excerpt, other, user_copy, same_file_other_url])
+
+    assert [content.data for content in deduped] == [BOOK, b"other notes"]
+    assert content_hash(deduped[0]) == BOOK_HASH
+
+
+def test_user_reference_matching_a_library_key_reuses_the_cached_copy(monkeypatch):
+    hot_cache = HotDocumentCache(max_bytes=1 << 20)
+    library_copy = with_content_hash(BinaryContent(data=BOOK, media_type="application/pdf"), BOOK_HASH)
+    hot_cache.put(BOOK_HASH, library_copy)
+    monkeypatch.setattr(reference_mapper, "hot_document_cache", hot_cache)
+    monkeypatch.setattr(reference_mapper, "document_disk_cache", None)
+
+    async def no_fetch(keys, skip_failed=None):
+        raise AssertionError(f"unexpected S3 fetch of {keys}")
+
+    monkeypatch.setattr(reference_mapper, "fetch_documents_by_key", no_fetch)
+
+    documents = asyncio.run(
+        reference_mapper.map_references_to_binary_contents([], object_keys=[f"reference-uploads/{BOOK_HASH}"])
+    )
+
+    assert documents[0] is library_copy
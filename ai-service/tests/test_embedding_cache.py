@@ -0,0 +1,57 @@
+"""
+Tests for the two-tier query embedding cache.
+
+Run with: python -m pytest tests/test_embedding_cache.py -v
+"""
+
+import os
+
+import pytest
+
+from src.services.question_paper.library.embedding_cache import QueryEmbeddingCache, embedding_cache_key
+
+
+def test_cache_key_normalizes_query_text():
+    assert embedding_cache_key("m", "  Organic   Chemistry ") == embedding_cache_key("m", "organic chemistry")
+    assert embedding_cache_key("m", "chemistry") != embedding_cache_key("other", "chemistry")
+
+
+@pytest.mark.asyncio
+class TestQueryEmbeddingCache:
+    """Test memory and disk tiers."""
+
+    async def test_memory_tier_evicts_least_recently_used(self):
+        cache = QueryEmbeddingCache(max_entries=2)
+        await cache.put("m", "a", [1.0])
+        await cache.put("m", "b", [2.0])
+        assert await cache.get("m", "a") == [1.0]
+
+        await cache.put("m", "c", [3.0])
+
+        assert await cache.get("m", "b") is None
+        assert await cache.get("m", "a") == [1.0]
+
+    async def test_disk_tier_survives_memory_eviction(self, tmp_path):
+        cache = QueryEmbeddingCache(max_entries=1, cache_dir=str(tmp_path))
+        await cache.put("m", "physics", [0.5, -0.25])
+        cache.clear()
+
+        assert await cache.get("m", "Physics") == [0.5, -0.25]
+
+    async def test_disk_tier_evicts_least_recently_used_files(self, tmp_path):
+        cache = QueryEmbeddingCache(max_entries=1, cache_dir=str(tmp_path), disk_max_entries=3)
+        for index, query in enumerate(["a", "b", "c"]):
+            await cache.put("m", query, [float(index)])
+        # Age every file, then read "a" so it becomes the most recently used
+        for path in tmp_path.glob("*/*.f32"):
+            os.utime(path, (1, 1))
+        cache.clear()
+        assert await cache.get("m", "a") == [0.0]
+
+        await cache.put("m", "d", [3.0])
+        cache.clear()
+
+        # Over the cap of 3: evicted down to 90% of it, oldest first
+        assert len(list(tmp_path.glob("*/*.f32"))) == 2
+        assert await cache.get("m", "a") == [0.0]
+        assert await cache.get("m", "d") == [3.0]
@@ -0,0 +1,46 @@
+"""
+Tests for the shared HTTP client.
+
+Run with: python -m pytest tests/test_http_client.py -v
+"""
+
+import asyncio
+
+from src.utils import http_client
+
+
+def test_client_is_shared_until_closed():
+    async def run():
+        first = http_client.get_http_client()
+        assert http_client.get_http_client() is first
+        await http_client.close_http_client()
+        assert first.is_closed
+        second = http_client.get_http_client()
+        await http_client.close_http_client()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first is not second
+
+
+def test_host_slots_cap_concurrent_requests_per_host(monkeypatch):
+    monkeypatch.setattr(http_client.app_config, "http_per_host_concurrency", 2)
+    active = {"cdn.example.com": 0, "other.example.com": 0}
+    peak = dict(active)
+
+    async def request(url, host):
+        async with http_client.host_slot(url):
+            active[host] += 1
+            peak[host] = max(peak[host], active[host])
+            await asyncio.sleep(0.01)
+            active[host] -= 1
+
+    async def run():
+        await asyncio.gather(
+            *(request(f"https://cdn.example.com/{i}.pdf", "cdn.example.com") for i in range(6)),
+            *(request(f"https://other.example.com/{i}.pdf", "other.example.com") for i in range(2)),
+        )
+        await http_client.close_http_client()
+
+    asyncio.run(run())
+    assert peak == {"cdn.example.com": 2, "other.example.com": 2}
@@ -0,0 +1,182 @@
+"""
+Tests for non-blocking LaTeX rendering.
+
+Run with: python -m pytest tests/test_latex_rendering.py -v
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.services.question_paper.response_mapper.image import latex_formats, latex_toolchain
+from src.services.question_paper.response_mapper.image.latex import LaTeXRenderer
+from src.services.question_paper.response_mapper.image.latex_formats import (
+    match_latex_format,
+    precompile_latex_formats,
+)
+from src.services.question_paper.response_mapper.image.latex_toolchain import LatexToolchain
+
+FAKE_PDFLATEX = """#!/bin/sh
+for arg in "$@"; do
+  case "$arg" in
+    -output-directory=*) out="${arg#-output-directory=}";;
+    -jobname=*) job="${arg#-jobname=}";;
+    -fmt=*) echo "${arg#-fmt=}" >> "$(dirname "$0")/formats.log";;
+    -ini) ini=1;;
+  esac
+done
+if [ -n "$ini" ]; then printf 'fmt' > "$job.fmt"; exit 0; fi
+echo run >> "$(dirname "$0")/runs.log"
+sleep 0.2
+if grep -q broken "$arg"; then exit 1; fi
+# The fake PDF holds its page count
+grep -c 'begin{standalone}' "$arg" > "$out/document.pdf" || true
+"""
+
+FAKE_MAGICK = """#!/bin/sh
+for arg in "$@"; do
+  case "$arg" in *.pdf) pdf="$arg";; esac
+  out="$arg"
+done
+case "$out" in
+  *%d*) i=0; while [ $i -lt $(cat "$pdf") ]; do printf "PNG$i" > "$(printf "$out" $i)"; i=$((i+1)); done;;
+  *) printf 'PNG' > "$out";;
+esac
+"""
+
+
+@pytest.fixture
+def fake_toolchain(tmp_path, monkeypatch):
+    """Install shell scripts standing in for pdflatex and ImageMagick."""
+    paths = {}
+    for name, script in (("pdflatex", FAKE_PDFLATEX), ("magick", FAKE_MAGICK)):
+        path = tmp_path / name
+        path.write_text(script)
+        path.chmod(0o755)
+        paths[name] = str(path)
+    monkeypatch.setattr(
+        latex_toolchain, "_toolchain", LatexToolchain(pdflatex=paths["pdflatex"], imagemagick=paths["magick"])
+    )
+    monkeypatch.setattr(latex_formats.app_config, "latex_format_dir", str(tmp_path / "formats"))
+    monkeypatch.setattr(latex_formats, "_failed", set())
+    paths["formats_log"] = tmp_path / "formats.log"
+    paths["runs_log"] = tmp_path / "runs.log"
+    return paths
+
+
+def test_renders_run_off_the_event_loop_within_the_job_limit(fake_toolchain, monkeypatch):
+    monkeypatch.setattr(latex_toolchain.app_config, "latex_max_jobs", 2)
+    renderer = LaTeXRenderer()
+    ticks = 0
+
+    async def ticker(stop: asyncio.Event):
+        nonlocal ticks
+        while not stop.is_set():
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    async def run():
+        stop = asyncio.Event()
+        ticking = asyncio.create_task(ticker(stop))
+        started = time.perf_counter()
+        images = await asyncio.gather(*(renderer.render(f"\\documentclass{{standalone}} {i}") for i in range(4)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await ticking
+        return images, elapsed
+
+    images, elapsed = asyncio.run(run())
+
+    assert images == [b"PNG"] * 4
+    # Two waves of two jobs: bounded, yet the loop kept ticking throughout
+    assert elapsed >= 0.4
+    assert ticks >= 20
+
+
+def test_missing_toolchain_fails_the_render(monkeypatch):
+    monkeypatch.setattr(latex_toolchain, "_toolchain", LatexToolchain(pdflatex=None, imagemagick=None))
+
+    with pytest.raises(RuntimeError, match="pdflatex not found"):
+        asyncio.run(LaTeXRenderer().render("\\documentclass{standalone}"))
+
+
+TIKZ_FIGURE = """\\documentclass[border=2pt]{standalone}
+\\usepackage{amsmath,amssymb}
+\\usepackage{tikz}
+\\usetikzlibrary{arrows}
+\\begin{document}
+\\begin{tikzpicture}\\draw (0,0) -- (1,1);\\end{tikzpicture}
+\\end{document}"""
+
+
+def test_known_preambles_match_a_format():
+    latex_format, remainder = match_latex_format(TIKZ_FIGURE)
+
+    assert latex_format.label == "tikz"
+    assert latex_format.class_line == "\\documentclass[border=2pt]{standalone}"
+    assert "\\documentclass" not in remainder
+    assert remainder.lstrip().startswith("\\usepackage{amsmath,amssymb}")
+
+    # A package with options falls back to a smaller set, or to no format at all
+    assert match_latex_format(TIKZ_FIGURE.replace("{tikz}", "[pdftex]{tikz}"))[0].label == "ams"
+    assert match_latex_format(TIKZ_FIGURE.replace("\\usepackage{tikz}", "\\usepackage[fleqn]{amsmath}")) is None
+    # Class lines outside the allow-list never get a format (nor start a build)
+    assert match_latex_format(TIKZ_FIGURE.replace("border=2pt", "border=7pt")) is None
+    # Something precedes the class line
+    assert match_latex_format("\\RequirePackage{fix-cm}\n" + TIKZ_FIGURE) is None
+
+
+def test_renders_compile_against_precompiled_formats(fake_toolchain):
+    async def run():
+        names = await precompile_latex_formats()
+        return names, await LaTeXRenderer().render(TIKZ_FIGURE)
+
+    names, image = asyncio.run(run())
+
+    assert image == b"PNG"
+    assert len(names) == len(latex_formats.KNOWN_PACKAGE_SETS) * len(latex_formats.allowed_class_lines())
+    expected = latex_formats.LatexFormat(
+        "tikz", "\\documentclass[border=2pt]{standalone}", ("amsmath", "amssymb", "tikz")
+    ).name
+    assert expected in names
+    # Built in place next to the formats, leaving no work directories behind
+    assert all(path.suffix == ".fmt" for path in latex_formats.format_dir().iterdir())
+    assert fake_toolchain["formats_log"].read_text().split() == [expected]
+
+
+def test_class_line_whitespace_is_only_normalized_outside_braces(monkeypatch):
+    monkeypatch.setattr(
+        latex_formats.app_config, "latex_format_class_lines", "\\documentclass[border={2pt 5pt}]{standalone}"
+    )
+    figure = TIKZ_FIGURE.replace("[border=2pt]", "[ border={2pt 5pt} ]")
+
+    latex_format, _ = match_latex_format(figure)
+
+    assert latex_format.class_line == "\\documentclass[border={2pt 5pt}]{standalone}"
+
+
+def _figure(body: str) -> str:
+    return f"\\documentclass[border=2pt]{{standalone}}\n\\usepackage{{tikz}}\n\\begin{{document}}\n{body}\n\\end{{document}}"
+
+
+def test_figures_sharing_a_preamble_compile_as_one_document(fake_toolchain, monkeypatch):
+    monkeypatch.setattr(latex_formats.app_config, "latex_formats_enabled", False)
+    outputs = [_figure(f"\\tikz\\node{{{i}}};") for i in range(3)]
+
+    images = asyncio.run(LaTeXRenderer().render_many(outputs))
+
+    assert images == [b"PNG0", b"PNG1", b"PNG2"]
+    assert fake_toolchain["runs_log"].read_text().split() == ["run"]
+
+
+def test_failed_batch_falls_back_to_per_figure_compilation(fake_toolchain, monkeypatch):
+    monkeypatch.setattr(latex_formats.app_config, "latex_formats_enabled", False)
+    outputs = [_figure("\\tikz\\node{a};"), _figure("\\broken"), _figure("\\tikz\\node{b};")]
+
+    images = asyncio.run(LaTeXRenderer().render_many(outputs))
+
+    assert images[0] == images[2] == b"PNG"
+    assert isinstance(images[1], RuntimeError)
+    # One batch attempt, then each figure on its own
+    assert len(fake_toolchain["runs_log"].read_text().split()) == 4
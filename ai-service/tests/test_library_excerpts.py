@@ -0,0 +1,46 @@
+"""
+Tests for page-chunk grouping and page-subset excerpts.
+
+Run with: python -m pytest tests/test_library_excerpts.py -v
+"""
+
+import io
+
+import pytest
+from pydantic_ai import BinaryContent
+
+from src.services.question_paper.library.excerpts import build_excerpt, group_results_by_document
+
+pypdf = pytest.importorskip("pypdf")
+
+
+def _pdf(pages: int) -> bytes:
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=200)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def test_chunk_hits_take_precedence_and_spans_merge():
+    documents = group_results_by_document([
+        {"id": "h", "key": "h"},
+        {"id": "h:p6-10", "key": "h", "page_start": 6, "page_end": 10, "text": "b"},
+        {"id": "h:p1-5", "key": "h", "page_start": 1, "page_end": 5, "text": "a"},
+        {"id": "g", "key": "g"},
+    ])
+
+    assert [d.key for d in documents] == ["h", "g"]
+    assert documents[0].page_spans == [(1, 10)]
+    assert documents[1].page_spans is None
+
+
+def test_excerpt_keeps_only_matching_pages():
+    document = group_results_by_document([
+        {"id": "h:p3-4", "key": "h", "page_start": 3, "page_end": 4},
+    ])[0]
+
+    excerpt = build_excerpt(BinaryContent(data=_pdf(20), media_type="application/pdf"), document)
+
+    assert len(pypdf.PdfReader(io.BytesIO(excerpt.data)).pages) == 2
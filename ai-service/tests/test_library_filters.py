@@ -0,0 +1,108 @@
+"""
+Tests for library search queries, metadata pre-filters, term scoring and result fusion.
+
+Run with: python -m pytest tests/test_library_filters.py -v
+"""
+
+import pytest
+
+from src.services.question_paper.dto.generate.request import LibraryFilterDTO, QuestionPaperGenerateRequestDTO
+from src.services.question_paper.library import filters
+from src.services.question_paper.library.filters import (
+    build_metadata_filter,
+    build_search_query,
+    build_sub_query_topics,
+    matches_metadata_filter,
+)
+from src.services.question_paper.library.local_index import LocalVectorIndex
+
+
+def _request(**overrides) -> QuestionPaperGenerateRequestDTO:
+    data = {
+        "course": "Organic Chemistry",
+        "audience": "CBSE",
+        "topics": ["Alcohols", "Phenols"],
+        "item_schema": [{"type": "short", "count": 1, "marks_each": 2, "difficulty": "easy"}],
+    }
+    data.update(overrides)
+    return QuestionPaperGenerateRequestDTO(**data)
+
+
+CHEMISTRY = {"object_key": "chem", "subject_terms": ["chemistry"], "target_level_terms": ["class", "12"]}
+PHYSICS = {"object_key": "phys", "subject_terms": ["physics"], "target_level_terms": ["class", "12"]}
+
+
+@pytest.fixture
+def metadata_filter_enabled(monkeypatch):
+    monkeypatch.setattr(filters.app_config, "library_metadata_filter_enabled", True)
+
+
+def test_course_alone_does_not_filter(metadata_filter_enabled):
+    # "Class 12 Board Prep" shares no term with a document's "physics" subject
+    assert build_metadata_filter(_request()) is None
+    assert build_metadata_filter(_request(course="Class 12 Board Prep")) is None
+    assert "subject: Organic Chemistry" in build_search_query(_request())
+
+
+def test_filtering_is_off_by_default():
+    assert build_metadata_filter(_request(library_filter=LibraryFilterDTO(subject="Physics"))) is None
+
+
+def test_explicit_filter_requires_every_term(metadata_filter_enabled):
+    request = _request(library_filter=LibraryFilterDTO(subject="Physics", target_level="Class 10"))
+    metadata_filter = build_metadata_filter(request)
+
+    assert not matches_metadata_filter(PHYSICS, metadata_filter)
+    assert matches_metadata_filter({**PHYSICS, "target_level_terms": ["class", "10"]}, metadata_filter)
+    assert "subject: Physics" in build_search_query(request)
+    assert "key_topics: Alcohols, Phenols" in build_search_query(request)
+
+
+def test_local_index_applies_filter_before_ranking(metadata_filter_enabled):
+    index = LocalVectorIndex.from_vectors(["chem", "phys"], [[1.0, 0.1], [1.0, 0.0]], [CHEMISTRY, PHYSICS])
+    request = _request(library_filter=LibraryFilterDTO(subject="Chemistry"))
+
+    matches = index.query([1.0, 0.0], top_k=2, metadata_filter=build_metadata_filter(request))
+
+    assert [m["id"] for m in matches] == ["chem"]
+
+
+def test_bm25_ranks_exact_code_match_first():
+    from src.services.question_paper.library.term_index import BM25Index
+
+    term_index = BM25Index([
+        "institution: CBSE subject: Chemistry document_code: Subject Code 043 key_topics: Solutions",
+        "institution: CBSE subject: Chemistry document_code: null key_topics: Solutions, Polymers",
+        "institution: CBSE subject: Physics key_topics: Optics",
+    ])
+
+    assert [i for i, _ in term_index.top("chemistry 043", top_k=3)][0] == 0
+    assert term_index.top("biology", top_k=3) == []
+
+
+def test_sub_queries_pair_each_topic_with_course_context():
+    data = _request()
+    topic_groups = build_sub_query_topics(data)
+    sub_queries = [build_search_query(data, topics) for topics in topic_groups]
+
+    assert topic_groups == [["Alcohols", "Phenols"], ["Alcohols"], ["Phenols"]]
+    assert sub_queries[0].endswith("key_topics: Alcohols, Phenols")
+    assert sub_queries[1:] == [
+        "institution: CBSE subject: Organic Chemistry key_topics: Alcohols",
+        "institution: CBSE subject: Organic Chemistry key_topics: Phenols",
+    ]
+
+
+def test_mmr_prefers_a_diverse_document_over_a_near_duplicate():
+    from src.services.question_paper.library.search import _reciprocal_rank_fusion, _select_mmr
+
+    alcohols = [
+        {"id": "a1", "score": 0.9, "values": [1.0, 0.0]},
+        {"id": "a2", "score": 0.88, "values": [0.99, 0.01]},
+    ]
+    phenols = [{"id": "p1", "score": 0.8, "values": [0.0, 1.0]}]
+
+    fused = _reciprocal_rank_fusion([alcohols, phenols])
+    selected = _select_mmr(fused, limit=2, mmr_lambda=0.5)
+
+    assert {r["id"] for r in selected} == {"a1", "p1"}
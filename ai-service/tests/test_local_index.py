@@ -0,0 +1,99 @@
+"""
+Tests for the in-process vector index.
+
+Run with: python -m pytest tests/test_local_index.py -v
+"""
+
+import numpy as np
+import pytest
+
+from src.services.question_paper.library.local_index import LocalVectorIndex
+
+
+def _random_index(quantize: bool = False):
+    rng = np.random.default_rng(7)
+    vectors = rng.normal(size=(50, 16)).astype(np.float32)
+    ids = [f"doc-{i}" for i in range(len(vectors))]
+    metadata = [{"object_key": f"key-{i}"} for i in range(len(vectors))]
+    return vectors, LocalVectorIndex.from_vectors(ids, vectors, metadata, quantize=quantize)
+
+
+def test_query_returns_top_k_by_cosine_similarity():
+    vectors, index = _random_index()
+
+    matches = index.query(vectors[3] * 5, top_k=3)
+
+    assert [m["id"] for m in matches][0] == "doc-3"
+    assert matches[0]["score"] == pytest.approx(1.0, abs=1e-5)
+    assert matches[0]["metadata"] == {"object_key": "key-3"}
+    assert [m["score"] for m in matches] == sorted((m["score"] for m in matches), reverse=True)
+
+
+def test_quantized_index_matches_float_ranking(tmp_path):
+    vectors, index = _random_index()
+    index.save(tmp_path / "snapshot")
+
+    quantized = LocalVectorIndex.load(tmp_path / "snapshot", quantize=True)
+    assert quantized.is_quantized
+
+    expected = [m["id"] for m in index.query(vectors[10], top_k=1)]
+    assert [m["id"] for m in quantized.query(vectors[10], top_k=1)] == expected
+    assert quantized.query(vectors[10], top_k=1)[0]["score"] == pytest.approx(1.0, abs=1e-2)
+
+
+def test_quantized_copy_is_written_with_the_snapshot(tmp_path):
+    from src.services.question_paper.library.local_index import QUANTIZED_VECTORS_FILE, write_snapshot
+
+    vectors, index = _random_index()
+    records = [{"id": i, "metadata": {}} for i in index.ids]
+    write_snapshot(tmp_path / "snapshot", records, vectors, quantize=True)
+    quantized_path = tmp_path / "snapshot" / QUANTIZED_VECTORS_FILE
+    written = quantized_path.stat().st_mtime_ns
+
+    assert LocalVectorIndex.load(tmp_path / "snapshot", quantize=True).is_quantized
+    # Loaded as written, not derived again in the live directory
+    assert quantized_path.stat().st_mtime_ns == written
+
+    # A snapshot without the copy gets one, leaving no temporary files behind
+    index.save(tmp_path / "plain")
+    assert LocalVectorIndex.load(tmp_path / "plain", quantize=True).is_quantized
+    assert sorted(p.name for p in (tmp_path / "plain").iterdir()) == [
+        "records.json", "scales.npy", "vectors.i8.npy", "vectors.npy"
+    ]
+
+
+def test_empty_snapshot_round_trips(tmp_path):
+    from src.services.question_paper.library.local_index import write_snapshot
+
+    write_snapshot(tmp_path / "index", [], np.asarray([], dtype=np.float32))
+    write_snapshot(tmp_path / "index", [], np.asarray([], dtype=np.float32), quantize=True)
+
+    for quantize in (False, True):
+        index = LocalVectorIndex.load(tmp_path / "index", quantize=quantize)
+        assert len(index) == 0
+        assert index.query([1.0, 0.0], top_k=3) == []
+    # Only the snapshot is left behind; staging and backup siblings are removed
+    assert [p.name for p in tmp_path.iterdir()] == ["index"]
+
+
+def test_pinecone_snapshot_skips_vectors_without_values():
+    from types import SimpleNamespace
+
+    from src.services.question_paper.library.local_index import _pinecone_snapshot
+
+    class FakePinecone:
+        def list(self):
+            return [["a", "b", "c", "d"]]
+
+        def fetch(self, ids):
+            return {"vectors": {
+                "a": {"values": [1.0, 0.0], "metadata": {"object_key": "a"}},
+                "b": {"values": []},
+                "c": SimpleNamespace(values=None, metadata=None),
+                "d": SimpleNamespace(values=[0.0, 1.0], metadata=None),
+            }}
+
+    records, vectors = _pinecone_snapshot(FakePinecone())
+
+    assert records == [{"id": "a", "metadata": {"object_key": "a"}}, {"id": "d", "metadata": {}}]
+    assert vectors == [[1.0, 0.0], [0.0, 1.0]]
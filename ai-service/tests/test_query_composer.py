@@ -0,0 +1,54 @@
+"""
+Tests for compositional query embeddings.
+
+Run with: python -m pytest tests/test_query_composer.py -v
+"""
+
+import numpy as np
+import pytest
+
+from src.services.question_paper.dto.generate.request import QuestionPaperGenerateRequestDTO
+from src.services.question_paper.library import query_composer
+from src.services.question_paper.library.embedding_cache import normalize_query
+
+VECTORS = {
+    "institution: cbse": [1.0, 0.0, 0.0],
+    "subject: chemistry": [0.0, 1.0, 0.0],
+    "key_topics: alcohols": [0.0, 0.0, 1.0],
+    "key_topics: phenols": [0.0, 0.6, 0.8],
+}
+
+
+@pytest.mark.asyncio
+async def test_only_unseen_components_are_embedded_remotely(tmp_path, monkeypatch):
+    requested = []
+
+    async def fake_generate_embeddings(texts):
+        requested.append(list(texts))
+        return [VECTORS[normalize_query(t)] for t in texts]
+
+    monkeypatch.setattr(query_composer, "generate_embeddings", fake_generate_embeddings)
+    await query_composer.build_topic_vector_table(
+        ["institution: CBSE", "subject: Chemistry", "key_topics: Alcohols"], tmp_path
+    )
+    requested.clear()
+
+    monkeypatch.setattr(query_composer.app_config, "topic_vector_table_dir", str(tmp_path))
+    query_composer.reset_topic_vector_table()
+    data = QuestionPaperGenerateRequestDTO(
+        course="Chemistry",
+        audience="CBSE",
+        topics=["Alcohols", "Phenols"],
+        item_schema=[{"type": "short", "count": 1, "marks_each": 2, "difficulty": "easy"}],
+    )
+
+    embeddings = await query_composer.embed_library_queries(data, [["Alcohols"]], ["unused"])
+
+    assert requested == []
+    expected = 0.1 * np.array(VECTORS["institution: cbse"]) + 0.25 * np.array(VECTORS["subject: chemistry"]) \
+        + 0.6 * np.array(VECTORS["key_topics: alcohols"])
+    assert np.allclose(embeddings[0], expected / np.linalg.norm(expected), atol=1e-5)
+
+    await query_composer.embed_library_queries(data, [["Alcohols", "Phenols"]], ["unused"])
+    assert requested == [["key_topics: phenols"]]
+    query_composer.reset_topic_vector_table()
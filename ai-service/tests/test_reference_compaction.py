@@ -0,0 +1,135 @@
+"""
+Tests for user reference compaction.
+
+Run with: python -m pytest tests/test_reference_compaction.py -v
+"""
+
+import asyncio
+import io
+from concurrent.futures import Future
+
+from PIL import Image
+from pydantic_ai import BinaryContent
+from pypdf import PdfReader
+
+from src.utils.converter import reference_compaction
+from src.utils.converter.reference_compaction import CompactionSettings, compact_document
+
+SETTINGS = CompactionSettings(target_dpi=72, jpeg_quality=60)
+
+
+def _scan(seed: int) -> Image.Image:
+    """A noisy 'scanned page' at 300 DPI on US letter."""
+    return Image.effect_noise((2550, 3300), 40 + seed).convert("RGB")
+
+
+def _pdf(pages) -> bytes:
+    output = io.BytesIO()
+    pages[0].save(output, "PDF", resolution=300, save_all=True, append_images=pages[1:])
+    return output.getvalue()
+
+
+def test_scanned_pdfs_drop_blank_and_duplicate_pages_and_downsample():
+    page = _scan(0)
+    data = _pdf([page, page.copy(), Image.new("RGB", page.size, "white"), _scan(30)])
+
+    compacted, media_type = compact_document(data, "application/pdf", SETTINGS)
+
+    reader = PdfReader(io.BytesIO(compacted))
+    assert media_type == "application/pdf"
+    assert len(reader.pages) == 2
+    assert reader.pages[0].images[0].image.width == 612
+    assert len(compacted) < len(data) / 4
+
+
+def test_compacted_references_are_cached_by_content_hash(monkeypatch):
+    data = _pdf([_scan(0)])
+    calls = []
+
+    async def run():
+        content = BinaryContent(data=data, media_type="application/pdf")
+        first = await reference_compaction.compact_reference(content, SETTINGS)
+        second = await reference_compaction.compact_reference(content, SETTINGS)
+        return first, second
+
+    class InlineExecutor:
+        def submit(self, fn, *args):
+            calls.append(fn)
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+
+    monkeypatch.setattr(reference_compaction, "_get_executor", lambda: InlineExecutor())
+    monkeypatch.setattr(reference_compaction, "document_disk_cache", None)
+    monkeypatch.setattr(reference_compaction.app_config, "reference_compaction_min_bytes", 0)
+    reference_compaction.compacted_reference_cache.clear()
+
+    first, second = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert second.data == first.data
+    assert len(first.data) < len(data)
+
+
+def test_output_that_is_not_smaller_is_not_cached(monkeypatch):
+    calls = []
+
+    class UnchangedExecutor:
+        def submit(self, fn, data, media_type, settings):
+            calls.append(fn)
+            future = Future()
+            future.set_result((data, media_type))
+            return future
+
+    monkeypatch.setattr(reference_compaction, "_get_executor", lambda: UnchangedExecutor())
+    monkeypatch.setattr(reference_compaction, "document_disk_cache", None)
+    monkeypatch.setattr(reference_compaction.app_config, "reference_compaction_min_bytes", 0)
+    reference_compaction.compacted_reference_cache.clear()
+    content = BinaryContent(data=b"%PDF-already-small", media_type="application/pdf")
+
+    async def run():
+        return [await reference_compaction.compact_reference(content, SETTINGS) for _ in range(2)]
+
+    results = asyncio.run(run())
+
+    assert all(result is content for result in results)
+    assert len(calls) == 2
+    assert reference_compaction.compacted_reference_cache.size_bytes == 0
+
+
+def test_memory_tier_is_bounded_by_bytes(monkeypatch):
+    monkeypatch.setattr(reference_compaction, "document_disk_cache", None)
+    cache = reference_compaction.CompactedReferenceCache(max_entries=10, max_bytes=10)
+
+    async def run():
+        for key in ("a", "b", "c"):
+            await cache.put(key, b"1234", "application/pdf")
+        await cache.put("huge", b"x" * 11, "application/pdf")
+        return [await cache.get(key) is not None for key in ("a", "b", "c", "huge")]
+
+    assert asyncio.run(run()) == [False, True, True, False]
+    assert cache.size_bytes == 8
+
+
+def test_timed_out_compaction_recycles_the_pool(monkeypatch):
+    class StuckExecutor:
+        shut_down = False
+
+        def submit(self, fn, *args):
+            return Future()
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            self.shut_down = True
+
+    executor = StuckExecutor()
+    monkeypatch.setattr(reference_compaction, "_get_executor", lambda: executor)
+    monkeypatch.setattr(reference_compaction, "document_disk_cache", None)
+    monkeypatch.setattr(reference_compaction.app_config, "reference_compaction_min_bytes", 0)
+    monkeypatch.setattr(reference_compaction.app_config, "reference_compaction_timeout_seconds", 0.05)
+    reference_compaction.compacted_reference_cache.clear()
+    content = BinaryContent(data=b"%PDF-slow", media_type="application/pdf")
+
+    result = asyncio.run(reference_compaction.compact_reference(content, SETTINGS))
+
+    assert result is content
+    assert executor.shut_down
@@ -0,0 +1,124 @@
+"""
+Tests for streamed user reference downloads and uploads.
+
+Run with: python -m pytest tests/test_reference_mapper.py -v
+"""
+
+import asyncio
+import hashlib
+import io
+
+import httpx
+import pytest
+
+from src.utils.aws import s3_document_fetcher
+from src.utils.converter import reference_mapper
+from src.utils.converter.reference_cache import ReferenceCache
+from src.utils.converter.reference_upload import ReferenceUpload, object_key_for_handle
+
+PDF = b"%PDF-1.7\n" + b"0" * 5000
+
+
+def _download(handler, url="https://cdn.example.com/ref"):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as session:
+            return await reference_mapper._download_to_binary(session, url)
+
+    return asyncio.run(run())
+
+
+def test_media_type_is_sniffed_from_the_first_bytes():
+    content = _download(lambda request: httpx.Response(200, content=PDF, headers={"content-type": "application/octet-stream"}))
+
+    assert content.media_type == "application/pdf"
+    assert content.data == PDF
+
+
+def test_large_downloads_are_spooled_and_returned_whole(monkeypatch):
+    monkeypatch.setattr(reference_mapper.app_config, "reference_spool_threshold_bytes", 1024)
+
+    content = _download(lambda request: httpx.Response(200, content=PDF))
+
+    assert content.data == PDF
+
+
+def test_oversized_and_unsupported_references_are_rejected(monkeypatch):
+    monkeypatch.setattr(reference_mapper.app_config, "reference_max_bytes", 1000)
+
+    with pytest.raises(ValueError, match="byte limit"):
+        _download(lambda request: httpx.Response(200, content=PDF))
+
+    with pytest.raises(ValueError, match="Unsupported reference media type video/mp4"):
+        _download(lambda request: httpx.Response(200, content=b"\x00" * 10, headers={"content-type": "video/mp4"}))
+
+
+def test_cached_references_are_revalidated_with_conditional_gets(tmp_path, monkeypatch):
+    monkeypatch.setattr(reference_mapper, "reference_cache", ReferenceCache(str(tmp_path), max_bytes=1 << 20))
+    requests = []
+
+    def handler(request):
+        requests.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"etag": '"v1"'})
+        return httpx.Response(200, content=PDF, headers={"etag": '"v1"', "cache-control": "no-cache"})
+
+    first = _download(handler)
+    second = _download(handler)
+
+    assert requests == [None, '"v1"']
+    assert second.data == first.data == PDF
+    assert second.media_type == "application/pdf"
+
+
+def test_fresh_references_are_served_without_a_request(tmp_path, monkeypatch):
+    monkeypatch.setattr(reference_mapper, "reference_cache", ReferenceCache(str(tmp_path), max_bytes=1 << 20))
+    requests = []
+
+    def handler(request):
+        requests.append(request.url)
+        return httpx.Response(200, content=PDF, headers={"cache-control": "max-age=3600"})
+
+    _download(handler)
+    assert _download(handler).data == PDF
+    assert len(requests) == 1
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[Key] = (Body, ContentType)
+
+    def get_object(self, Bucket, Key, Range=None):
+        data, content_type = self.objects[Key]
+        return {"Body": io.BytesIO(data), "ContentType": content_type}
+
+
+def test_uploaded_chunks_are_stored_by_hash_and_fetched_by_handle(monkeypatch):
+    client = FakeS3Client()
+    monkeypatch.setattr(s3_document_fetcher, "_s3_client", client)
+    monkeypatch.setattr(s3_document_fetcher, "document_disk_cache", None)
+
+    async def run():
+        with ReferenceUpload() as upload:
+            for start in range(0, len(PDF), 1000):
+                upload.write(PDF[start:start + 1000], media_type="application/octet-stream" if start == 0 else "")
+            uploaded = await upload.commit()
+        documents = await reference_mapper.map_references_to_binary_contents(
+            [], object_keys=[object_key_for_handle(uploaded.handle)]
+        )
+        return uploaded, documents
+
+    try:
+        uploaded, documents = asyncio.run(run())
+    finally:
+        s3_document_fetcher.shutdown_s3_executor()
+
+    assert uploaded.handle == hashlib.sha256(PDF).hexdigest()
+    assert uploaded.size_bytes == len(PDF)
+    assert client.objects[f"reference-uploads/{uploaded.handle}"] == (PDF, "application/pdf")
+    assert [(d.data, d.media_type) for d in documents] == [(PDF, "application/pdf")]
+
+    with pytest.raises(ValueError, match="Invalid reference handle"):
+        object_key_for_handle("../library/secret.pdf")
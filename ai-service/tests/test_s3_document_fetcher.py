@@ -0,0 +1,108 @@
+"""
+Tests for concurrent S3 document fetching.
+
+Run with: python -m pytest tests/test_s3_document_fetcher.py -v
+"""
+
+import asyncio
+import io
+import threading
+import time
+
+import pytest
+
+from src.utils.aws import s3_document_fetcher
+from src.utils.errors import ServiceError
+
+
+class FakeS3Client:
+    def __init__(self, missing=(), objects=None):
+        self.missing = set(missing)
+        self.objects = objects or {}
+        self.ranges = []
+        self.threads = set()
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket, Key, Range=None):
+        with self._lock:
+            self.threads.add(threading.current_thread().name)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(0.05)
+            if Key in self.missing:
+                raise RuntimeError(f"cannot read {Key}")
+            data = self.objects.get(Key, Key.encode())
+            if Range is None:
+                return {"Body": io.BytesIO(data), "ContentType": "application/pdf"}
+            start, end = (int(n) for n in Range.removeprefix("bytes=").split("-"))
+            self.ranges.append((Key, start, end))
+            return {
+                "Body": io.BytesIO(data[start:end + 1]),
+                "ContentType": "application/pdf",
+                "ContentRange": f"bytes {start}-{min(end, len(data) - 1)}/{len(data)}",
+            }
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+@pytest.fixture
+def fake_s3(monkeypatch):
+    def install(client):
+        monkeypatch.setattr(s3_document_fetcher, "_s3_client", client)
+        return client
+
+    yield install
+    s3_document_fetcher.shutdown_s3_executor()
+
+
+def test_documents_are_fetched_concurrently_off_the_event_loop(fake_s3):
+    client = fake_s3(FakeS3Client())
+
+    fetched = asyncio.run(s3_document_fetcher.fetch_documents_by_key(["a", "b", "c", "d"], "bucket"))
+
+    assert list(fetched) == ["a", "b", "c", "d"]
+    assert fetched["c"].data == b"c"
+    assert client.max_active > 1
+    assert all(name.startswith("s3-fetch") for name in client.threads)
+
+
+def test_failed_documents_are_skipped_or_raise_service_error(fake_s3):
+    fake_s3(FakeS3Client(missing={"b"}))
+
+    fetched = asyncio.run(s3_document_fetcher.fetch_documents_by_key(["a", "b", "c"], "bucket", skip_failed=True))
+    assert list(fetched) == ["a", "c"]
+
+    with pytest.raises(ServiceError) as exc_info:
+        asyncio.run(s3_document_fetcher.fetch_documents_by_key(["a", "b"], "bucket", skip_failed=False))
+    assert exc_info.value.status_code == 500
+
+
+def test_large_objects_are_fetched_as_parallel_byte_ranges(fake_s3, monkeypatch):
+    monkeypatch.setattr(s3_document_fetcher.app_config, "s3_part_size_bytes", 10)
+    monkeypatch.setattr(s3_document_fetcher.app_config, "s3_multipart_threshold_bytes", 20)
+    data = bytes(range(45))
+    client = fake_s3(FakeS3Client(objects={"big": data}))
+
+    fetched = asyncio.run(s3_document_fetcher.fetch_documents_by_key(["big"], "bucket"))
+
+    assert fetched["big"].data == data
+    assert sorted(client.ranges) == [("big", 0, 9), ("big", 10, 19), ("big", 20, 29), ("big", 30, 39), ("big", 40, 44)]
+
+
+def test_fetch_timeout_starts_when_a_worker_picks_the_object_up(fake_s3, monkeypatch):
+    monkeypatch.setattr(s3_document_fetcher.app_config, "s3_fetch_concurrency", 1)
+    monkeypatch.setattr(s3_document_fetcher.app_config, "s3_fetch_timeout_seconds", 0.08)
+    fake_s3(FakeS3Client())
+
+    # Each download takes ~0.05s, so the last ones queue longer than the timeout but still succeed
+    fetched = asyncio.run(s3_document_fetcher.fetch_documents_by_key(["a", "b", "c"], "bucket", skip_failed=False))
+    assert list(fetched) == ["a", "b", "c"]
+
+    monkeypatch.setattr(s3_document_fetcher.app_config, "s3_fetch_timeout_seconds", 0.01)
+    with pytest.raises(ServiceError) as exc_info:
+        asyncio.run(s3_document_fetcher.fetch_documents_by_key(["a"], "bucket", skip_failed=False))
+    assert exc_info.value.status_code == 504
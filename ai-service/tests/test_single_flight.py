@@ -0,0 +1,89 @@
+"""
+Tests for single-flight coalescing of library retrievals.
+
+Run with: python -m pytest tests/test_single_flight.py -v
+"""
+
+import asyncio
+
+import pytest
+
+from src.services.question_paper.library.single_flight import SingleFlight, retrieval_key
+
+
+def test_concurrent_calls_share_one_execution_and_reuse_within_ttl():
+    flight = SingleFlight(ttl_seconds=60)
+    calls = []
+
+    async def retrieve():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["document"]
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("key", retrieve) for _ in range(5)))
+        later = await flight.do("key", retrieve)
+        return results, later
+
+    results, later = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert later is results[0]
+
+
+def test_failures_are_shared_but_not_cached():
+    flight = SingleFlight(ttl_seconds=60)
+    calls = []
+
+    async def failing():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("search failed")
+
+    async def run():
+        results = await asyncio.gather(*(flight.do("key", failing) for _ in range(3)), return_exceptions=True)
+        with pytest.raises(RuntimeError):
+            await flight.do("key", failing)
+        return results
+
+    results = asyncio.run(run())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(calls) == 2
+
+
+def test_retained_results_stay_within_the_byte_budget():
+    flight = SingleFlight(ttl_seconds=60, max_bytes=10, size_of=len)
+
+    async def run():
+        for key, result in (("a", b"1234"), ("b", b"12345"), ("c", b"123"), ("huge", b"x" * 11)):
+            await flight.do(key, lambda result=result: asyncio.sleep(0, result))
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    # "a" was displaced to make room for "c"; "huge" was never kept
+    assert list(flight._results) == ["b", "c"]
+    assert flight.retained_bytes == 8
+
+
+def test_expired_results_are_pruned_when_a_call_finishes():
+    flight = SingleFlight(ttl_seconds=0.01)
+
+    async def run():
+        await flight.do("old", lambda: asyncio.sleep(0, ["document"]))
+        await asyncio.sleep(0.02)
+        await flight.do("new", lambda: asyncio.sleep(0, ["document"]))
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+
+    assert list(flight._results) == ["new"]
+
+
+def test_retrieval_key_normalizes_query_text():
+    assert retrieval_key(["Physics  Waves"], {"subject_terms": {"$in": ["physics"]}}, True) == retrieval_key(
+        ["physics waves"], {"subject_terms": {"$in": ["physics"]}}, True
+    )
+    assert retrieval_key(["physics waves"], None, True) != retrieval_key(["physics waves"], None, False)
@@ -0,0 +1,127 @@
+"""
+Tests for speculative image rendering reuse by content hash and concurrent rendering.
+
+Run with: python -m pytest tests/test_speculative_rendering.py -v
+"""
+
+import asyncio
+
+import pytest
+
+from src.services.question_paper.models.ai_question_paper import (
+    AIQuestion,
+    AIQuestionImage,
+    AIQuestionImageRenderStrategy,
+    AIQuestionPaper,
+)
+from src.services.question_paper.response_mapper import (
+    SpeculativeImageRenderer,
+    convert_ai_to_core,
+    image_content_hash,
+)
+from src.services.question_paper.response_mapper.image import ImageRendererFactory
+from src.services.question_paper.response_mapper import render_limits
+from src.services.question_paper.response_mapper.image.rendering_interface import ImageRenderStrategy
+from src.services.question_paper.response_mapper.render_cache import rendered_image_cache
+
+
+class CountingRenderer(ImageRenderStrategy):
+    """Fake renderer that records every output it renders."""
+
+    calls: list = []
+
+    @property
+    def strategy_type(self) -> AIQuestionImageRenderStrategy:
+        return AIQuestionImageRenderStrategy.LATEX_RENDERED
+
+    async def render(self, output: str) -> bytes:
+        CountingRenderer.calls.append(output)
+        await asyncio.sleep(0)
+        return b"\x89PNG" + output.encode()
+
+
+@pytest.fixture
+def counting_renderer(monkeypatch):
+    CountingRenderer.calls = []
+    rendered_image_cache.clear()
+    monkeypatch.setitem(
+        ImageRendererFactory._strategies,
+        AIQuestionImageRenderStrategy.LATEX_RENDERED,
+        CountingRenderer,
+    )
+    return CountingRenderer
+
+
+def _paper(*outputs: str) -> AIQuestionPaper:
+    return AIQuestionPaper(
+        name="Speculative Test",
+        questions=[
+            AIQuestion(
+                text=f"Question {idx}",
+                marks=1,
+                bloom_level=1,
+                image=AIQuestionImage(
+                    output=output,
+                    render_strategy=AIQuestionImageRenderStrategy.LATEX_RENDERED,
+                ),
+            )
+            for idx, output in enumerate(outputs)
+        ],
+    )
+
+
+def test_image_content_hash_depends_on_strategy_and_output():
+    latex = AIQuestionImage(output="x", render_strategy=AIQuestionImageRenderStrategy.LATEX_RENDERED)
+    same = AIQuestionImage(output="x", render_strategy=AIQuestionImageRenderStrategy.LATEX_RENDERED)
+    other = AIQuestionImage(output="x", render_strategy=AIQuestionImageRenderStrategy.AI_GENERATED)
+
+    assert image_content_hash(latex) == image_content_hash(same)
+    assert image_content_hash(latex) != image_content_hash(other)
+
+
+@pytest.mark.asyncio
+class TestSpeculativeImageRenderer:
+    """Test reuse of speculative renders."""
+
+    async def test_passing_candidate_is_reused_as_is(self, counting_renderer):
+        renderer = SpeculativeImageRenderer()
+        candidate = _paper("a", "b")
+
+        assert renderer.prefetch(candidate) == 2
+        core_paper = await convert_ai_to_core(candidate, image_renderer=renderer)
+        await renderer.aclose()
+
+        assert sorted(counting_renderer.calls) == ["a", "b"]
+        assert all(len(q.images) == 1 for q in core_paper.questions)
+
+    async def test_failed_candidate_only_rerenders_changed_images(self, counting_renderer):
+        renderer = SpeculativeImageRenderer()
+        renderer.prefetch(_paper("a", "b"))
+
+        # Verification failed and the model revised only the second image
+        final_paper = _paper("a", "b-revised")
+        await convert_ai_to_core(final_paper, image_renderer=renderer)
+        await renderer.aclose()
+
+        assert counting_renderer.calls.count("a") == 1
+        assert "b-revised" in counting_renderer.calls
+
+    async def test_questions_render_concurrently_within_the_strategy_cap(self, counting_renderer, monkeypatch):
+        monkeypatch.setattr(render_limits.app_config, "render_concurrency_overrides", "latex_rendered=2")
+        active, peak = 0, 0
+
+        async def slow_render(self, output: str) -> bytes:
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            # Later questions finish first; the paper must keep its order anyway
+            await asyncio.sleep(0.01 * (6 - int(output)))
+            active -= 1
+            return output.encode()
+
+        monkeypatch.setattr(CountingRenderer, "render", slow_render)
+
+        core_paper = await convert_ai_to_core(_paper("1", "2", "3", "4", "5"))
+
+        assert peak == 2
+        assert [q.text for q in core_paper.questions] == [f"Question {idx}" for idx in range(5)]
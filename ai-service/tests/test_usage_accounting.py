@@ -0,0 +1,106 @@
+"""
+Tests for per-request usage accounting and budget enforcement.
+
+Run with: python -m pytest tests/test_usage_accounting.py -v
+"""
+
+import pytest
+from pydantic_ai.exceptions import UsageLimitExceeded
+from pydantic_ai.usage import RunUsage
+
+from src.services.question_paper import usage
+from src.services.question_paper.deps import QuestionPaperAgentDeps
+from src.services.question_paper.tools.verification_agent.models import AIQuestionPaperWithoutImages
+from src.services.question_paper.usage import TenantUsageLedger, UsageTracker
+from src.utils.errors import ServiceError
+
+
+def test_summary_aggregates_tokens_and_images_per_model():
+    tracker = UsageTracker()
+    first = tracker.track_run("learnlm-2.0-flash-experimental", RunUsage())
+    first.incr(RunUsage(requests=1, input_tokens=1_000_000, output_tokens=0))
+    tracker.track_run("deepseek/deepseek-chat-v3.1", RunUsage(requests=1, input_tokens=10, output_tokens=5))
+    tracker.record_images("imagen-4.0-fast-generate-001", 2)
+
+    summary = tracker.summary()
+    by_model = {m.model: m for m in summary.models}
+
+    assert by_model["learnlm-2.0-flash-experimental"].estimated_cost_usd == pytest.approx(0.10)
+    assert by_model["imagen-4.0-fast-generate-001"].images == 2
+    assert summary.input_tokens == 1_000_010
+    assert summary.output_tokens == 5
+
+
+def test_token_ceiling_stops_verification_and_raises():
+    tracker = UsageTracker(max_tokens=100, max_verification_rounds=3)
+    assert tracker.start_verification_round() is None
+
+    tracker.track_run("learnlm-2.0-flash-experimental", RunUsage(input_tokens=90, output_tokens=20))
+
+    assert "token budget" in tracker.start_verification_round()
+    with pytest.raises(ServiceError) as exc_info:
+        tracker.check()
+    assert exc_info.value.status_code == 429
+
+
+def test_verification_rounds_are_capped():
+    tracker = UsageTracker(max_verification_rounds=2)
+
+    assert tracker.start_verification_round() is None
+    assert tracker.start_verification_round() is None
+    assert "verification rounds" in tracker.start_verification_round()
+
+
+def test_tenant_ledger_tracks_spend_per_tenant():
+    ledger = TenantUsageLedger(window_seconds=3600)
+    ledger.charge("tenant-a", 0.5)
+    ledger.charge("tenant-a", 0.25)
+    ledger.charge("tenant-b", 1.0)
+
+    assert ledger.spent("tenant-a") == pytest.approx(0.75)
+    assert ledger.spent("tenant-b") == pytest.approx(1.0)
+    assert ledger.spent("tenant-c") == 0
+
+
+def test_tenant_reservations_count_requests_still_running(monkeypatch):
+    monkeypatch.setattr(usage.app_config, "usage_tenant_cost_ceiling_usd", 1.0)
+    ledger = TenantUsageLedger(window_seconds=3600)
+    first = ledger.reserve("tenant-a", 0.6)
+    second = ledger.reserve("tenant-a", 0.6)
+
+    # Both running requests hold their estimates, so a third one is refused
+    with pytest.raises(ServiceError) as exc_info:
+        ledger.reserve("tenant-a", 0.6)
+    assert exc_info.value.status_code == 429
+
+    ledger.settle(first, 0.1)
+    ledger.settle(second, 0.2)
+    assert ledger.spent("tenant-a") == pytest.approx(0.3)
+    assert ledger.reserve("tenant-a", 0.6) is not None
+    assert ledger.reserve(None, 0.6) is None
+
+
+def test_run_limits_count_the_other_runs_of_the_request():
+    tracker = UsageTracker(max_tokens=100)
+    generation = tracker.track_run("learnlm-2.0-flash-experimental", RunUsage(input_tokens=20))
+    limits = tracker.usage_limits()
+    limits.check_tokens(generation)
+
+    # A verification run spends the rest of the budget in its own RunUsage
+    tracker.track_run("deepseek/deepseek-chat-v3.1", RunUsage(input_tokens=70, output_tokens=10))
+
+    with pytest.raises(UsageLimitExceeded, match="token budget"):
+        limits.check_before_request(generation)
+
+
+def test_last_verified_candidate_converts_to_a_paper():
+    deps = QuestionPaperAgentDeps()
+    assert deps.candidate_paper("Physics") is None
+
+    deps.candidate = AIQuestionPaperWithoutImages(questions=[
+        {"uuid": "q1", "text": "State Ohm's law.", "marks": 2, "difficulty_level": "medium"},
+    ])
+    paper = deps.candidate_paper("Physics")
+
+    assert paper.name == "Physics"
+    assert [(q.text, q.bloom_level, q.image) for q in paper.questions] == [("State Ohm's law.", 3, None)]
@@ -19,12 +19,37 @@ export interface QuestionSchemaItem {
   sub_questions?: SubQuestionSchemaItem[];
 }
 
+export interface LibraryFilter {
+  subject?: string;
+  institution?: string;
+  target_level?: string;
+  academic_year?: string;
+  doc_type?: string;
+  language?: string;
+}
+
 export interface QuestionPaperGenerateRequest {
   course: string;
   audience: string;
   topics: string[];
   user_reference_media_urls?: string[];
   item_schema: QuestionSchemaItem[];
+  tenant_id?: string;
+  library_filter?: LibraryFilter;
+  user_reference_object_keys?: string[]; // keys of references already in the S3 bucket
+  user_reference_handles?: string[]; // handles returned by UploadReference
+}
+
+export interface ReferenceUploadChunk {
+  data: Buffer;
+  media_type?: string; // read from the first chunk setting it
+  file_name?: string;
+}
+
+export interface ReferenceUploadResponse {
+  handle: string;
+  size_bytes: string; // int64 (loaded with longs: String)
+  media_type: string;
 }
 
 // Response messages
@@ -55,8 +80,25 @@ export interface QuestionPaper {
   questions: Question[];
 }
 
+export interface ModelUsage {
+  model: string;
+  requests: number;
+  input_tokens: number;
+  output_tokens: number;
+  images: number;
+  estimated_cost_usd: number;
+}
+
+export interface QuestionPaperUsage {
+  models?: ModelUsage[];
+  input_tokens: number;
+  output_tokens: number;
+  estimated_cost_usd: number;
+}
+
 export interface QuestionPaperGenerateResponse {
   question_paper: QuestionPaper;
+  usage?: QuestionPaperUsage;
 }
 
 // gRPC service interfaces
@@ -64,6 +106,9 @@ export interface QuestionPaperService {
   Generate(
     data: QuestionPaperGenerateRequest,
   ): Observable<QuestionPaperGenerateResponse>;
+  UploadReference(
+    chunks: Observable<ReferenceUploadChunk>,
+  ): Observable<ReferenceUploadResponse>;
 }
 
 export interface ImageService {
@@ -6,14 +6,19 @@ import {
   Optional,
 } from '@nestjs/common';
 import { ClientGrpc } from '@nestjs/microservices';
-import { lastValueFrom } from 'rxjs';
+import { defer, from, lastValueFrom } from 'rxjs';
 import { retry, timeout } from 'rxjs/operators';
 import {
   QuestionPaperGenerateRequest,
   QuestionPaperGenerateResponse,
   QuestionPaperService,
+  ReferenceUploadChunk,
+  ReferenceUploadResponse,
 } from './grpc.types';
 
+// Size of each chunk streamed to UploadReference
+const REFERENCE_UPLOAD_CHUNK_BYTES = 1024 * 1024;
+
 @Injectable()
 export class QuestionPaperAiBridgeService implements OnModuleInit {
   private readonly logger = new Logger(QuestionPaperAiBridgeService.name);
@@ -78,4 +83,47 @@ export class QuestionPaperAiBridgeService implements OnModuleInit {
       throw new Error('AI gRPC request failed');
     }
   }
+
+  /**
+   * Stream a reference document to the AI service
+   * @param data - The document bytes
+   * @param mediaType - Declared media type (the AI service sniffs the content as well)
+   * @param fileName - Original file name, used for logging and type detection
+   * @returns Promise<ReferenceUploadResponse> - The handle to pass as user_reference_handles
+   */
+  async uploadReference(
+    data: Buffer,
+    mediaType?: string,
+    fileName?: string,
+  ): Promise<ReferenceUploadResponse> {
+    if (!this.grpcQuestionPaperService) {
+      throw new Error('gRPC client not initialized');
+    }
+    const service = this.grpcQuestionPaperService;
+
+    const chunks: ReferenceUploadChunk[] = [];
+    for (
+      let offset = 0;
+      offset < data.length;
+      offset += REFERENCE_UPLOAD_CHUNK_BYTES
+    ) {
+      chunks.push({
+        data: data.subarray(offset, offset + REFERENCE_UPLOAD_CHUNK_BYTES),
+        ...(offset === 0 ? { media_type: mediaType, file_name: fileName } : {}),
+      });
+    }
+
+    try {
+      // defer() re-sends the whole stream on retry
+      return await lastValueFrom(
+        defer(() => service.UploadReference(from(chunks))).pipe(
+          timeout(120000),
+          retry(2),
+        ),
+      );
+    } catch (error) {
+      this.logger.error(`Reference upload failed: ${error?.message}`);
+      throw new Error('AI gRPC reference upload failed');
+    }
+  }
 }
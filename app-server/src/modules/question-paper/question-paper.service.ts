@@ -232,6 +232,9 @@ export class QuestionPaperService {
       const aiBridgeRequest =
         await this.generateWithAiMapper.toAiBridgeRequest(generateDto);
 
+      // Bill AI usage to the requesting user for per-tenant ceilings
+      aiBridgeRequest.tenant_id = user.id;
+
       // Call the AI service to generate the question paper
       const aiResponse =
         await this.aiBridgeService.generateQuestionPaper(aiBridgeRequest);
@@ -22,4 +22,33 @@ def generate_embeddings(client: genai.Client, content: str) -> list[types.Conten
     if not response or not response.embeddings:
         raise ValueError("No vector generated for the content.")
 
-    return response.embeddings
\ No newline at end of file
+    return response.embeddings
+
+def generate_embeddings_batch(
+    client: genai.Client,
+    contents: list[str],
+    batch_size: int = 100,
+) -> list[list[float]]:
+    """
+    Generate vectors for many texts, sending up to `batch_size` texts per request.
+
+    Args:
+        client: An instance of the Google Gemini client
+        contents: The texts to generate vectors for
+        batch_size: Maximum texts per embed_content request
+
+    Returns:
+        Vector values in the same order as `contents`
+    """
+    vectors: list[list[float]] = []
+    for start in range(0, len(contents), batch_size):
+        batch = contents[start:start + batch_size]
+        response = client.models.embed_content(
+            model="gemini-embedding-001",
+            contents=batch,
+            config=types.EmbedContentConfig(task_type="RETRIEVAL_DOCUMENT")
+        )
+        if not response or not response.embeddings or len(response.embeddings) != len(batch):
+            raise ValueError("Vector generation returned fewer vectors than requested.")
+        vectors.extend(list(embedding.values or []) for embedding in response.embeddings)
+    return vectors
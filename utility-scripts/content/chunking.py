@@ -0,0 +1,99 @@
+from pathlib import Path
+from typing import List
+
+from google import genai
+from pydantic import BaseModel
+from pypdf import PdfReader
+
+from ai.vector_generation import generate_embeddings_batch
+from vector_models import CreateVectorDTO
+
+
+# Pinecone metadata is limited to 40KB per vector; keep chunk text well below it
+MAX_CHUNK_TEXT_CHARS = 8000
+
+
+class PageChunk(BaseModel):
+    page_start: int  # 1-based, inclusive
+    page_end: int  # 1-based, inclusive
+    text: str
+
+
+def chunk_id(file_hash: str, chunk: PageChunk) -> str:
+    """Vector id of a page chunk: `{hash}:p{start}-{end}`."""
+    return f"{file_hash}:p{chunk.page_start}-{chunk.page_end}"
+
+
+def split_pdf_pages(path: Path, pages_per_chunk: int) -> List[PageChunk]:
+    """
+    Split a PDF into page-range chunks with their extracted text.
+
+    Args:
+        path: Path to the PDF file
+        pages_per_chunk: Number of pages per chunk
+
+    Returns:
+        List of PageChunk objects; chunks without extractable text are skipped
+    """
+    reader = PdfReader(str(path))
+    page_count = len(reader.pages)
+    chunks: List[PageChunk] = []
+
+    for start in range(0, page_count, pages_per_chunk):
+        end = min(start + pages_per_chunk, page_count)
+        texts = []
+        for page_index in range(start, end):
+            try:
+                texts.append(reader.pages[page_index].extract_text() or "")
+            except Exception as e:
+                print(f"Warning: failed to extract text from page {page_index + 1} of {path.name}: {e}")
+        text = " ".join(" ".join(texts).split())
+        if not text:
+            continue
+        chunks.append(PageChunk(page_start=start + 1, page_end=end, text=text[:MAX_CHUNK_TEXT_CHARS]))
+
+    return chunks
+
+
+def build_chunk_vectors(
+    client: genai.Client,
+    path: Path,
+    file_hash: str,
+    object_key: str,
+    metadata: dict,
+    pages_per_chunk: int,
+) -> List[CreateVectorDTO]:
+    """
+    Split a PDF into page chunks and embed them in batches.
+
+    Each chunk vector carries the document metadata plus `parent_id`,
+    `page_start` and `page_end`, so the AI service can send only the
+    matching pages of a large document.
+
+    Returns:
+        Chunk vectors ready to store (empty for non-PDF documents)
+    """
+    if path.suffix.lower() != ".pdf":
+        return []
+
+    chunks = split_pdf_pages(path, pages_per_chunk)
+    if not chunks:
+        return []
+
+    embeddings = generate_embeddings_batch(client, [chunk.text for chunk in chunks])
+    return [
+        CreateVectorDTO(
+            embedding=embedding,
+            text_content=chunk.text,
+            file_hash=file_hash,
+            object_key=object_key,
+            metadata={
+                **metadata,
+                "parent_id": file_hash,
+                "page_start": chunk.page_start,
+                "page_end": chunk.page_end,
+            },
+            vector_id=chunk_id(file_hash, chunk),
+        )
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
@@ -41,6 +41,27 @@ class Settings(BaseSettings):
         min_length=1
     )
     
+    vector_snapshot_prefix: str = Field(
+        default="vector-index",
+        description="S3 key prefix of the vector snapshot synced by the AI service"
+    )
+    publish_vector_snapshot: bool = Field(
+        default=True,
+        description="Merge newly stored vectors into the S3 vector snapshot after each run"
+    )
+    
+    # Page Chunk Indexing Configuration
+    index_page_chunks: bool = Field(
+        default=True,
+        description="Also index PDFs as page-range chunks for page-subset retrieval"
+    )
+    chunk_pages: int = Field(
+        default=5,
+        ge=1,
+        le=50,
+        description="Number of pages per indexed chunk"
+    )
+    
     # Pinecone Configuration
     pinecone_api_key: str = Field(
         description="Pinecone API key for vector storage",
@@ -127,6 +148,10 @@ def get_settings() -> Settings:
         print("- PROCESSED_DIRECTORY (default: 'processed')")
         print("- OUTPUT_DIRECTORY (default: 'output')")
         print("- MAX_WORKERS (default: 3, range: 1-20)")
+        print("- VECTOR_SNAPSHOT_PREFIX (default: 'vector-index')")
+        print("- PUBLISH_VECTOR_SNAPSHOT (default: True)")
+        print("- INDEX_PAGE_CHUNKS (default: True)")
+        print("- CHUNK_PAGES (default: 5, range: 1-50)")
         print("- USE_BATCH_PROCESSING (default: False) - Batch mode for summaries")
         print("- BATCH_GENERATION_CHUNK_SIZE (default: 50, range: 1-200)")
         print("- BATCH_POLL_INTERVAL (default: 30, range: 10-300)")
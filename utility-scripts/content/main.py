@@ -11,16 +11,19 @@ from ai.document import upload_local_document_to_ai
 from ai.generation import generate_summary
 from ai.vector_generation import generate_embeddings
 from hashing import get_pdf_hash
-from pinecone_vector_store import store_vector, check_vector_exists
+from pinecone_vector_store import store_vector, store_vectors, check_vector_exists
 from vector_models import CreateVectorDTO
 from s3_object_storage import upload_document_to_bucket, UploadDocumentDTO
+from vector_snapshot import VectorSnapshot
+from metadata import extract_document_metadata, to_vector_metadata
+from chunking import build_chunk_vectors
 
 
 # Global lock for thread-safe document loading
 document_lock = Lock()
 
 
-def process_document(document_path: Path, settings: Settings, client, pinecone_index, s3_client, worker_id: int):
+def process_document(document_path: Path, settings: Settings, client, pinecone_index, s3_client, snapshot: VectorSnapshot, worker_id: int):
     """
     Process a single document: generate hash, check existence, create embeddings, and store.
     
@@ -30,6 +33,7 @@ def process_document(document_path: Path, settings: Settings, client, pinecone_i
         client: Google Gemini client
         pinecone_index: Pinecone index instance
         s3_client: S3 client instance
+        snapshot: Collector of stored vectors for the S3 vector snapshot
         worker_id: ID of the worker thread for logging
         
     Returns:
@@ -80,16 +84,33 @@ def process_document(document_path: Path, settings: Settings, client, pinecone_i
         upload_document_to_bucket(s3_client, upload_dto)
         print(f"[Worker {worker_id}] Document uploaded to S3: s3://{settings.s3_bucket_name}/{s3_object_key}")
         
-        # Create vector DTO with S3 object key
+        # Extract structured metadata used for filtered retrieval
+        document_metadata = extract_document_metadata(document_path, summary)
+        print(f"[Worker {worker_id}] Extracted metadata: {document_metadata.model_dump(exclude_none=True)}")
+        
+        # Create vector DTO with S3 object key and metadata
+        vector_metadata = to_vector_metadata(document_metadata)
         vector_dto = CreateVectorDTO(
             embedding=embedding_values,
             text_content=summary,
             file_hash=file_hash,
-            object_key=s3_object_key
+            object_key=s3_object_key,
+            metadata=vector_metadata
         )
         
+        # Index page chunks first: the summary vector marks the document as processed
+        if settings.index_page_chunks:
+            chunk_vectors = build_chunk_vectors(
+                client, document_path, file_hash, s3_object_key, vector_metadata, settings.chunk_pages
+            )
+            store_vectors(pinecone_index, chunk_vectors)
+            for chunk_vector in chunk_vectors:
+                snapshot.add(chunk_vector)
+            print(f"[Worker {worker_id}] Stored {len(chunk_vectors)} page chunk vectors")
+        
         # Store vector in Pinecone
         store_vector(pinecone_index, vector_dto)
+        snapshot.add(vector_dto)
         print(f"[Worker {worker_id}] Vector stored successfully in Pinecone")
         
         # Move the processed document to a 'processed' directory
@@ -155,6 +176,7 @@ def main():
     processed_count = 0
     failed_count = 0
     skipped_count = 0
+    snapshot = VectorSnapshot()
     
     with ThreadPoolExecutor(max_workers=settings.max_workers) as executor:
         # Submit all tasks
@@ -166,6 +188,7 @@ def main():
                 client,
                 pinecone_index,
                 s3_client,
+                snapshot,
                 i + 1
             ): doc_path
             for i, doc_path in enumerate(documents_to_process)
@@ -189,7 +212,12 @@ def main():
                 failed_count += 1
                 print(f"✗ Exception for {doc_path.name}: {str(e)}")
     
-    # Step 7: Print summary
+    # Step 7: Publish newly stored vectors to the S3 vector snapshot
+    if settings.publish_vector_snapshot and len(snapshot) > 0:
+        total_vectors = snapshot.publish(s3_client, settings.s3_bucket_name, settings.vector_snapshot_prefix)
+        print(f"Published vector snapshot with {total_vectors} vectors to s3://{settings.s3_bucket_name}/{settings.vector_snapshot_prefix}/")
+    
+    # Step 8: Print summary
     print(f"\n{'='*60}")
     print("Document Processing Summary")
     print(f"{'='*60}")
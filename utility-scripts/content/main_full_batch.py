@@ -12,9 +12,12 @@ from ai.document import upload_local_document_to_ai
 from ai.batch_generation import generate_summaries_batch_chunked
 from ai.vector_generation import generate_embeddings
 from hashing import get_pdf_hash
-from pinecone_vector_store import store_vector, check_vector_exists
+from pinecone_vector_store import store_vector, store_vectors, check_vector_exists
 from vector_models import CreateVectorDTO
 from s3_object_storage import upload_document_to_bucket, UploadDocumentDTO
+from vector_snapshot import VectorSnapshot
+from metadata import extract_document_metadata, to_vector_metadata
+from chunking import build_chunk_vectors
 
 # Thread-safe locks for shared data structures
 uploaded_docs_lock = Lock()
@@ -234,7 +237,8 @@ def store_documents_with_summaries_and_embeddings(
     document_metadata: Dict[str, Dict],
     settings: Settings,
     pinecone_index,
-    s3_client
+    s3_client,
+    snapshot: VectorSnapshot
 ) -> Tuple[int, int]:
     """
     Store documents to S3 and vectors to Pinecone using batch-generated summaries and embeddings.
@@ -270,14 +274,31 @@ def store_documents_with_summaries_and_embeddings(
             upload_document_to_bucket(s3_client, upload_dto)
             print(f"  - Uploaded to S3")
             
+            # Extract metadata before the document is moved to the processed directory
+            document_metadata = extract_document_metadata(doc_path, summary)
+            vector_metadata = to_vector_metadata(document_metadata)
+            
+            # Index page chunks first: the summary vector marks the document as processed
+            if settings.index_page_chunks:
+                chunk_vectors = build_chunk_vectors(
+                    client, doc_path, metadata['file_hash'], metadata['s3_object_key'],
+                    vector_metadata, settings.chunk_pages
+                )
+                store_vectors(pinecone_index, chunk_vectors)
+                for chunk_vector in chunk_vectors:
+                    snapshot.add(chunk_vector)
+                print(f"  - Stored {len(chunk_vectors)} page chunk vectors")
+            
             # Create and store vector
             vector_dto = CreateVectorDTO(
                 embedding=embedding_values,
                 text_content=summary,
                 file_hash=metadata['file_hash'],
-                object_key=metadata['s3_object_key']
+                object_key=metadata['s3_object_key'],
+                metadata=vector_metadata
             )
             store_vector(pinecone_index, vector_dto)
+            snapshot.add(vector_dto)
             print(f"  - Vector stored in Pinecone")
             
             # Move to processed directory
@@ -306,7 +327,8 @@ def process_document_chunk(
     settings: Settings,
     client: genai.Client,
     pinecone_index,
-    s3_client
+    s3_client,
+    snapshot: VectorSnapshot
 ) -> Tuple[int, int, int]:
     """
     Process a single chunk of documents through the complete pipeline:
@@ -391,7 +413,8 @@ def process_document_chunk(
         document_metadata=document_metadata,
         settings=settings,
         pinecone_index=pinecone_index,
-        s3_client=s3_client
+        s3_client=s3_client,
+        snapshot=snapshot
     )
     
     print(f"\nChunk {chunk_num} Complete: {success_count} processed, {failed_count} failed")
@@ -457,6 +480,7 @@ def main_full_batch():
     total_processed = 0
     total_skipped = 0
     total_failed = 0
+    snapshot = VectorSnapshot()
     
     for i in range(0, len(documents), chunk_size):
         chunk = documents[i:i + chunk_size]
@@ -469,13 +493,19 @@ def main_full_batch():
             settings=settings,
             client=client,
             pinecone_index=pinecone_index,
-            s3_client=s3_client
+            s3_client=s3_client,
+            snapshot=snapshot
         )
         
         total_processed += processed
         total_skipped += skipped
         total_failed += failed
     
+    # Publish newly stored vectors to the S3 vector snapshot
+    if settings.publish_vector_snapshot and len(snapshot) > 0:
+        total_vectors = snapshot.publish(s3_client, settings.s3_bucket_name, settings.vector_snapshot_prefix)
+        print(f"Published vector snapshot with {total_vectors} vectors to s3://{settings.s3_bucket_name}/{settings.vector_snapshot_prefix}/")
+    
     # Final summary
     print(f"\n{'='*60}")
     print("FINAL SUMMARY")
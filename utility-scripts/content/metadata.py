@@ -0,0 +1,115 @@
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+from pypdf import PdfReader
+
+
+# Fields emitted by the summarizer (see ai/system_prompt.md), in output order
+SUMMARY_FIELDS = [
+    "institution",
+    "doc_type",
+    "subject",
+    "academic_year",
+    "target_level",
+    "document_code",
+    "language",
+    "total_marks",
+    "time_limit",
+    "key_topics",
+]
+
+# Text fields that get a normalized `<field>_terms` list for metadata filtering
+FILTER_FIELDS = ["institution", "doc_type", "subject", "academic_year", "target_level", "language"]
+
+_FIELD_PATTERN = re.compile(r"\b(" + "|".join(SUMMARY_FIELDS) + r"):")
+_TERM_PATTERN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = {"a", "an", "and", "as", "for", "from", "in", "of", "on", "the", "to", "with", "inferred", "complexity"}
+
+
+class DocumentMetadata(BaseModel):
+    institution: Optional[str] = None
+    doc_type: Optional[str] = None
+    subject: Optional[str] = None
+    academic_year: Optional[str] = None
+    target_level: Optional[str] = None
+    language: Optional[str] = None
+    page_count: Optional[int] = None
+    size_bytes: int = 0
+
+
+def metadata_terms(value: str) -> List[str]:
+    """
+    Normalize a metadata value into lowercase terms for filtering.
+
+    Must stay in sync with `metadata_terms` in the AI service library filters.
+    """
+    value = re.sub(r"\(.*?\)", " ", value.lower())
+    terms = [t for t in _TERM_PATTERN.findall(value) if t not in _STOPWORDS]
+    return list(dict.fromkeys(terms))
+
+
+def parse_summary_fields(summary: str) -> Dict[str, str]:
+    """
+    Parse the `field: value` pairs of a summarizer response.
+
+    Args:
+        summary: Summary text in the structure defined by the system prompt
+
+    Returns:
+        Dict of field name to value; fields reported as null are omitted
+    """
+    fields: Dict[str, str] = {}
+    matches = list(_FIELD_PATTERN.finditer(summary))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(summary)
+        value = summary[match.end():end].strip()
+        if value and value.lower() not in {"null", "none", "n/a"}:
+            fields[match.group(1)] = value
+    return fields
+
+
+def count_pdf_pages(path: Path) -> Optional[int]:
+    """Return the page count of a PDF, or None for other files or unreadable PDFs."""
+    if path.suffix.lower() != ".pdf":
+        return None
+    try:
+        return len(PdfReader(str(path)).pages)
+    except Exception as e:
+        print(f"Warning: failed to read page count of {path.name}: {e}")
+        return None
+
+
+def extract_document_metadata(path: Path, summary: str) -> DocumentMetadata:
+    """
+    Build structured metadata for a document from its summary and file.
+
+    Args:
+        path: Local path of the document
+        summary: Summarizer output for the document
+
+    Returns:
+        DocumentMetadata with the fields that could be determined
+    """
+    fields = parse_summary_fields(summary)
+    return DocumentMetadata(
+        **{name: fields.get(name) for name in FILTER_FIELDS},
+        page_count=count_pdf_pages(path),
+        size_bytes=path.stat().st_size,
+    )
+
+
+def to_vector_metadata(metadata: DocumentMetadata) -> Dict:
+    """
+    Convert document metadata into Pinecone-compatible vector metadata.
+
+    Null values are dropped (Pinecone rejects them) and every text filter
+    field gets a `<field>_terms` list for `$in` filtering.
+    """
+    vector_metadata: Dict = {k: v for k, v in metadata.model_dump().items() if v is not None}
+    for name in FILTER_FIELDS:
+        value = getattr(metadata, name)
+        if value:
+            vector_metadata[f"{name}_terms"] = metadata_terms(value)
+    return vector_metadata
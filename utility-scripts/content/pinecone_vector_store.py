@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, List
 
 from vector_models import CreateVectorDTO
 
@@ -38,18 +38,34 @@ def store_vector(index: Any, content: CreateVectorDTO) -> None:
 
     Args:
         index: A Pinecone Index instance
-        content: CreateVectorDTO containing embedding, text content, file hash, and object key
+        content: CreateVectorDTO containing embedding, text content, file hash, object key and metadata
     """
-    index.upsert(
-        vectors=[
-            {
-                "id": content.file_hash,
-                "values": content.embedding,
-                "metadata": {
-                    "object_key": content.object_key,
-                },
-            }
-        ]
-    )
+    store_vectors(index, [content])
+
+
+def _to_pinecone_vector(content: CreateVectorDTO) -> dict:
+    return {
+        "id": content.id,
+        "values": content.embedding,
+        "metadata": {
+            **content.metadata,
+            "object_key": content.object_key,
+            # Summary / page text feeds the AI service's BM25 term index
+            "text": content.text_content,
+        },
+    }
+
+
+def store_vectors(index: Any, contents: List[CreateVectorDTO], batch_size: int = 100) -> None:
+    """
+    Store vectors in a Pinecone index, upserting in batches.
+
+    Args:
+        index: A Pinecone Index instance
+        contents: CreateVectorDTOs to store
+        batch_size: Maximum vectors per upsert request
+    """
+    for start in range(0, len(contents), batch_size):
+        index.upsert(vectors=[_to_pinecone_vector(c) for c in contents[start:start + batch_size]])
 
 
@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from typing import Optional
+
+from pydantic import BaseModel, Field
 
 
 class CreateVectorDTO(BaseModel):
@@ -6,5 +8,12 @@ class CreateVectorDTO(BaseModel):
     file_hash: str
     text_content: str
     object_key: str
+    metadata: dict = Field(default_factory=dict)
+    # Defaults to file_hash; page chunks use `{hash}:p{start}-{end}`
+    vector_id: Optional[str] = None
+
+    @property
+    def id(self) -> str:
+        return self.vector_id or self.file_hash
 
 
@@ -0,0 +1,67 @@
+import json
+from threading import Lock
+from typing import Dict, List
+
+from vector_models import CreateVectorDTO
+
+
+SNAPSHOT_FILE = "snapshot.json"
+
+
+class VectorSnapshot:
+    """
+    Collects vectors stored during a run and publishes them as a JSON snapshot to S3.
+
+    The AI service can sync its in-process vector index from this snapshot
+    instead of exporting the whole Pinecone index.
+    """
+
+    def __init__(self):
+        self._records: Dict[str, Dict] = {}
+        self._lock = Lock()
+
+    def add(self, content: CreateVectorDTO) -> None:
+        """Record a stored vector (thread-safe)."""
+        with self._lock:
+            self._records[content.id] = {
+                "id": content.id,
+                "values": content.embedding,
+                "metadata": {**content.metadata, "object_key": content.object_key, "text": content.text_content},
+            }
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def publish(self, s3_client, bucket_name: str, prefix: str) -> int:
+        """
+        Merge the collected vectors into the snapshot in S3.
+
+        Args:
+            s3_client: boto3 S3 client
+            bucket_name: Bucket holding the snapshot
+            prefix: Key prefix of the snapshot
+
+        Returns:
+            int: Number of records in the published snapshot
+        """
+        key = f"{prefix.rstrip('/')}/{SNAPSHOT_FILE}"
+        records: Dict[str, Dict] = {}
+
+        try:
+            response = s3_client.get_object(Bucket=bucket_name, Key=key)
+            for record in json.loads(response["Body"].read()).get("records", []):
+                records[record["id"]] = record
+        except s3_client.exceptions.NoSuchKey:
+            pass
+
+        with self._lock:
+            records.update(self._records)
+
+        merged: List[Dict] = list(records.values())
+        s3_client.put_object(
+            Bucket=bucket_name,
+            Key=key,
+            Body=json.dumps({"records": merged}).encode("utf-8"),
+            ContentType="application/json",
+        )
+        return len(merged)